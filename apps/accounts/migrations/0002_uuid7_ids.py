@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-18 15:32
+
+import apps.common.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    # default вычисляется в Python и в схеме не хранится: меняется
+    # только состояние, без перестроения таблиц.
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='user',
+                name='id',
+                field=models.UUIDField(default=apps.common.utils.uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+            ),
+        ]),
+    ]
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.accounts.models import User
+from apps.common.images import schedule_variants
+
+
+@receiver(post_save, sender=User)
+def generate_avatar_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_variants(instance, 'avatar')
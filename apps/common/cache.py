@@ -0,0 +1,112 @@
+"""
+Кэш готовых ответов публичных эндпоинтов каталога.
+
+Ключ ответа строится из пути, строки запроса и текущих версий
+областей (scope): глобальной и, например, 'category:<pk>'. При
+изменении данных сигналы меняют версию нужной области, после чего
+старые записи больше не находятся и просто вытесняются бэкендом —
+явная очистка не нужна.
+
+Новая версия — текущее время в наносекундах, записанное set(), а не
+incr(): incr файлового бэкенда — чтение и запись без блокировки, и
+параллельные изменения могли дать одну и ту же версию. Версии видны
+всем процессам, только если бэкенд общий (Redis, Memcached, файлы);
+с LocMemCache изменение сбрасывает кэш лишь в своем процессе.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+GLOBAL_SCOPE = 'global'
+
+
+class ResponseCache:
+
+    def __init__(self, alias=None, timeout=None, prefix='response'):
+        self._alias = alias
+        self._timeout = timeout
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def options(self):
+        return getattr(settings, 'RESPONSE_CACHE', {})
+
+    @property
+    def cache(self):
+        return caches[self._alias or self.options.get('ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return self.options.get('TIMEOUT', 300)
+
+    def _version_key(self, scope):
+        return f'{self.prefix}:version:{scope}'
+
+    def get_versions(self, scopes):
+        keys = [self._version_key(scope) for scope in scopes]
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # Начальная версия из времени: если счетчик вытеснили,
+                # новая версия не совпадет ни с одной из прежних.
+                initial = time.time_ns()
+                if not self.cache.add(key, initial, timeout=None):
+                    initial = self.cache.get(key, initial)
+                versions[key] = initial
+        return [versions[key] for key in keys]
+
+    def bump(self, *scopes):
+        # Любое новое значение отличается от прежних версий, поэтому
+        # параллельные изменения не нуждаются в атомарном счетчике.
+        version = time.time_ns()
+        self.cache.set_many(
+            {self._version_key(scope): version for scope in scopes},
+            timeout=None)
+
+    def bump_on_commit(self, *scopes):
+        """Сменить версии после коммита: не закэшировать старые данные."""
+        transaction.on_commit(lambda: self.bump(*scopes))
+
+    def make_key(self, request, scopes):
+        scopes = [GLOBAL_SCOPE, *scopes]
+        versions = self.get_versions(scopes)
+        query = sorted(request.GET.lists())
+        raw = repr((request.path, query, list(zip(scopes, versions))))
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        return f'{self.prefix}:data:{digest}'
+
+    def get(self, request, scopes=()):
+        key = self.make_key(request, scopes)
+        data = self.cache.get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, data
+
+    def set(self, key, data):
+        self.cache.set(key, data, timeout=self.timeout)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else 0.0,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,65 @@
+"""
+Условные GET-запросы (ETag / Last-Modified).
+
+Валидаторы считаются дешевыми запросами (MAX(updated_at), COUNT) до
+сериализации, чтобы на If-None-Match / If-Modified-Since сразу
+ответить 304.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class Validators:
+
+    def __init__(self, request, *parts, last_modified=None):
+        renderer = getattr(request, 'accepted_renderer', None)
+        raw = repr((
+            request.path,
+            sorted(request.GET.lists()),
+            getattr(renderer, 'format', None),
+            parts,
+            last_modified,
+        ))
+        self.etag = quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+        self.last_modified = (
+            int(last_modified.timestamp()) if last_modified else None)
+        self.request = request
+
+    def not_modified(self):
+        """Ответ 304, если копия клиента актуальна, иначе None."""
+        response = get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified)
+        if response is None:
+            return None
+        if isinstance(response, HttpResponseNotModified):
+            return self.apply(response)
+        return response
+
+    def apply(self, response):
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        return response
+
+
+def instance_validators(request, instance):
+    return Validators(
+        request, str(instance.pk), last_modified=instance.updated_at)
+
+
+def queryset_validators(request, queryset, live=None):
+    """
+    Валидаторы списка по MAX(updated_at) и количеству строк.
+
+    live — условие «живых» строк, если queryset включает мягко
+    удаленные: тогда удаление тоже сдвигает MAX(updated_at).
+    """
+    count = Count('pk', filter=live) if live is not None else Count('pk')
+    state = queryset.order_by().aggregate(
+        last_modified=Max('updated_at'), count=count)
+    return Validators(
+        request, state['count'], last_modified=state['last_modified'])
@@ -0,0 +1,131 @@
+"""
+Слаг с уникальным индексом без перебора name-2, name-3, ...
+
+AutoSlugField с unique=True подбирает свободный слаг запросами
+к базе, по одному на каждый занятый номер, и для популярных названий
+одна вставка превращается в десятки SELECT. UniqueSlugField берет
+слаг из названия как есть, а уникальность проверяет сама база: при
+нарушении индекса UniqueSlugMixin.save повторяет сохранение со
+случайным суффиксом (iphone-case-k3x9q2). Число запросов не зависит
+от количества одноименных объектов.
+
+Поле помнит недавно занятые основы слагов: следующий объект с той же
+основой сразу получает суффикс, без заведомо неудачной вставки.
+"""
+import re
+import secrets
+import string
+import threading
+from collections import OrderedDict
+
+from autoslug import AutoSlugField
+from autoslug import utils
+from django.db.models import Count
+
+SLUG_SUFFIX_LENGTH = 6
+SLUG_SUFFIX_ALPHABET = string.ascii_lowercase + string.digits
+SLUG_SUFFIX_RE = re.compile(rf'-[a-z0-9]{{{SLUG_SUFFIX_LENGTH}}}')
+
+
+def random_slug_suffix():
+    return ''.join(
+        secrets.choice(SLUG_SUFFIX_ALPHABET)
+        for _ in range(SLUG_SUFFIX_LENGTH))
+
+
+def with_suffix(slug, suffix, max_length):
+    """Слаг с суффиксом, обрезанный так, чтобы суффикс поместился."""
+    base = slug[:max_length - len(suffix) - 1].rstrip('-')
+    return f'{base}-{suffix}'
+
+
+def has_base(slug, base, max_length):
+    """Получен ли slug из base, в том числе с суффиксом."""
+    if slug == base:
+        return True
+    head, tail = (
+        slug[:-SLUG_SUFFIX_LENGTH - 1], slug[-SLUG_SUFFIX_LENGTH - 1:])
+    return (
+        bool(SLUG_SUFFIX_RE.fullmatch(tail)) and
+        head == base[:max_length - SLUG_SUFFIX_LENGTH - 1].rstrip('-'))
+
+
+class UniqueSlugField(AutoSlugField):
+    """
+    AutoSlugField с уникальным индексом. Модель должна наследовать
+    UniqueSlugMixin, который назначает суффикс при коллизии.
+
+    С always_update слаг с суффиксом сохраняется, пока источник
+    (например, название) дает ту же основу, — иначе каждое сохранение
+    меняло бы суффикс.
+    """
+
+    # Сколько занятых основ помнить (LRU на процесс).
+    taken_bases_size = 1024
+
+    def __init__(self, *args, **kwargs):
+        kwargs['unique'] = True
+        super().__init__(*args, **kwargs)
+        self._taken_bases = OrderedDict()
+        self._taken_lock = threading.Lock()
+
+    def remember_taken(self, base):
+        with self._taken_lock:
+            self._taken_bases[base] = True
+            self._taken_bases.move_to_end(base)
+            while len(self._taken_bases) > self.taken_bases_size:
+                self._taken_bases.popitem(last=False)
+
+    def is_known_taken(self, base):
+        with self._taken_lock:
+            return base in self._taken_bases
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.pop('unique', None)
+        return name, path, args, kwargs
+
+    def pre_save(self, instance, add):
+        current = self.value_from_object(instance)
+        source = current
+        if self.always_update or not current:
+            source = utils.get_prepopulated_value(self, instance)
+        base = self.slugify(source) if source else ''
+        base = self.slugify(utils.crop_slug(self, base))
+        if not base:
+            base = instance._meta.model_name
+
+        instance._slug_base = base
+        suffix = getattr(instance, '_slug_suffix', None)
+        if not suffix and current and has_base(
+                current, base, self.max_length):
+            slug = current
+        else:
+            if not suffix and self.is_known_taken(base):
+                suffix = random_slug_suffix()
+            slug = base
+            if suffix:
+                slug = with_suffix(base, suffix, self.max_length)
+        setattr(instance, self.attname, slug)
+        return slug
+
+
+def make_slugs_unique(model):
+    """
+    Развести повторяющиеся слаги перед созданием уникального индекса
+    (для миграций данных): самый старый объект сохраняет слаг,
+    остальные получают суффикс.
+    """
+    max_length = model._meta.get_field('slug').max_length
+    duplicates = (
+        model._base_manager.filter(slug__isnull=False)
+        .values('slug').annotate(count=Count('pk')).filter(count__gt=1)
+        .values_list('slug', flat=True)
+    )
+    for slug in list(duplicates):
+        pks = model._base_manager.filter(slug=slug).order_by(
+            'created_at', 'pk').values_list('pk', flat=True)
+        base = slug or model._meta.model_name
+        for pk in list(pks)[1:]:
+            model._base_manager.filter(pk=pk).update(
+                slug=with_suffix(base, random_slug_suffix(), max_length))
@@ -0,0 +1,193 @@
+"""
+Повтор изменяющих запросов по заголовку Idempotency-Key.
+
+Первый запрос с ключом занимает его: вставляет строку IdempotencyKey
+(уникальный индекс по пользователю и ключу), выполняется и сохраняет
+статус и данные ответа. Повтор с тем же ключом и теми же методом,
+путем и данными получает сохраненный ответ, не обращаясь к таблицам
+магазина. Пока первый запрос выполняется, повторы ждут его завершения,
+а не выполняются параллельно. Ключ с другим запросом отклоняется.
+
+Представление выполняется в транзакции, и ответ сохраняется в ней же:
+если процесс упадет до коммита, вместе с ответом откатятся и изменения
+запроса, и брошенный ключ (LOCK_TIMEOUT) можно безопасно выполнить
+заново. Ответы 5xx и исключения не сохраняются: ключ освобождается, и
+запрос можно повторить. Ключи анонимных запросов не учитываются.
+
+Ответы хранятся IDEMPOTENCY['TTL'] секунд; устаревшие ключи удаляет
+команда purge_idempotency_keys.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework.response import Response
+
+from apps.common.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name=HEADER,
+    type=str,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description=(
+        'Уникальный ключ запроса. Повтор с тем же ключом возвращает '
+        'сохраненный ответ первого запроса, не выполняя его снова.'),
+)
+
+
+def get_option(name, default):
+    return getattr(settings, 'IDEMPOTENCY', {}).get(name, default)
+
+
+def _describe(value):
+    # Загруженный файл описывается именем, размером и SHA-256
+    # содержимого: загрузка уже буферизована, чтение ее не меняет.
+    if hasattr(value, 'chunks'):
+        hasher = hashlib.sha256()
+        for chunk in value.chunks():
+            hasher.update(chunk)
+        value.seek(0)
+        return [value.name, value.size, hasher.hexdigest()]
+    return str(value)
+
+
+def request_fingerprint(request):
+    """SHA-256 метода, пути с параметрами и разобранных данных запроса."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps(
+        [request.method, request.get_full_path(), data],
+        sort_keys=True, default=_describe)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _insert(user, key, fingerprint):
+    record = IdempotencyKey(user=user, key=key, fingerprint=fingerprint)
+    if not transaction.get_connection().in_atomic_block:
+        record.save(force_insert=True)
+        return record
+    # Точка сохранения: после ошибки транзакция вызывающего кода
+    # остается рабочей.
+    with transaction.atomic():
+        record.save(force_insert=True)
+    return record
+
+
+def claim(user, key, fingerprint):
+    """
+    Занять ключ для запроса.
+
+    Возвращает (запись, True), если запрос должен выполниться, или
+    (запись другого запроса, False): завершенную, с другим отпечатком
+    или так и не завершенную за WAIT_TIMEOUT. (None, False) — ключ
+    так и не удалось занять за WAIT_TIMEOUT: запись исчезала между
+    попыткой вставки и чтением.
+    """
+    ttl = timedelta(seconds=get_option('TTL', 60 * 60 * 24))
+    lock_timeout = timedelta(seconds=get_option('LOCK_TIMEOUT', 60))
+    poll_interval = get_option('POLL_INTERVAL', 0.05)
+    deadline = time.monotonic() + get_option('WAIT_TIMEOUT', 10)
+    while True:
+        try:
+            return _insert(user, key, fingerprint), True
+        except IntegrityError:
+            pass
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            # Первый запрос завершился ошибкой и освободил ключ, или
+            # ключ удалил purge_idempotency_keys.
+            if time.monotonic() >= deadline:
+                return None, False
+            continue
+        age = timezone.now() - record.created_at
+        abandoned = record.status_code is None and age > lock_timeout
+        if age > ttl or abandoned:
+            stale = IdempotencyKey.objects.filter(
+                pk=record.pk, created_at=record.created_at)
+            if not age > ttl:
+                # Первый запрос мог успеть сохранить ответ.
+                stale = stale.filter(status_code=None)
+            stale.delete()
+            if time.monotonic() >= deadline:
+                return None, False
+            continue
+        if record.fingerprint != fingerprint or record.status_code is not None:
+            return record, False
+        if time.monotonic() >= deadline:
+            return record, False
+        time.sleep(poll_interval)
+
+
+def _release(record):
+    IdempotencyKey.objects.filter(pk=record.pk).delete()
+
+
+def _in_progress():
+    return Response(
+        {'message': 'Запрос с этим ключом еще выполняется'}, status=409)
+
+
+def idempotent(method):
+    """
+    Декоратор метода APIView: поддержка заголовка Idempotency-Key.
+    Применяется под extend_schema, чтобы заголовок попал в схему.
+    """
+
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None or not request.user.is_authenticated:
+            return method(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'message': f'Заголовок {HEADER} должен содержать '
+                            f'от 1 до {MAX_KEY_LENGTH} символов'},
+                status=400)
+
+        fingerprint = request_fingerprint(request)
+        record, owner = claim(request.user, key, fingerprint)
+        if not owner:
+            if record is not None and record.fingerprint != fingerprint:
+                return Response(
+                    {'message': 'Ключ уже использован с другим запросом'},
+                    status=422)
+            if record is None or record.status_code is None:
+                return _in_progress()
+            return Response(
+                record.response, status=record.status_code,
+                headers={REPLAYED_HEADER: 'true'})
+
+        try:
+            with transaction.atomic():
+                response = method(view, request, *args, **kwargs)
+                if (isinstance(response, Response)
+                        and response.status_code < 500):
+                    saved = IdempotencyKey.objects.filter(
+                        pk=record.pk).update(
+                            status_code=response.status_code,
+                            response=response.data)
+                    if saved:
+                        return response
+                    # Ключ сочли брошенным, и его занял повтор: изменения
+                    # этого запроса откатываются, выполнится только повтор.
+                    transaction.set_rollback(True)
+                    return _in_progress()
+        except BaseException:
+            _release(record)
+            raise
+        _release(record)
+        return response
+
+    return extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER])(wrapper)
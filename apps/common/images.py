@@ -0,0 +1,291 @@
+"""
+Производные изображения: миниатюра, карточка и полный размер
+в WebP и JPEG.
+
+Оригинал загружается как есть, а варианты строятся после коммита
+в пуле потоков, не задерживая запрос. Имя варианта однозначно
+выводится из имени оригинала, поэтому генерация идемпотентна: уже
+готовые файлы пропускаются, и повторный запуск (например, командой
+generate_image_variants) дорисовывает только недостающие.
+
+После генерации рядом с вариантами записывается widths.json с
+фактической шириной каждого варианта: srcset содержит только
+существующие варианты с их настоящей шириной, а изображение без
+вариантов отдается оригиналом.
+
+Когда варианты готовы, владельцам изображения (объектам, для которых
+генерация ставилась в очередь) отправляется сигнал variants_ready:
+srcset в их ответах изменился, хотя поля модели нет. Приложения
+сдвигают по нему updated_at и версии кэша ответов (apps.shop.signals).
+
+Ширины кэшируются в памяти процесса, отсутствие файла ширин — тоже,
+чтобы списки не открывали файл на каждой строке, пока варианты не
+готовы. Такая запись устаревает, когда updated_at владельца становится
+позже нее, и в любом случае через IMAGE_VARIANTS['MISSING_TTL'].
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'variants'
+# Наибольшая сторона варианта, px. Меньшие оригиналы не увеличиваются.
+VARIANT_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1200,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+# Формат для <img>: без вариантов в нем отдается оригинал.
+FALLBACK_FORMAT = 'jpeg'
+WIDTHS_FILE = 'widths.json'
+WIDTHS_CACHE_SIZE = 4096
+
+# Варианты изображения name готовы. sender — модель владельца,
+# аргументы pk и name.
+variants_ready = Signal()
+
+_executor = None
+_executor_lock = threading.Lock()
+# Имя изображения в очереди → владельцы [(модель, pk)], ждущие сигнала.
+_in_progress = {}
+
+# Имя → (ширины или None, когда файла не было, истекает), LRU.
+_widths = OrderedDict()
+_widths_lock = threading.Lock()
+
+
+def get_option(name, default):
+    return getattr(settings, 'IMAGE_VARIANTS', {}).get(name, default)
+
+
+def variant_name(name, variant, fmt):
+    root, _ = os.path.splitext(name)
+    return f'{VARIANTS_DIR}/{root}/{variant}.{fmt}'
+
+
+def widths_name(name):
+    root, _ = os.path.splitext(name)
+    return f'{VARIANTS_DIR}/{root}/{WIDTHS_FILE}'
+
+
+def _to_rgb(image):
+    # JPEG без прозрачности: прозрачные области на белом фоне.
+    if image.mode in ('RGBA', 'LA') or (
+            image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save_widths(storage, name):
+    # Ширины читаются из заголовков готовых JPEG-вариантов.
+    widths = {}
+    for variant in VARIANT_SIZES:
+        jpeg = variant_name(name, variant, FALLBACK_FORMAT)
+        with storage.open(jpeg) as file:
+            widths[variant] = Image.open(file).width
+    storage.save(widths_name(name), ContentFile(json.dumps(widths).encode()))
+    _remember_widths(name, widths)
+
+
+def generate_variants(storage, name):
+    """
+    Построить недостающие варианты изображения name и файл их ширин.
+    Возвращает количество созданных вариантов.
+    """
+    missing = [
+        (variant, fmt)
+        for variant in VARIANT_SIZES
+        for fmt in VARIANT_FORMATS
+        if not storage.exists(variant_name(name, variant, fmt))
+    ]
+    if not missing:
+        if not storage.exists(widths_name(name)):
+            _save_widths(storage, name)
+        return 0
+    try:
+        with storage.open(name, 'rb') as source:
+            original = ImageOps.exif_transpose(Image.open(source))
+            original.load()
+    except (OSError, ValueError) as exc:
+        logger.warning('Не удалось открыть изображение %s: %s', name, exc)
+        return 0
+
+    original = _to_rgb(original)
+    created = 0
+    for variant, fmt in missing:
+        image = original.copy()
+        size = VARIANT_SIZES[variant]
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        pil_format, options = VARIANT_FORMATS[fmt]
+        buffer = BytesIO()
+        image.save(buffer, pil_format, **options)
+        storage.save(
+            variant_name(name, variant, fmt), ContentFile(buffer.getvalue()))
+        created += 1
+    # Файл ширин пишется последним: его наличие означает, что все
+    # варианты готовы.
+    _save_widths(storage, name)
+    return created
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_option('WORKERS', 2),
+                thread_name_prefix='image-variants')
+        return _executor
+
+
+def notify_ready(name, owners):
+    for model, pk in owners:
+        variants_ready.send(sender=model, pk=pk, name=name)
+
+
+def _run(storage, name):
+    ready = False
+    try:
+        generate_variants(storage, name)
+        ready = _variant_widths(storage, name) is not None
+    except Exception:
+        logger.exception('Ошибка генерации вариантов %s', name)
+    finally:
+        # Владельцы, добавленные после этой точки, поставят новую
+        # задачу: она найдет готовые варианты и сразу их уведомит.
+        with _executor_lock:
+            owners = _in_progress.pop(name)
+    try:
+        if ready:
+            notify_ready(name, owners)
+    except Exception:
+        logger.exception('Ошибка уведомления о вариантах %s', name)
+    finally:
+        connections.close_all()
+
+
+def submit_variants(storage, name, owner=None):
+    """
+    Поставить генерацию в пул. owner — (модель, pk) объекта с этим
+    изображением: когда варианты готовы, ему отправляется variants_ready.
+    Повторная постановка того же файла, пока он обрабатывается, только
+    добавляет владельца.
+    """
+    with _executor_lock:
+        owners = _in_progress.get(name)
+        if owners is not None:
+            if owner is not None:
+                owners.append(owner)
+            return None
+        _in_progress[name] = [owner] if owner is not None else []
+    return get_executor().submit(_run, storage, name)
+
+
+def schedule_variants(instance, *field_names):
+    """
+    После коммита сгенерировать варианты для новых или замененных
+    изображений instance.
+    """
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    for field_name in field_names:
+        file = getattr(instance, field_name)
+        if not file or loaded.get(field_name) == file.name:
+            continue
+        storage, name = file.storage, file.name
+        owner = (type(instance), instance.pk)
+        transaction.on_commit(
+            lambda storage=storage, name=name: submit_variants(
+                storage, name, owner))
+
+
+def _remember_widths(name, widths, missed_at=None):
+    # Ширины готовых вариантов не меняются: имя варианта выводится
+    # из имени оригинала. Срок есть только у записи «файла нет».
+    expires = None
+    if widths is None:
+        expires = time.monotonic() + get_option('MISSING_TTL', 60)
+    with _widths_lock:
+        _widths[name] = (widths, missed_at, expires)
+        _widths.move_to_end(name)
+        while len(_widths) > WIDTHS_CACHE_SIZE:
+            _widths.popitem(last=False)
+
+
+def _variant_widths(storage, name, changed_at=None):
+    """
+    Ширины вариантов name из кэша или файла ширин; None, пока файла нет.
+    changed_at — updated_at владельца: запись «файла нет», сделанная
+    раньше, не используется.
+    """
+    with _widths_lock:
+        entry = _widths.get(name)
+    if entry is not None:
+        widths, missed_at, expires = entry
+        if widths is not None:
+            return widths
+        fresh = changed_at is None or changed_at <= missed_at
+        if fresh and time.monotonic() < expires:
+            return None
+    missed_at = timezone.now()
+    try:
+        with storage.open(widths_name(name)) as file:
+            widths = json.load(file)
+    except (OSError, ValueError):
+        widths = None
+    _remember_widths(name, widths, missed_at)
+    return widths
+
+
+def clear_widths_cache():
+    with _widths_lock:
+        _widths.clear()
+
+
+def image_srcset(storage, name, changed_at=None):
+    """
+    Варианты изображения в виде srcset для каждого формата:
+    {'webp': '<url> 160w, <url> 480w, <url> 1200w', 'jpeg': ...}.
+
+    Ширины фактические; совпадающие по ширине варианты (оригинал меньше
+    целевого размера) не повторяются. Пока варианты не построены,
+    FALLBACK_FORMAT содержит адрес оригинала, остальные форматы — None.
+    changed_at — updated_at владельца изображения (см. _variant_widths).
+    """
+    if not name:
+        return None
+    widths = _variant_widths(storage, name, changed_at)
+    if widths is None:
+        return {
+            fmt: storage.url(name) if fmt == FALLBACK_FORMAT else None
+            for fmt in VARIANT_FORMATS
+        }
+    variants = {}
+    for variant in VARIANT_SIZES:
+        variants.setdefault(widths[variant], variant)
+    return {
+        fmt: ', '.join(
+            f'{storage.url(variant_name(name, variant, fmt))} {width}w'
+            for width, variant in variants.items()
+        )
+        for fmt in VARIANT_FORMATS
+    }
@@ -0,0 +1,97 @@
+from django.apps import apps
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+
+from apps.common.cache import GLOBAL_SCOPE, response_cache
+from apps.common.models import BaseModel
+from apps.common.slugs import SLUG_RESOLVERS
+from apps.common.utils import uuid7
+
+MAP_TABLE = 'uuid7_id_map'
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит первичные ключи строк, созданных до UUIDv7, на UUIDv7 '
+        'по created_at и обновляет все внешние ключи на них. Выполняется '
+        'одной транзакцией. Выданные JWT содержат прежний id '
+        'пользователя и перестают действовать; после перевода '
+        'перезапустите процессы приложения, чтобы сбросить кэш слагов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать строки, которые будут переведены.')
+
+    def get_models(self):
+        return [
+            model for model in apps.get_models()
+            if issubclass(model, BaseModel) and not model._meta.proxy
+        ]
+
+    def get_references(self, model):
+        """(таблица, столбец) всех внешних ключей на первичный ключ model,
+        включая промежуточные таблицы ManyToMany."""
+        for relation in model._meta.get_fields(include_hidden=True):
+            if not (relation.one_to_many or relation.one_to_one):
+                continue
+            if relation.concrete or not relation.auto_created:
+                continue
+            field = relation.field
+            if field.target_field != model._meta.pk:
+                continue
+            yield field.model._meta.db_table, field.column
+
+    def get_mapping(self, model):
+        pk = model._meta.pk
+        rows = model._base_manager.values_list('pk', 'created_at')
+        return [
+            (pk.get_db_prep_value(old, connection),
+             pk.get_db_prep_value(
+                 uuid7(int(created_at.timestamp() * 1000)), connection))
+            for old, created_at in rows.iterator(chunk_size=5000)
+            if old.version != 7
+        ]
+
+    def remap(self, cursor, table, column):
+        quote = connection.ops.quote_name
+        table, column = quote(table), quote(column)
+        cursor.execute(
+            f'UPDATE {table} SET {column} = ('
+            f'SELECT new_id FROM {MAP_TABLE} WHERE old_id = {table}.{column}'
+            f') WHERE {column} IN (SELECT old_id FROM {MAP_TABLE})')
+        return cursor.rowcount
+
+    def convert(self, cursor, model, mapping):
+        id_type = model._meta.pk.db_type(connection)
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {MAP_TABLE} '
+            f'(old_id {id_type} PRIMARY KEY, new_id {id_type})')
+        try:
+            cursor.executemany(
+                f'INSERT INTO {MAP_TABLE} (old_id, new_id) VALUES (%s, %s)',
+                mapping)
+            self.remap(cursor, model._meta.db_table, model._meta.pk.column)
+            for table, column in self.get_references(model):
+                updated = self.remap(cursor, table, column)
+                self.stdout.write(f'  {table}.{column}: {updated}')
+        finally:
+            cursor.execute(f'DROP TABLE {MAP_TABLE}')
+
+    def handle(self, *args, **options):
+        total = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in self.get_models():
+                mapping = self.get_mapping(model)
+                self.stdout.write(f'{model._meta.label}: {len(mapping)}')
+                total += len(mapping)
+                if mapping and not options['dry_run']:
+                    self.convert(cursor, model, mapping)
+        if options['dry_run'] or not total:
+            return
+        # Закэшированные ответы и слаги содержат прежние ключи.
+        response_cache.bump(GLOBAL_SCOPE)
+        for resolver in SLUG_RESOLVERS.values():
+            resolver.clear()
+        self.stdout.write(self.style.SUCCESS(f'Переведено строк: {total}.'))
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from apps.common.images import generate_variants, notify_ready, widths_name
+
+# Модели и поля изображений, для которых строятся варианты.
+IMAGE_FIELDS = {
+    'shop.Product': ('image1', 'image2', 'image3'),
+    'shop.Category': ('image',),
+    'accounts.User': ('avatar',),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует недостающие варианты (thumb, card, full; WebP и JPEG) '
+        'и файлы их ширин для уже загруженных изображений. Владельцы '
+        'изображений, у которых появился файл ширин, получают '
+        'variants_ready.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Количество параллельных потоков.')
+
+    def get_images(self):
+        """Имя изображения → (хранилище, владельцы [(модель, pk)])."""
+        images = {}
+        for label, field_names in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            manager = getattr(model.objects, 'unfiltered', None)
+            queryset = manager() if manager else model.objects.all()
+            for field_name in field_names:
+                storage = model._meta.get_field(field_name).storage
+                rows = queryset.filter(
+                    **{f'{field_name}__gt': ''}
+                ).values_list('pk', field_name)
+                for pk, name in rows:
+                    images.setdefault(name, (storage, []))[1].append(
+                        (model, pk))
+        return images
+
+    def generate(self, name, storage):
+        """Варианты name; True, если файл ширин появился только сейчас."""
+        existed = storage.exists(widths_name(name))
+        created = generate_variants(storage, name)
+        return created, not existed and storage.exists(widths_name(name))
+
+    def handle(self, *args, **options):
+        images = self.get_images()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(
+                lambda item: self.generate(item[0], item[1][0]),
+                images.items()))
+        created = 0
+        for (name, (_, owners)), (count, ready) in zip(
+                images.items(), results):
+            created += count
+            if ready:
+                notify_ready(name, owners)
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {len(images)}, создано вариантов: {created}.'))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.common.idempotency import get_option
+from apps.common.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет ключи Idempotency-Key старше IDEMPOTENCY["TTL"]. '
+        'Запускайте по расписанию, например раз в час.'
+    )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(
+            seconds=get_option('TTL', 60 * 60 * 24))
+        deleted, _ = IdempotencyKey.objects.filter(
+            created_at__lt=cutoff).delete()
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено ключей: {deleted}.'))
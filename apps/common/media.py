@@ -0,0 +1,141 @@
+"""
+Отдача загруженных файлов (MEDIA_URL).
+
+За nginx ответ содержит только X-Accel-Redirect: файл, Range и
+sendfile обслуживает сам nginx. Без него файл отдается через
+FileResponse: WSGI-сервер с wsgi.file_wrapper (gunicorn) передает его
+через sendfile, минуя буферы Python, в том числе для запросов Range.
+Файлы с адресацией по содержимому кэшируются навсегда.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from apps.common.storage import is_content_addressed
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'public, max-age=3600'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """
+    Часть файла [start, start + length) для FileResponse.
+
+    fileno() и позиция файла нужны gunicorn для sendfile, read()
+    ограничен длиной части для серверов без sendfile.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Диапазон (start, end) из заголовка Range, None — отдать файл
+    целиком, ValueError — диапазон вне файла (416).
+    Поддерживается один диапазон; несколько отдаются целым файлом.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or not size:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Суффикс: последние N байт.
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+def serve_media(request, path):
+    try:
+        full_path = default_storage.path(path)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден.')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден.')
+
+    stat = os.stat(full_path)
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = int(stat.st_mtime)
+    cache_control = (
+        IMMUTABLE_CACHE_CONTROL if is_content_addressed(path)
+        else MUTABLE_CACHE_CONTROL)
+
+    def finalize(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = cache_control
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return finalize(conditional)
+
+    content_type = (
+        mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+    options = getattr(settings, 'MEDIA_SERVE', {})
+    accel_prefix = options.get('ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            f"{accel_prefix.rstrip('/')}/{quote(path)}")
+        return finalize(response)
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(
+                request.META.get('HTTP_RANGE'), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return finalize(response)
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        return finalize(FileResponse(file, content_type=content_type))
+    start, end = byte_range
+    length = end - start + 1
+    response = FileResponse(
+        RangeFile(file, start, length), status=206, content_type=content_type)
+    response['Content-Length'] = length
+    response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    return finalize(response)
@@ -1,8 +1,11 @@
-import uuid
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
+from .fields import random_slug_suffix
 from .managers import IsDeletedManager, GetOrNoneManager
+from .utils import uuid7
 
 
 class BaseModel(models.Model):
@@ -10,12 +13,14 @@ class BaseModel(models.Model):
     Базовый класс модели, включающий общие поля и методы для всех моделей.
 
     Attributes:
-        id (UUIDField): Unique identifier for the model instance.
+        id (UUIDField): Unique identifier (UUIDv7, time-ordered).
         created_at (DateTimeField): Timestamp when the instance was created.
         updated_at (DateTimeField): Timestamp when the instance was last updated.
     """
 
-    id = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False, unique=True)
+    # UUIDv7 растет со временем: вставки идут в конец индекса,
+    # а ordering ['-id'] означает «сначала новые».
+    id = models.UUIDField(default=uuid7, primary_key=True, editable=False, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -24,6 +29,23 @@ class BaseModel(models.Model):
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения на момент загрузки: по ним сигналы понимают,
+        # что именно изменилось при сохранении.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Сигналы post_save уже отработали со старыми значениями.
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
 
 class IsDeletedModel(BaseModel):
     is_deleted = models.BooleanField(default=False)
@@ -39,7 +61,72 @@ class IsDeletedModel(BaseModel):
         # Мягкое удаление is_deleted=True
         self.is_deleted = True
         self.deleted_at = timezone.now()
-        self.save(update_fields=["is_deleted", "deleted_at"])
+        self.save(update_fields=["is_deleted", "deleted_at", "updated_at"])
 
     def hard_delete(self, *args, **kwargs):
         super().delete(*args, **kwargs)
+
+
+class UniqueSlugMixin:
+    """
+    Сохранение модели с UniqueSlugField: если слаг уже занят,
+    сохранение повторяется со случайным суффиксом слага.
+    """
+
+    slug_retries = 5
+
+    def _slug_taken(self):
+        return type(self)._base_manager.filter(
+            slug=self.slug).exclude(pk=self.pk).exists()
+
+    def save(self, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                # Точка сохранения: после ошибки транзакция вызывающего
+                # кода остается рабочей.
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                break
+            except IntegrityError:
+                attempt += 1
+                if attempt > self.slug_retries or not self._slug_taken():
+                    raise
+                self._meta.get_field('slug').remember_taken(self._slug_base)
+                self._slug_suffix = random_slug_suffix()
+        self._slug_suffix = None
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ответ на запрос с заголовком Idempotency-Key
+    (apps.common.idempotency).
+
+    Attributes:
+        user (ForeignKey): Владелец ключа; ключи разных пользователей
+            не пересекаются.
+        key (str): Значение заголовка.
+        fingerprint (str): SHA-256 метода, пути и данных запроса.
+        status_code (int): Статус ответа; пусто, пока первый запрос
+            с ключом выполняется.
+        response (JSON): Данные ответа для повтора.
+        created_at (DateTimeField): Время первого запроса, по нему
+            устаревшие ключи удаляются.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return self.key
@@ -1,6 +1,216 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from types import SimpleNamespace
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from apps.common.streaming import is_stream_requested, stream_json_list
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'page_size'  # Параметр запроса для изменения размера страницы
-    max_page_size = 100  # Максимально допустимый размер страницы
\ No newline at end of file
+    max_page_size = 100  # Максимально допустимый размер страницы
+
+
+def paginated_response(request, queryset, serializer_class,
+                       pagination_class=CustomPagination, **serializer_kwargs):
+    """
+    Единый ответ для списков: страница с ограниченным размером или,
+    при stream=true, потоковый JSON-массив всей выборки.
+    """
+    if is_stream_requested(request):
+        return stream_json_list(
+            queryset, serializer_class, **serializer_kwargs)
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, **serializer_kwargs)
+    return paginator.get_paginated_response(serializer.data)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset) без COUNT и OFFSET.
+
+    Страница выбирается условием по значениям ключа сортировки последней
+    записи предыдущей страницы, поэтому страница N стоит столько же,
+    сколько первая. Курсор непрозрачен: в нём закодированы позиция,
+    направление и отпечаток активного фильтра. Курсор, полученный
+    с другим фильтром, отклоняется.
+    """
+
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    mode_query_value = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    # Последнее поле должно быть уникальным, чтобы ключ был стабильным.
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+    filter_mismatch_message = 'Курсор получен с другим фильтром.'
+
+    @classmethod
+    def is_requested(cls, request):
+        return (
+            cls.cursor_query_param in request.query_params or
+            request.query_params.get(cls.mode_query_param) ==
+            cls.mode_query_value
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        # Явная сортировка запроса (например, из фильтра) важнее
+        # сортировки по умолчанию.
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+        return self.ordering
+
+    def get_filter_fingerprint(self, request):
+        service_params = {
+            self.cursor_query_param,
+            self.mode_query_param,
+            self.page_size_query_param,
+        }
+        params = sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+            if key not in service_params
+        )
+        raw = json.dumps(params, ensure_ascii=False).encode()
+        return hashlib.sha1(raw).hexdigest()[:12]
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': position, 'f': self.fingerprint}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        encoded = urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            raw = urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            payload = json.loads(raw)
+            position = payload['p']
+            fingerprint = payload['f']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise ValidationError({'cursor': self.invalid_cursor_message})
+        if not isinstance(position, list) or len(position) != len(
+                self.fields):
+            raise ValidationError({'cursor': self.invalid_cursor_message})
+        if fingerprint != self.fingerprint:
+            raise ValidationError({'cursor': self.filter_mismatch_message})
+        try:
+            values = [
+                field.to_python(value)
+                for (field, _), value in zip(self.fields, position)
+            ]
+        except Exception:
+            raise ValidationError({'cursor': self.invalid_cursor_message})
+        return values, reverse
+
+    def get_position(self, instance):
+        if isinstance(instance, dict):
+            # Строка QuerySet.values(): значения лежат по attname.
+            instance = SimpleNamespace(**instance)
+        return [field.value_to_string(instance) for field, _ in self.fields]
+
+    def get_keyset_filter(self, values, reverse):
+        """
+        Условие «строго после позиции» для составного ключа:
+        (a < x) OR (a = x AND b < y) ... плюс a <= x как граница
+        диапазона, по которой SQLite идёт по индексу.
+        """
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{field.attname}__{lookup}': value})
+            equal &= Q(**{field.attname: value})
+        field, descending = self.fields[0]
+        bound = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{field.attname}__{bound}': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(
+            request.build_absolute_uri(), self.mode_query_param)
+        self.page_size = self.get_page_size(request)
+        self.fingerprint = self.get_filter_fingerprint(request)
+
+        ordering = self.get_ordering(queryset)
+        opts = queryset.model._meta
+        self.fields = [
+            (opts.get_field(name.lstrip('-')), name.startswith('-'))
+            for name in ordering
+        ]
+        values, reverse = self.decode_cursor(request)
+
+        if reverse:
+            ordering = [
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(values, reverse))
+
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = values is not None and (has_more or not reverse)
+        self.page = page
+        return page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {
+                    'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,272 @@
+"""
+Выборочные поля ответа (sparse fieldsets) и быстрые сериализаторы
+только для чтения.
+
+Клиент передает ?fields=name,slug или ?omit=desc, сериализатор
+оставляет только нужные поля, а project() сужает SELECT через
+.only(), чтобы неиспользуемые колонки (например, desc) не читались
+из базы.
+
+ValuesSerializer строит ответ прямо из строк QuerySet.values(): без
+экземпляров моделей и без обхода полей ModelSerializer на каждую
+строку. Значения форматируются теми же полями DRF, поэтому ответ
+совпадает с обычным сериализатором.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from apps.common.paginations import KeysetPagination
+
+
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _join(prefix, lookup):
+    if not prefix:
+        return lookup
+    if not lookup:
+        return prefix
+    return f'{prefix}__{lookup}'
+
+
+def get_ordering_columns(queryset):
+    """
+    Поля модели, по которым может сортироваться queryset: явная
+    сортировка, Meta.ordering и ключ курсорной пагинации, который
+    KeysetPagination добавляет уже после выбора колонок.
+    """
+    columns = []
+    for name in (*queryset.query.order_by,
+                 *queryset.model._meta.ordering,
+                 *KeysetPagination.ordering):
+        if not isinstance(name, str):
+            continue
+        name = name.lstrip('-')
+        try:
+            queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        columns.append(name)
+    return list(dict.fromkeys(columns))
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer с аргументом fields — списком отдаваемых полей.
+
+    Колонки модели для полей без прямого source (например,
+    SerializerMethodField) задаются в Meta.field_columns.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_available_fields(cls):
+        return list(cls().fields)
+
+    @classmethod
+    def select_fields(cls, request):
+        """
+        Поля из ?fields= / ?omit= или None, если выбор не задан.
+        Неизвестные поля — ошибка 400.
+        """
+        fields = request.query_params.get(FIELDS_QUERY_PARAM)
+        omit = request.query_params.get(OMIT_QUERY_PARAM)
+        if fields is None and omit is None:
+            return None
+        available = cls.get_available_fields()
+        selected = _split(fields) if fields is not None else available
+        omitted = _split(omit) if omit is not None else []
+        unknown = [
+            name for name in selected + omitted if name not in available]
+        if unknown:
+            raise ValidationError(
+                {FIELDS_QUERY_PARAM: f'Неизвестные поля: {unknown}'})
+        selected = [name for name in selected if name not in omitted]
+        if not selected:
+            raise ValidationError(
+                {FIELDS_QUERY_PARAM: 'Не выбрано ни одного поля.'})
+        return selected
+
+    @classmethod
+    def get_columns(cls, fields):
+        """Колонки модели, нужные для сериализации полей fields."""
+        model = cls.Meta.model
+        field_columns = getattr(cls.Meta, 'field_columns', {})
+        declared = cls().fields
+        columns = []
+        for name in fields:
+            if name in field_columns:
+                columns.extend(field_columns[name])
+                continue
+            source = declared[name].source_attrs
+            if not source:
+                continue
+            try:
+                model._meta.get_field(source[0])
+            except FieldDoesNotExist:
+                continue
+            columns.append(source[0])
+        return columns
+
+    @classmethod
+    def project(cls, queryset, fields, extra=()):
+        """
+        Ограничить SELECT колонками выбранных полей.
+
+        Помимо pk, сохраняются поля сортировки queryset, чтобы
+        курсорная пагинация не догружала их отдельными запросами.
+        """
+        if fields is None:
+            return queryset
+        columns = {
+            queryset.model._meta.pk.name,
+            *extra,
+            *cls.get_columns(fields),
+            *get_ordering_columns(queryset),
+        }
+        return queryset.only(*columns)
+
+
+class FileUrlField(serializers.Field):
+    """Имя файла из values() в URL хранилища, как FileField DRF."""
+
+    def __init__(self, model_field, **kwargs):
+        self.model_field = model_field
+        super().__init__(read_only=True, **kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return self.model_field.storage.url(value)
+
+
+class ValuesField:
+    """Колонка строки; field — поле DRF для форматирования значения."""
+
+    def __init__(self, lookup, field=None):
+        self.lookup = lookup
+        self.field = field
+
+    def get_lookups(self, prefix):
+        return [_join(prefix, self.lookup)]
+
+    def render(self, serializer, name, row, prefix):
+        value = row[_join(prefix, self.lookup)]
+        if value is None or self.field is None:
+            return value
+        return self.field.to_representation(value)
+
+
+class ValuesMethodField:
+    """Значение из get_<name>(values) по нескольким колонкам строки."""
+
+    def __init__(self, *lookups):
+        self.lookups = lookups
+
+    def get_lookups(self, prefix):
+        return [_join(prefix, lookup) for lookup in self.lookups]
+
+    def render(self, serializer, name, row, prefix):
+        values = {
+            lookup: row[_join(prefix, lookup)] for lookup in self.lookups}
+        return getattr(serializer, f'get_{name}')(values)
+
+
+class NestedValues:
+    """
+    Вложенный ValuesSerializer по колонкам связи lookup.
+
+    null_lookup — колонка, по которой пустая связь отдается как None.
+    """
+
+    def __init__(self, serializer_class, lookup='', null_lookup=None):
+        self.serializer_class = serializer_class
+        self.lookup = lookup
+        self.null_lookup = null_lookup
+        self.serializer = serializer_class()
+
+    def get_lookups(self, prefix):
+        path = _join(prefix, self.lookup)
+        lookups = self.serializer_class.get_lookups(prefix=path)
+        if self.null_lookup:
+            lookups.append(_join(path, self.null_lookup))
+        return lookups
+
+    def render(self, serializer, name, row, prefix):
+        path = _join(prefix, self.lookup)
+        if self.null_lookup and row[_join(path, self.null_lookup)] is None:
+            return None
+        return self.serializer.represent(row, path)
+
+
+class ValuesSerializer:
+    """
+    Сериализатор только для чтения по строкам QuerySet.values().
+
+    Подкласс описывает columns: {имя поля ответа: колонка}. Интерфейс
+    совместим с сериализаторами DRF (instance, many, .data), поэтому
+    подходит для paginated_response и stream_json_list.
+    """
+
+    columns = {}
+
+    def __init__(self, instance=None, many=False, fields=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        if fields is not None:
+            self.columns = {
+                name: column for name, column in self.columns.items()
+                if name in fields
+            }
+
+    @classmethod
+    def get_lookups(cls, fields=None, prefix=''):
+        lookups = []
+        for name, column in cls.columns.items():
+            if fields is None or name in fields:
+                lookups.extend(column.get_lookups(prefix))
+        return list(dict.fromkeys(lookups))
+
+    @classmethod
+    def values(cls, queryset, fields=None, extra=()):
+        """
+        queryset.values() с колонками выбранных полей.
+
+        pk и поля сортировки выбираются всегда, даже если их нет среди
+        fields: по ним курсорная пагинация строит позицию.
+        """
+        lookups = dict.fromkeys([
+            queryset.model._meta.pk.name,
+            *cls.get_lookups(fields),
+            *extra,
+            *get_ordering_columns(queryset),
+        ])
+        return queryset.values(*lookups)
+
+    def prepare(self, rows):
+        """Догрузить данные сразу для всей пачки строк."""
+
+    def represent(self, row, prefix=''):
+        return {
+            name: column.render(self, name, row, prefix)
+            for name, column in self.columns.items()
+        }
+
+    @property
+    def data(self):
+        rows = list(self.instance) if self.many else [self.instance]
+        self.prepare(rows)
+        data = [self.represent(row) for row in rows]
+        return data if self.many else data[0]
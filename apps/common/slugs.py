@@ -0,0 +1,141 @@
+"""
+Кэш слаг → первичный ключ в памяти процесса.
+
+Почти каждый запрос начинается с поиска объекта по слагу. Resolver
+держит ограниченный LRU с временем жизни записи и короткими
+«отрицательными» записями для несуществующих слагов, чтобы
+повторные 404 не ходили в базу. Сигналы сбрасывают слаг при его
+изменении и удалении объекта (см. apps.shop.signals); изменения
+из других процессов видны по истечении TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+
+
+class SlugResolver:
+
+    def __init__(self, model_label, maxsize=None, ttl=None,
+                 negative_ttl=None):
+        self.model_label = model_label
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    @property
+    def options(self):
+        return getattr(settings, 'SLUG_CACHE', {})
+
+    @property
+    def maxsize(self):
+        if self._maxsize is not None:
+            return self._maxsize
+        return self.options.get('MAXSIZE', 10000)
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return self.options.get('TTL', 300)
+
+    @property
+    def negative_ttl(self):
+        if self._negative_ttl is not None:
+            return self._negative_ttl
+        return self.options.get('NEGATIVE_TTL', 10)
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def resolve(self, slug):
+        """Первичный ключ объекта со слагом slug или None."""
+        if not slug:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(slug)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(slug)
+                if entry[0] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        pk = self.model.objects.filter(
+            slug=slug).values_list('pk', flat=True).first()
+
+        ttl = self.ttl if pk is not None else self.negative_ttl
+        with self._lock:
+            # Пока шел запрос, слаг могли сбросить: тогда не кэшируем.
+            if generation == self._generation:
+                self._entries[slug] = (pk, now + ttl)
+                self._entries.move_to_end(slug)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return pk
+
+    def get_or_none(self, slug, queryset=None):
+        """
+        Объект по слагу через кэш ключей. Если объект по ключу уже
+        не найден или сменил слаг, запись сбрасывается и слаг ищется
+        в базе заново.
+        """
+        if queryset is None:
+            queryset = self.model.objects.all()
+        pk = self.resolve(slug)
+        if pk is None:
+            return None
+        instance = queryset.get_or_none(pk=pk)
+        if instance is None or instance.slug != slug:
+            self.invalidate(slug)
+            return queryset.filter(slug=slug).first()
+        return instance
+
+    def invalidate(self, *slugs):
+        with self._lock:
+            for slug in slugs:
+                self._entries.pop(slug, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            hits, negative_hits, misses = (
+                self.hits, self.negative_hits, self.misses)
+            size = len(self._entries)
+        total = hits + negative_hits + misses
+        return {
+            'hits': hits,
+            'negative_hits': negative_hits,
+            'misses': misses,
+            'hit_ratio': (hits + negative_hits) / total if total else 0.0,
+            'size': size,
+        }
+
+
+product_slugs = SlugResolver('shop.Product')
+category_slugs = SlugResolver('shop.Category')
+seller_slugs = SlugResolver('sellers.Seller')
+
+SLUG_RESOLVERS = {
+    'product': product_slugs,
+    'category': category_slugs,
+    'seller': seller_slugs,
+}
@@ -0,0 +1,57 @@
+"""
+Хранилище загрузок с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 содержимого внутри каталога
+upload_to: product_images/3f/3f9a...c1.jpg. Повторная загрузка того
+же изображения не пишет второй копии, а получает уже существующее
+имя. Содержимое по такому имени никогда не меняется, поэтому его
+можно кэшировать навсегда (см. apps.common.media).
+"""
+import hashlib
+import os
+import re
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+
+from apps.common.images import VARIANTS_DIR
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{64}(\.[^/]*)?$')
+
+
+def is_content_addressed(name):
+    """Неизменяемо ли содержимое файла с таким именем."""
+    # Имена вариантов выводятся из хэшированного имени оригинала.
+    return bool(HASHED_NAME_RE.search(name)) or (
+        name.startswith(f'{VARIANTS_DIR}/') and
+        bool(HASHED_NAME_RE.search(os.path.dirname(name))))
+
+
+class ContentHashStorage(FileSystemStorage):
+    # Каталоги с детерминированными именами, которые не хэшируются.
+    keep_name_prefixes = (f'{VARIANTS_DIR}/',)
+
+    def get_hashed_name(self, name, content):
+        hasher = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = hasher.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if not name.startswith(self.keep_name_prefixes):
+            name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            # Такое содержимое уже сохранено.
+            return name
+        return super().save(name, content, max_length=max_length)
@@ -0,0 +1,47 @@
+"""
+Потоковая отдача больших списков.
+
+Строки читаются через QuerySet.iterator(chunk_size=...) и сериализуются
+пачками прямо в StreamingHttpResponse, поэтому память процесса не
+зависит от размера выборки.
+"""
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+STREAM_QUERY_PARAM = 'stream'
+STREAM_CHUNK_SIZE = 500
+
+
+def is_stream_requested(request):
+    value = request.query_params.get(STREAM_QUERY_PARAM, '')
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def iter_chunks(queryset, chunk_size=STREAM_CHUNK_SIZE):
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_json_list(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE,
+                     **serializer_kwargs):
+    encoder = JSONEncoder(ensure_ascii=False)
+
+    def generate():
+        yield '['
+        first = True
+        for chunk in iter_chunks(queryset, chunk_size):
+            data = serializer_class(chunk, many=True, **serializer_kwargs).data
+            for item in data:
+                yield ('' if first else ',') + encoder.encode(item)
+                first = False
+        yield ']'
+
+    return StreamingHttpResponse(
+        generate(), content_type='application/json; charset=utf-8')
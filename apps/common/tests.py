@@ -1,3 +1,119 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from apps.common import idempotency
+from apps.common.idempotency import claim, idempotent, request_fingerprint
+from apps.common.models import IdempotencyKey
+from apps.shop.models import Category
+from apps.shop.tests import create_user
+
+
+class RequestFingerprintTests(TestCase):
+
+    def fingerprint(self, content):
+        upload = SimpleUploadedFile('price.csv', content)
+        request = Request(
+            APIRequestFactory().post(
+                '/sellers/products/import/', {'file': upload},
+                format='multipart'),
+            parsers=[MultiPartParser()])
+        fingerprint = request_fingerprint(request)
+        # Файл остается доступным обработчику запроса.
+        self.assertEqual(request.data['file'].read(), content)
+        return fingerprint
+
+    def test_file_content_is_part_of_fingerprint(self):
+        self.assertEqual(
+            self.fingerprint(b'a;1\n'), self.fingerprint(b'a;1\n'))
+        self.assertNotEqual(
+            self.fingerprint(b'a;1\n'), self.fingerprint(b'b;2\n'))
+
+
+class ClaimTests(TestCase):
+
+    @override_settings(IDEMPOTENCY={'WAIT_TIMEOUT': 0.1})
+    def test_vanishing_record_does_not_spin(self):
+        user = create_user('buyer@example.com')
+        # Вставка конфликтует, а запись к чтению уже удалена.
+        with mock.patch.object(
+                idempotency, '_insert', side_effect=IntegrityError):
+            self.assertEqual(claim(user, 'key', 'fingerprint'), (None, False))
+
+
+class CreateCategoryView(APIView):
+    after_write = None
+
+    @idempotent
+    def post(self, request):
+        category = Category.objects.create(name=request.data['name'])
+        if self.after_write:
+            self.after_write()
+        return Response({'slug': category.slug}, status=201)
+
+
+class IdempotentTransactionTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('buyer@example.com')
+
+    def post(self, after_write=None):
+        request = APIRequestFactory().post(
+            '/categories/', {'name': 'Обувь'}, format='json',
+            HTTP_IDEMPOTENCY_KEY='key')
+        force_authenticate(request, self.user)
+        return CreateCategoryView.as_view(after_write=after_write)(request)
+
+    def test_response_is_saved_with_the_writes(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 201)
+        replay = self.post()
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data, response.data)
+        self.assertEqual(Category.objects.count(), 1)
+
+    def test_failed_response_save_rolls_back_writes(self):
+        # Сбой между изменениями и сохранением ответа.
+        save = IdempotencyKey.objects.filter
+        calls = []
+
+        def crash_on_save(*args, **kwargs):
+            if not calls:
+                calls.append(kwargs)
+                raise RuntimeError('сбой')
+            return save(*args, **kwargs)
+
+        with mock.patch.object(
+                IdempotencyKey.objects, 'filter', crash_on_save):
+            with self.assertRaises(RuntimeError):
+                self.post()
+        self.assertFalse(Category.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(Category.objects.count(), 1)
+
+    def test_taken_over_claim_rolls_back_writes(self):
+        def retry_takes_over():
+            # Повтор счел ключ брошенным, удалил его и занял заново.
+            IdempotencyKey.objects.all().delete()
+            IdempotencyKey.objects.create(
+                user=self.user, key='key', fingerprint='retry')
+
+        response = self.post(after_write=retry_takes_over)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Category.objects.exists())
+
+    @override_settings(IDEMPOTENCY={'LOCK_TIMEOUT': 0})
+    def test_completed_claim_is_not_taken_over(self):
+        self.post()
+        fingerprint = IdempotencyKey.objects.get().fingerprint
+        record, owner = claim(self.user, 'key', fingerprint)
+        self.assertFalse(owner)
+        self.assertEqual(record.status_code, 201)
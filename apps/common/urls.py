@@ -0,0 +1,7 @@
+from django.urls import path
+
+from apps.common.views import CacheStatsView
+
+urlpatterns = [
+    path('cache/stats/', CacheStatsView.as_view()),
+]
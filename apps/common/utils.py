@@ -1,26 +1,106 @@
 import secrets
+import threading
+import time
+import uuid
 
-from apps.common.models import BaseModel
+CODE_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ123456789"
+CODE_TIME_LENGTH = 8
+CODE_RANDOM_LENGTH = 4
+# Отсчет времени кода: 35**8 миллисекунд хватает примерно на 71 год.
+CODE_EPOCH_MS = 1704067200000  # 2024-01-01 UTC
 
+_code_lock = threading.Lock()
+_last_code = (0, 0)
 
-def generate_unique_code(model: BaseModel, field: str) -> str:
+UUID7_RANDOM_BITS = 74
+_uuid7_lock = threading.Lock()
+_last_uuid7 = (0, 0)
+
+
+def _encode(number, length):
+    base = len(CODE_ALPHABET)
+    chars = []
+    for _ in range(length):
+        number, index = divmod(number, base)
+        chars.append(CODE_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def generate_unique_code() -> str:
     """
-    Сгенерировать уникальный код для указанной модели и поля.
+    Сгенерировать 12-символьный код без обращения к базе.
 
-    Аргументы:
-    model (BaseModel): Класс модели для проверки уникальности.
-    field (str): Имя поля для проверки уникальности.
+    Первые 8 символов — миллисекунды от CODE_EPOCH_MS, последние 4 —
+    случайное число. Внутри процесса коды строго возрастают: в ту же
+    миллисекунду случайная часть увеличивается на единицу. Совпадение
+    кодов разных процессов требует одной миллисекунды и одного
+    случайного числа из 35**4; от него страхует уникальный индекс
+    (см. Order.save).
 
     Возвращает:
     str: Уникальный код.
     """
-    allowed_chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZ123456789"
-    unique_code = "".join(secrets.choice(allowed_chars) for _ in range(12))
-    code = unique_code
-    similar_object_exists = model.objects.filter(**{field: code}).exists()
-    if not similar_object_exists:
-        return code
-    return generate_unique_code(model, field)
+    global _last_code
+    random_limit = len(CODE_ALPHABET) ** CODE_RANDOM_LENGTH
+    now = int(time.time() * 1000) - CODE_EPOCH_MS
+    with _code_lock:
+        last_time, last_random = _last_code
+        if now <= last_time:
+            now, random_part = last_time, last_random + 1
+            if random_part >= random_limit:
+                now, random_part = now + 1, secrets.randbelow(random_limit)
+        else:
+            random_part = secrets.randbelow(random_limit)
+        _last_code = (now, random_part)
+    return (_encode(now, CODE_TIME_LENGTH) +
+            _encode(random_part, CODE_RANDOM_LENGTH))
+
+
+def uuid7(timestamp_ms=None) -> uuid.UUID:
+    """
+    UUID версии 7 (RFC 9562): 48 бит миллисекунд Unix-времени и 74
+    случайных бита.
+
+    Значения растут со временем: новые строки попадают в конец индекса
+    первичного ключа, а сортировка по id совпадает с порядком создания.
+    Внутри процесса значения строго возрастают: в ту же миллисекунду
+    случайная часть увеличивается на случайный шаг (метод 3 RFC 9562),
+    так что соседние ключи не угадываются.
+
+    Аргументы:
+    timestamp_ms (int): Явное время в миллисекундах, например
+    created_at при переводе старых строк; монотонность тогда
+    не отслеживается.
+
+    Возвращает:
+    uuid.UUID: Новый идентификатор.
+    """
+    global _last_uuid7
+    random_limit = 1 << UUID7_RANDOM_BITS
+    if timestamp_ms is None:
+        now = time.time_ns() // 1_000_000
+        with _uuid7_lock:
+            last_time, last_random = _last_uuid7
+            if now <= last_time:
+                now = last_time
+                random_part = last_random + secrets.randbits(32) + 1
+                if random_part >= random_limit:
+                    now += 1
+                    random_part = secrets.randbits(UUID7_RANDOM_BITS)
+            else:
+                random_part = secrets.randbits(UUID7_RANDOM_BITS)
+            _last_uuid7 = (now, random_part)
+    else:
+        now = timestamp_ms
+        random_part = secrets.randbits(UUID7_RANDOM_BITS)
+    value = (
+        (now & 0xFFFF_FFFF_FFFF) << 80 |
+        0x7 << 76 |                          # версия
+        (random_part >> 62) << 64 |          # rand_a, 12 бит
+        0b10 << 62 |                         # вариант RFC 4122
+        random_part & ((1 << 62) - 1)        # rand_b, 62 бита
+    )
+    return uuid.UUID(int=value)
 
 
 def set_dict_attr(obj, data):
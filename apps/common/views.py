@@ -1,3 +1,33 @@
-from django.shortcuts import render
+from drf_spectacular.utils import extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from apps.common.cache import response_cache
+from apps.common.slugs import SLUG_RESOLVERS
+
+tags = ['Common']
+
+
+class CacheStatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        summary='Статистика кэшей',
+        description="""
+            Эндпоинт возвращает счетчики попаданий и промахов кэшей
+            текущего процесса.
+        """,
+        tags=tags,
+    )
+    def get(self, request, *args, **kwargs):
+        slug_cache = {
+            name: resolver.stats()
+            for name, resolver in SLUG_RESOLVERS.items()
+        }
+        return Response(
+            data={
+                'response_cache': response_cache.stats(),
+                'slug_cache': slug_cache,
+            },
+            status=200)
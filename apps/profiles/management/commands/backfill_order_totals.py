@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from apps.profiles.models import Order, OrderItem
+from apps.shop.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Сохраняет цены строк и суммы заказов, оформленных до появления '
+        'снимков цен. Цена строки берется из текущей цены продукта, '
+        'в том числе удаленного. Заказы обрабатываются пачками, каждая '
+        'в своей транзакции; повторный запуск продолжает с оставшихся.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Заказов в одной транзакции.')
+
+    def handle(self, *args, **options):
+        amount_field = Order._meta.get_field('subtotal')
+        price = Subquery(
+            Product._base_manager.filter(pk=OuterRef('product_id'))
+            .values('price_current')[:1])
+        order_sum = Coalesce(
+            Subquery(
+                OrderItem.objects.filter(order=OuterRef('pk'))
+                .values('order')
+                .annotate(amount=Sum(F('unit_price') * F('quantity')))
+                .values('amount'),
+                output_field=amount_field),
+            Value(0), output_field=amount_field)
+
+        pending = Order.objects.filter(
+            Q(subtotal__isnull=True) | Q(total__isnull=True))
+        done = 0
+        while True:
+            ids = list(pending.values_list(
+                'pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                OrderItem.objects.filter(
+                    order_id__in=ids, unit_price__isnull=True,
+                ).update(unit_price=price)
+                Order.objects.filter(pk__in=ids).update(
+                    subtotal=order_sum, total=order_sum)
+            done += len(ids)
+            self.stdout.write(f'Заказов: {done}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Суммы сохранены для {done} заказов.'))
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.20 on 2026-10-18 15:43
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_cart_duplicates(apps, schema_editor):
+    # Повторы появлялись при параллельных запросах с одним и тем же
+    # количеством: запрос задает количество, а не прибавляет его.
+    # Остается последняя измененная строка, количества не суммируются.
+    OrderItem = apps.get_model('profiles', 'OrderItem')
+    cart = OrderItem.objects.filter(order__isnull=True)
+    duplicates = (
+        cart.values('user_id', 'product_id')
+        .annotate(count=Count('pk')).filter(count__gt=1)
+        .values_list('user_id', 'product_id')
+    )
+    for user_id, product_id in list(duplicates):
+        pks = list(cart.filter(
+            user_id=user_id, product_id=product_id,
+        ).order_by('-updated_at', '-pk').values_list('pk', flat=True))
+        OrderItem.objects.filter(pk__in=pks[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_order_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_cart_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('order__isnull', True)), fields=('user', 'product'), name='unique_cart_item'),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
 from apps.common.utils import generate_unique_code
 from apps.accounts.models import User
 from apps.common.models import BaseModel
@@ -22,6 +24,25 @@ PAYMENT_STATUS_CHOICES = (
 )
 
 
+def line_total():
+    """
+    Сумма строки заказа для запросов к OrderItem: цена, сохраненная при
+    оформлении, а для корзины — текущая цена продукта.
+    """
+    return models.ExpressionWrapper(
+        Coalesce('unit_price', 'product__price_current') * F('quantity'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+
+def order_totals(order_ids):
+    """Суммы заказов {order_id: сумма} одним агрегирующим запросом."""
+    return dict(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('order_id').annotate(total=Sum(line_total()))
+        .values_list('order_id', 'total')
+    )
+
+
 class ShippingAddress(BaseModel):
     """
     Представляет адрес доставки, связанный с пользователем.
@@ -65,6 +86,8 @@ class Order(BaseModel):
     tx_ref (str): Уникальная ссылка на транзакцию.
     delivery_status (str): Статус доставки заказа.
     payment_status (str): Статус оплаты заказа.
+    subtotal, total (Decimal): Суммы заказа, сохраненные при оформлении.
+    Пусто у заказов, оформленных раньше (см. backfill_order_totals).
 
     Методы:
     __str__():
@@ -75,14 +98,15 @@ class Order(BaseModel):
     """
     @property
     def get_cart_subtotal(self):
-        orderitems = self.orderitems.all()
-        total = sum([item.get_total for item in orderitems])
-        return total
+        if self.subtotal is not None:
+            return self.subtotal
+        return order_totals([self.pk]).get(self.pk) or 0
 
     @property
     def get_cart_total(self):
-        total = self.get_cart_subtotal
-        return total
+        if self.total is not None:
+            return self.total
+        return self.get_cart_subtotal
 
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='orders')
@@ -96,6 +120,11 @@ class Order(BaseModel):
 
     date_delivered = models.DateTimeField(null=True, blank=True)
 
+    subtotal = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True)
+    total = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True)
+
     # Детали адреса заказа.
     full_name = models.CharField(max_length=1000, null=True)
     email = models.EmailField(null=True)
@@ -108,10 +137,29 @@ class Order(BaseModel):
     def __str__(self):
         return f"{self.user.full_name}'s order"
 
+    # Повторы вставки при совпадении tx_ref с кодом другого процесса.
+    tx_ref_retries = 3
+
     def save(self, *args, **kwargs) -> None:
-        if not self.pk:
-            self.tx_ref = generate_unique_code(Order, 'tx_ref')
-        super().save(*args, **kwargs)
+        # pk задан значением по умолчанию, поэтому новый заказ
+        # определяется по _state.adding.
+        if not self._state.adding or self.tx_ref:
+            return super().save(*args, **kwargs)
+        attempt = 0
+        while True:
+            self.tx_ref = generate_unique_code()
+            try:
+                if not transaction.get_connection().in_atomic_block:
+                    return super().save(*args, **kwargs)
+                # Точка сохранения: после ошибки транзакция вызывающего
+                # кода остается рабочей.
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                attempt += 1
+                if attempt > self.tx_ref_retries or not Order.objects.filter(
+                        tx_ref=self.tx_ref).exists():
+                    raise
 
 
 class OrderItem(BaseModel):
@@ -122,6 +170,8 @@ class OrderItem(BaseModel):
         order (ForeignKey): The order to which this item belongs.
         product (ForeignKey): The product associated with this order item.
         quantity (int): The quantity of the product ordered.
+        unit_price (Decimal): The product price at checkout,
+            empty while the item is in the cart.
 
 
     """
@@ -137,13 +187,25 @@ class OrderItem(BaseModel):
     )
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True)
 
     @property
     def get_total(self):
-        return self.product.price_current * self.quantity
+        price = self.unit_price
+        if price is None:
+            price = self.product.price_current
+        return price * self.quantity
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # Одна строка корзины на продукт: по этому индексу
+            # apps.shop.cart делает вставку или обновление одним запросом.
+            models.UniqueConstraint(
+                fields=['user', 'product'], condition=Q(order__isnull=True),
+                name='unique_cart_item'),
+        ]
 
     def __str__(self):
         return str(self.product.name)
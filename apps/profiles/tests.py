@@ -1,3 +1,50 @@
+from decimal import Decimal
+
 from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from apps.profiles.models import Order, OrderItem, ShippingAddress
+from apps.shop.serializers import OrderSerializer, OrderValuesSerializer
+from apps.shop.tests import create_product, create_seller, create_user
+
+
+class OrderValuesParityTests(TestCase):
+    """Ответ по строкам values() совпадает с OrderSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('buyer@example.com')
+        seller = create_seller('seller@example.com')
+        address = ShippingAddress.objects.create(
+            user=cls.user, full_name='Тест Тестов',
+            email='buyer@example.com', city='Москва', zipcode='101000')
+        details = {
+            field: getattr(address, field)
+            for field in ('full_name', 'email', 'phone', 'address', 'city',
+                          'country', 'zipcode')
+        }
+        products = [
+            create_product('Куртка', seller=seller, price='19.99'),
+            create_product('Шапка', price='0.10'),
+        ]
+        # Заказ с сохраненными суммами, заказ до backfill_order_totals
+        # (суммы пустые) и пустой заказ.
+        stored = Order.objects.create(
+            user=cls.user, subtotal=Decimal('40.08'), total=Decimal('40.08'),
+            **details)
+        legacy = Order.objects.create(user=cls.user, **details)
+        Order.objects.create(user=cls.user)
+        for order, unit_price in ((stored, True), (legacy, False)):
+            for product, quantity in zip(products, (2, 1)):
+                OrderItem.objects.create(
+                    user=cls.user, order=order, product=product,
+                    quantity=quantity,
+                    unit_price=product.price_current if unit_price else None)
 
-# Create your tests here.
+    def test_orders(self):
+        queryset = Order.objects.filter(user=self.user).order_by('-created_at')
+        expected = OrderSerializer(queryset, many=True).data
+        actual = OrderValuesSerializer(
+            OrderValuesSerializer.values(queryset), many=True).data
+        self.assertEqual(
+            JSONRenderer().render(actual), JSONRenderer().render(expected))
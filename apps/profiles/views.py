@@ -2,12 +2,16 @@ from drf_spectacular.utils import extend_schema
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.common.idempotency import idempotent
+from apps.common.paginations import paginated_response
 from apps.common.permissions import IsOwner
 from apps.profiles.models import ShippingAddress, Order, OrderItem
 from apps.profiles.serializers import (
     ProfileSerializer, ShippingAddressSerializer)
 from apps.common.utils import set_dict_attr
-from apps.shop.serializers import OrderSerializer, CheckItemOrderSerializer
+from apps.shop.schema_examples import LIST_PARAM_EXAMPLE
+from apps.shop.serializers import (
+    OrderSerializer, OrderValuesSerializer, CheckItemOrderSerializer)
 
 
 tags = ['Profiles']
@@ -36,6 +40,7 @@ class ProfileView(APIView):
         """,
         tags=tags,
     )
+    @idempotent
     def put(self, request):
         user = request.user
         serializer = self.serializer_class(data=request.data)
@@ -52,6 +57,7 @@ class ProfileView(APIView):
         """,
         tags=tags,
     )
+    @idempotent
     def delete(self, request):
         user = request.user
         user.is_active = False
@@ -70,13 +76,14 @@ class ShippingAddressesView(APIView):
             связанный с юзером.
         """,
         tags=tags,
+        parameters=LIST_PARAM_EXAMPLE,
     )
     def get(self, request, *args, **kwargs):
         user = request.user
-        shipping_addresses = ShippingAddress.objects.filter(user=user)
-
-        serializer = self.serializer_class(shipping_addresses, many=True)
-        return Response(data=serializer.data)
+        shipping_addresses = ShippingAddress.objects.filter(
+            user=user).order_by('-created_at')
+        return paginated_response(
+            request, shipping_addresses, self.serializer_class)
 
     @extend_schema(
         summary='Создать адрес доставки.',
@@ -85,6 +92,7 @@ class ShippingAddressesView(APIView):
         """,
         tags=tags,
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
         user = request.user
         serializer = self.serializer_class(data=request.data)
@@ -130,6 +138,7 @@ class ShippingAddressViewID(APIView):
         """,
         tags=tags,
     )
+    @idempotent
     def put(self, request, *args, **kwargs):
         user = request.user
         shipping_address = self.get_object(user, kwargs['id'])
@@ -151,6 +160,7 @@ class ShippingAddressViewID(APIView):
         """,
         tags=tags,
     )
+    @idempotent
     def delete(self, request, *args, **kwargs):
         user = request.user
         shipping_address = self.get_object(user, kwargs["id"])
@@ -172,15 +182,14 @@ class OrdersView(APIView):
         description="""
             This endpoint returns all orders for a particular user.
         """,
-        tags=tags
+        tags=tags,
+        parameters=LIST_PARAM_EXAMPLE,
     )
     def get(self, request):
         user = request.user
-        orders = (Order.objects.filter(user=user)
-                  .prefetch_related("orderitems", "orderitems__product")
-                  .order_by("-created_at"))
-        serializer = self.serializer_class(orders, many=True)
-        return Response(data=serializer.data, status=200)
+        orders = OrderValuesSerializer.values(
+            Order.objects.filter(user=user).order_by("-created_at"))
+        return paginated_response(request, orders, OrderValuesSerializer)
 
 
 class OrderItemView(APIView):
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.reviews.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованный рейтинг продуктов по отзывам.'
+
+    def handle(self, *args, **options):
+        updated = rebuild_ratings()
+        self.stdout.write(
+            self.style.SUCCESS(f'Рейтинг пересчитан для {updated} продуктов.'))
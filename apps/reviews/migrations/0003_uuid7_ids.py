@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-18 15:33
+
+import apps.common.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_alter_review_options_alter_review_unique_together'),
+    ]
+
+    # default вычисляется в Python и в схеме не хранится: меняется
+    # только состояние, без перестроения таблиц.
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='review',
+                name='id',
+                field=models.UUIDField(default=apps.common.utils.uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+            ),
+        ]),
+    ]
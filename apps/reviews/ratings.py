@@ -0,0 +1,106 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import (
+    Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value)
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from apps.common.cache import GLOBAL_SCOPE, response_cache
+from apps.reviews.models import RATING_CHOICES, Review
+from apps.shop.models import Product
+
+
+STARS = [value for value, _ in RATING_CHOICES]
+
+
+def _average(count_delta=0, star_deltas=None):
+    """
+    Выражение средней оценки по счетчикам звезд.
+
+    В UPDATE правая часть видит старые значения столбцов, поэтому
+    изменения счетчиков передаются сюда явно.
+    """
+    star_deltas = star_deltas or {}
+    weighted = sum(
+        (F(f'rating_{star}') + star_deltas.get(star, 0)) * star
+        for star in STARS
+    )
+    count = F('rating_count') + count_delta
+    return Coalesce(
+        Cast(weighted, FloatField()) / NullIf(count, 0),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def apply_rating_delta(product_id, added=None, removed=None):
+    """
+    Учесть в рейтинге продукта добавленную и/или убранную оценку
+    одним UPDATE без пересчета по всем отзывам.
+    """
+    if product_id is None or added == removed:
+        return
+    star_deltas = {}
+    if added is not None:
+        star_deltas[added] = star_deltas.get(added, 0) + 1
+    if removed is not None:
+        star_deltas[removed] = star_deltas.get(removed, 0) - 1
+    count_delta = (added is not None) - (removed is not None)
+
+    updates = {
+        f'rating_{star}': F(f'rating_{star}') + delta
+        for star, delta in star_deltas.items()
+    }
+    if count_delta:
+        updates['rating_count'] = F('rating_count') + count_delta
+    updates['rating_avg'] = _average(count_delta, star_deltas)
+    updates['updated_at'] = timezone.now()
+    Product.objects.unfiltered().filter(pk=product_id).update(**updates)
+
+
+def rebuild_ratings(product_ids=None):
+    """
+    Пересчитать рейтинги по таблице отзывов.
+
+    Нужен после массовых операций, которые обходят сигналы
+    (например, QuerySet.update или мягкое удаление через QuerySet.delete).
+    Продуктам с изменившимся рейтингом сдвигается updated_at, а их
+    области кэша ответов сбрасываются после коммита.
+    """
+    products = Product.objects.unfiltered()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    def star_count(star=None):
+        reviews = Review.objects.filter(product=OuterRef('pk'))
+        if star is not None:
+            reviews = reviews.filter(rating=star)
+        reviews = reviews.order_by().values('product').annotate(
+            total=Count('id')).values('total')
+        return Coalesce(
+            Subquery(reviews, output_field=IntegerField()), Value(0))
+
+    counts = {
+        'rating_count': star_count(),
+        **{f'rating_{star}': star_count(star) for star in STARS},
+    }
+    stale = products.alias(
+        **{f'actual_{field}': value for field, value in counts.items()}
+    ).filter(reduce(or_, (
+        ~Q(**{field: F(f'actual_{field}')}) for field in counts)))
+
+    if product_ids is None:
+        # Весь каталог: проще сменить глобальную версию.
+        scopes = {GLOBAL_SCOPE}
+    else:
+        scopes = set()
+        for pk, category_id, seller_id in stale.values_list(
+                'pk', 'category_id', 'seller_id'):
+            scopes.update((f'product:{pk}', f'category:{category_id}'))
+            if seller_id is not None:
+                scopes.add(f'seller:{seller_id}')
+
+    if stale.update(**counts, updated_at=timezone.now()):
+        response_cache.bump_on_commit(*scopes)
+    return products.update(rating_avg=_average())
@@ -0,0 +1,55 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.reviews.models import Review
+from apps.reviews.ratings import apply_rating_delta, rebuild_ratings
+
+
+TRACKED_FIELDS = {'product_id', 'rating', 'is_deleted'}
+
+
+def _counted_rating(product_id, rating, is_deleted):
+    """Оценка, которая учтена в рейтинге продукта (или None)."""
+    if product_id is None or is_deleted:
+        return None
+    return rating
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    if not created and (loaded is None or not TRACKED_FIELDS <= set(loaded)):
+        # Прежнее состояние неизвестно: пересчитываем продукт целиком.
+        rebuild_ratings([instance.product_id])
+        return
+
+    old_product_id = old_rating = None
+    if not created:
+        old_product_id = loaded['product_id']
+        old_rating = _counted_rating(
+            old_product_id, loaded['rating'], loaded['is_deleted'])
+    new_rating = _counted_rating(
+        instance.product_id, instance.rating, instance.is_deleted)
+
+    if old_product_id is None or old_product_id == instance.product_id:
+        apply_rating_delta(
+            instance.product_id, added=new_rating, removed=old_rating)
+    else:
+        apply_rating_delta(old_product_id, removed=old_rating)
+        apply_rating_delta(instance.product_id, added=new_rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None) or {
+        'product_id': instance.product_id,
+        'rating': instance.rating,
+        'is_deleted': instance.is_deleted,
+    }
+    apply_rating_delta(
+        loaded['product_id'],
+        removed=_counted_rating(
+            loaded['product_id'], loaded['rating'], loaded['is_deleted']),
+    )
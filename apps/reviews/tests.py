@@ -1,3 +1,63 @@
 from django.test import TestCase
 
-# Create your tests here.
+from apps.common.cache import response_cache
+from apps.reviews.models import Review
+from apps.reviews.ratings import rebuild_ratings
+from apps.shop.models import Product
+from apps.shop.tests import create_product, create_seller, create_user
+
+
+class RebuildRatingsTests(TestCase):
+
+    def setUp(self):
+        self.seller = create_seller('seller@example.com')
+        self.product = create_product(seller=self.seller)
+        self.other = create_product('Другой товар', seller=self.seller)
+        Review.objects.create(
+            user=create_user('buyer@example.com'), product=self.product,
+            rating=4, text='Хорошо')
+        # Обходит сигналы, как массовые операции.
+        Review.objects.filter(product=self.product).update(rating=2)
+        self.product.refresh_from_db()
+        self.other.refresh_from_db()
+
+    def versions(self, *scopes):
+        return response_cache.get_versions(scopes)
+
+    def test_rebuild_bumps_changed_products(self):
+        scopes = (f'product:{self.product.pk}',
+                  f'category:{self.product.category_id}',
+                  f'seller:{self.seller.pk}')
+        untouched = (f'product:{self.other.pk}',
+                     f'category:{self.other.category_id}')
+        before = self.versions(*scopes)
+        before_untouched = self.versions(*untouched)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_ratings([self.product.pk, self.other.pk])
+
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.rating_2, 1)
+        self.assertEqual(product.rating_4, 0)
+        self.assertEqual(product.rating_avg, 2.0)
+        self.assertGreater(product.updated_at, self.product.updated_at)
+        for old, new in zip(before, self.versions(*scopes)):
+            self.assertNotEqual(old, new)
+        self.assertEqual(self.versions(*untouched), before_untouched)
+        self.assertEqual(
+            Product.objects.get(pk=self.other.pk).updated_at,
+            self.other.updated_at)
+
+    def test_full_rebuild_bumps_global_scope(self):
+        before = self.versions('global')
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_ratings()
+        self.assertNotEqual(self.versions('global'), before)
+
+    def test_nothing_to_rebuild(self):
+        rebuild_ratings()
+        before = self.versions('global')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            rebuild_ratings()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.versions('global'), before)
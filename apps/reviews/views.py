@@ -5,35 +5,48 @@ from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError
 
+from apps.common.paginations import CustomPagination
+from apps.common.slugs import product_slugs
+from apps.common.streaming import is_stream_requested, stream_json_list
 from .models import Review
 from .serializers import ReviewSerializer
-from apps.shop.models import Product
 
 
 class ReviewView(viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = CustomPagination
     lookup_field = 'pk'
 
     def get_queryset(self):
         product_slug = self.kwargs.get('slug')
         if product_slug:
-            product = Product.objects.filter(slug=product_slug).first()
-            if not product:
+            product_id = product_slugs.resolve(product_slug)
+            if not product_id:
                 raise NotFound('Продукт не найден!')
-            return Review.objects.filter(product=product)
-        return Review.objects.all()
+            return Review.objects.filter(
+                product_id=product_id).order_by('-created_at')
+        return Review.objects.order_by('-created_at')
+
+    def list(self, request, *args, **kwargs):
+        if is_stream_requested(request):
+            queryset = self.filter_queryset(self.get_queryset())
+            return stream_json_list(
+                queryset, self.get_serializer_class(),
+                context=self.get_serializer_context())
+        return super().list(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         product_slug = self.kwargs.get('slug')
-        product = Product.objects.filter(slug=product_slug).first()
-        if not product:
+        product_id = product_slugs.resolve(product_slug)
+        if not product_id:
             return Response(
                 {'message': 'Продукт не найден!'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        if Review.objects.filter(product=product, user=request.user).exists():
+        if Review.objects.filter(
+                product_id=product_id, user=request.user).exists():
             raise ValidationError('Вы уже оставили отзыв на этот продукт.')
 
         return super().create(request, *args, **kwargs)
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.20 on 2026-10-18 14:34
+
+import apps.common.fields
+from django.db import migrations
+
+from apps.common.fields import make_slugs_unique
+
+
+def dedupe_slugs(apps, schema_editor):
+    make_slugs_unique(apps.get_model('sellers', 'Seller'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sellers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='seller',
+            name='slug',
+            field=apps.common.fields.UniqueSlugField(always_update=True, editable=False, null=True, populate_from='business_name'),
+        ),
+    ]
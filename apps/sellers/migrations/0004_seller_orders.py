@@ -0,0 +1,77 @@
+# Generated by Django 4.2.20 on 2026-10-18 15:50
+
+import apps.common.utils
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def create_seller_orders(apps, schema_editor):
+    # Строки проекции для уже оформленных заказов. Цена строки — снимок
+    # при оформлении, а для заказов без снимка — текущая цена продукта.
+    Order = apps.get_model('profiles', 'Order')
+    OrderItem = apps.get_model('profiles', 'OrderItem')
+    SellerOrder = apps.get_model('sellers', 'SellerOrder')
+    line_total = models.ExpressionWrapper(
+        Coalesce('unit_price', 'product__price_current') * F('quantity'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2))
+    shares = (
+        OrderItem.objects.filter(
+            order__isnull=False, product__seller__isnull=False)
+        .values('order_id', 'product__seller_id',
+                'order__delivery_status', 'order__payment_status')
+        .annotate(subtotal=Sum(line_total), item_count=Sum('quantity'))
+        .order_by()
+    )
+    batch = []
+    for share in shares.iterator(chunk_size=1000):
+        batch.append(SellerOrder(
+            seller_id=share['product__seller_id'],
+            order_id=share['order_id'],
+            subtotal=share['subtotal'],
+            item_count=share['item_count'],
+            delivery_status=share['order__delivery_status'],
+            payment_status=share['order__payment_status'],
+        ))
+        if len(batch) == 1000:
+            SellerOrder.objects.bulk_create(batch)
+            batch = []
+    SellerOrder.objects.bulk_create(batch)
+    # auto_now_add проставил время миграции; нужно время заказа.
+    SellerOrder.objects.update(created_at=Subquery(
+        Order.objects.filter(pk=OuterRef('order_id')).values('created_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_unique_cart_item'),
+        ('sellers', '0003_uuid7_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerOrder',
+            fields=[
+                ('id', models.UUIDField(default=apps.common.utils.uuid7, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('item_count', models.PositiveIntegerField()),
+                ('delivery_status', models.CharField(max_length=20)),
+                ('payment_status', models.CharField(max_length=20)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seller_orders', to='profiles.order')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='sellers.seller')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['seller', '-created_at', '-id'], name='sellers_order_seller_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sellerorder',
+            constraint=models.UniqueConstraint(fields=('seller', 'order'), name='unique_seller_order'),
+        ),
+        migrations.RunPython(create_seller_orders, migrations.RunPython.noop),
+    ]
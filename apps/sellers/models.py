@@ -1,18 +1,18 @@
-from autoslug import AutoSlugField
 from django.db import models
 
 from apps.accounts.models import User
-from apps.common.models import BaseModel
+from apps.common.fields import UniqueSlugField
+from apps.common.models import BaseModel, UniqueSlugMixin
 
 
-class Seller(BaseModel):
+class Seller(UniqueSlugMixin, BaseModel):
     # Связь с юзером
     user = models.OneToOneField(
         User, on_delete=models.CASCADE, related_name='seller')
 
     # Информация о магазине(бизнесе)
     business_name = models.CharField(max_length=255)
-    slug = AutoSlugField(
+    slug = UniqueSlugField(
         populate_from="business_name", always_update=True, null=True)
     inn_identification_number = models.CharField(max_length=50)
     website_url = models.URLField(null=True, blank=True)
@@ -35,3 +35,47 @@ class Seller(BaseModel):
 
     def __str__(self):
         return f"Seller for {self.business_name}"
+
+
+class SellerOrder(BaseModel):
+    """
+    Заказ глазами продавца: одна строка на продавца в заказе.
+
+    Проекция для списка заказов продавца, чтобы не соединять заказы
+    со строками и продуктами. Пишется при оформлении заказа
+    (apps.shop.checkout); статусы копируются из заказа при каждом
+    его сохранении (apps.sellers.signals).
+
+    Атрибуты:
+    seller (ForeignKey): Продавец.
+    order (ForeignKey): Заказ.
+    subtotal (Decimal): Сумма товаров продавца в заказе.
+    item_count (int): Количество единиц товаров продавца в заказе.
+    delivery_status, payment_status (str): Статусы заказа.
+    """
+
+    seller = models.ForeignKey(
+        Seller, on_delete=models.CASCADE, related_name='orders')
+    order = models.ForeignKey(
+        'profiles.Order', on_delete=models.CASCADE,
+        related_name='seller_orders')
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+    item_count = models.PositiveIntegerField()
+    delivery_status = models.CharField(max_length=20)
+    payment_status = models.CharField(max_length=20)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['seller', 'order'], name='unique_seller_order'),
+        ]
+        indexes = [
+            # Список заказов продавца и ключ его курсорной пагинации.
+            models.Index(
+                fields=['seller', '-created_at', '-id'],
+                name='sellers_order_seller_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.seller.business_name}: {self.order.tx_ref}"
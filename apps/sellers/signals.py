@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.profiles.models import Order
+from apps.sellers.models import SellerOrder
+
+STATUS_FIELDS = ('delivery_status', 'payment_status')
+
+
+@receiver(post_save, sender=Order)
+def sync_seller_order_status(sender, instance, created, raw=False, **kwargs):
+    # Строки SellerOrder нового заказа создает оформление заказа.
+    if raw or created:
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None and all(
+            loaded.get(field) == getattr(instance, field)
+            for field in STATUS_FIELDS):
+        return
+    SellerOrder.objects.filter(order=instance).update(**{
+        field: getattr(instance, field) for field in STATUS_FIELDS})
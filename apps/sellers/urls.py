@@ -3,11 +3,15 @@ from django.urls import path
 from apps.sellers.views import (
     SellersView,
     ProductsBySellerView,
+    ProductsImportView,
+    ProductsBulkUpdateView,
     SellerProductView, SellerOrderItemView, SellerOrdersView)
 
 urlpatterns = [
     path('', SellersView.as_view()),
     path('products/', ProductsBySellerView.as_view()),
+    path('products/import/', ProductsImportView.as_view()),
+    path('products/bulk/', ProductsBulkUpdateView.as_view()),
     path("products/<slug:slug>/", SellerProductView.as_view()),
     path('orders/', SellerOrdersView.as_view()),
     path('orders/<str:tx_ref>/', SellerOrderItemView.as_view()),
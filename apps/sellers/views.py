@@ -1,16 +1,30 @@
+import csv
+
 from drf_spectacular.utils import extend_schema
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.common.idempotency import idempotent
+from apps.common.paginations import (
+    CustomPagination, KeysetPagination, paginated_response)
 from apps.common.permissions import IsSeller
+from apps.common.slugs import category_slugs, product_slugs
 from apps.common.utils import set_dict_attr
-from apps.shop.models import Category, Product
-from apps.profiles.models import Order, OrderItem
-from apps.sellers.models import Seller
+from apps.shop.bulk import (
+    IMPORT_TYPES, guess_import_type, import_products, resolve_owned,
+    update_products)
+from apps.shop.models import Product
+from apps.profiles.models import OrderItem
+from apps.sellers.models import Seller, SellerOrder
 from apps.sellers.serializers import SellerSerializer
+from apps.shop.schema_examples import (
+    LIST_PARAM_EXAMPLE, PRODUCT_FIELDS_PARAM_EXAMPLE)
 from apps.shop.serializers import (
     ProductSerializer,
-    CreateProductSerializer, CheckItemOrderSerializer, OrderSerializer)
+    CreateProductSerializer, CheckItemOrderSerializer,
+    SellerOrderValuesSerializer, ImportProductsFileSerializer,
+    BulkProductUpdateSerializer)
 
 
 tags = ['Sellers']
@@ -26,6 +40,7 @@ class SellersView(APIView):
              подать заявку на то, чтобы стать продавцом.
         """,
         tags=tags)
+    @idempotent
     def post(self, request):
         user = request.user
         serializer = self.serializer_class(data=request.data, partial=False)
@@ -52,16 +67,18 @@ class ProductsBySellerView(APIView):
         Продукты можно фильтровать по названию, размерам или цветам.
         """,
         tags=tags,
+        parameters=LIST_PARAM_EXAMPLE + PRODUCT_FIELDS_PARAM_EXAMPLE,
     )
     def get(self, request, *args, **kwargs):
         seller = Seller.objects.get_or_none(
             user=request.user, is_approved=True)
         if not seller:
             return Response(data={'message': 'Доступ запрещен!'}, status=403)
-        products = Product.objects.select_related(
-            'category', 'seller', 'seller__user').filter(seller=seller)
-        serializer = self.serializer_class(products, many=True)
-        return Response(data=serializer.data, status=200)
+        fields = self.serializer_class.select_fields(request)
+        products = self.serializer_class.project(
+            Product.objects.filter(seller=seller), fields)
+        return paginated_response(
+            request, products, self.serializer_class, fields=fields)
 
     @extend_schema(
         summary='Создание продукта',
@@ -72,6 +89,7 @@ class ProductsBySellerView(APIView):
         request=CreateProductSerializer,
         responses=CreateProductSerializer,
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
         serializer = CreateProductSerializer(data=request.data)
         seller = Seller.objects.get_or_none(
@@ -81,7 +99,7 @@ class ProductsBySellerView(APIView):
         if serializer.is_valid():
             data = serializer.validated_data
             category_slug = data.pop("category_slug", None)
-            category = Category.objects.get_or_none(slug=category_slug)
+            category = category_slugs.get_or_none(category_slug)
             if not category:
                 return Response(
                     data={'message': 'Категория не существует!'}, status=404)
@@ -94,13 +112,97 @@ class ProductsBySellerView(APIView):
             return Response(serializer.errors, status=400)
 
 
+class ProductsImportView(APIView):
+    serializer_class = ImportProductsFileSerializer
+    permission_classes = (IsSeller,)
+    parser_classes = (MultiPartParser,)
+
+    @extend_schema(
+        summary='Массовый импорт продуктов',
+        description="""
+            Эндпоинт создает продукты продавца из файла CSV (с заголовком)
+            или NDJSON. Колонки: name, desc, price_current, price_old,
+            category_slug, in_stock, image1, image2, image3 (имена
+            или URL уже загруженных изображений).
+            Строки с ошибками пропускаются и возвращаются в отчете
+            с номером строки файла.
+        """,
+        tags=tags,
+        request={'multipart/form-data': ImportProductsFileSerializer},
+    )
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        seller = Seller.objects.get_or_none(
+            user=request.user, is_approved=True)
+        if not seller:
+            return Response(data={'message': 'Доступ запрещен'}, status=403)
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response(data=serializer.errors, status=400)
+        file = serializer.validated_data['file']
+        import_type = (
+            serializer.validated_data.get('type') or
+            guess_import_type(file.name))
+        if import_type is None:
+            return Response(
+                data={'type': ['Не удалось определить формат файла.']},
+                status=400)
+        rows = IMPORT_TYPES[import_type](file)
+        try:
+            report = import_products(seller, rows)
+        except (ValueError, csv.Error) as exc:
+            return Response(
+                data={'message': f'Не удалось прочитать файл: {exc}'},
+                status=400)
+        status = 201 if report.created else 400
+        return Response(data=report.data, status=status)
+
+
+class ProductsBulkUpdateView(APIView):
+    serializer_class = BulkProductUpdateSerializer
+    permission_classes = (IsSeller,)
+
+    @extend_schema(
+        summary='Массовое обновление цен и остатков',
+        description="""
+            Эндпоинт обновляет цену и/или остаток нескольких продуктов
+            продавца за один запрос. Если цена меняется, прежняя цена
+            сохраняется в price_old. Изменения применяются все сразу:
+            если хотя бы один продукт не найден или принадлежит другому
+            продавцу, ничего не обновляется.
+        """,
+        tags=tags,
+    )
+    @idempotent
+    def patch(self, request, *args, **kwargs):
+        seller = Seller.objects.get_or_none(
+            user=request.user, is_approved=True)
+        if not seller:
+            return Response(data={'message': 'Доступ запрещен'}, status=403)
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response(data=serializer.errors, status=400)
+        items = serializer.validated_data['items']
+        owned, missing, foreign = resolve_owned(
+            seller, [item['slug'] for item in items])
+        if missing:
+            return Response(
+                data={'message': 'Продукты не найдены!', 'slugs': missing},
+                status=404)
+        if foreign:
+            return Response(
+                data={'message': 'Доступ запрещен', 'slugs': foreign},
+                status=403)
+        updated = update_products(seller, owned, items)
+        return Response(data={'updated': updated}, status=200)
+
+
 class SellerProductView(APIView):
     serializer_class = CreateProductSerializer
     permission_classes = (IsSeller,)
 
     def get_object(self, slug):
-        get_slug = Product.objects.get(slug=slug)
-        return get_slug
+        return product_slugs.get_or_none(slug)
 
     @extend_schema(
         summary='Обновление товара',
@@ -109,6 +211,7 @@ class SellerProductView(APIView):
             """,
         tags=tags
     )
+    @idempotent
     def put(self, request, *args, **kwargs):
         product = self.get_object(kwargs['slug'])
         if not product:
@@ -120,7 +223,7 @@ class SellerProductView(APIView):
         if serializer.is_valid():
             data = serializer.validated_data
             category_slug = data.pop("category_slug", None)
-            category = Category.objects.get_or_none(slug=category_slug)
+            category = category_slugs.get_or_none(category_slug)
             if not category:
                 return Response(
                     data={"message": 'Категория недоступна!'}, status=404)
@@ -141,6 +244,7 @@ class SellerProductView(APIView):
             """,
         tags=tags
     )
+    @idempotent
     def delete(self, request, *args, **kwargs):
         product = self.get_object(kwargs['slug'])
         if not product:
@@ -154,7 +258,7 @@ class SellerProductView(APIView):
 
 
 class SellerOrdersView(APIView):
-    serializer_class = OrderSerializer
+    serializer_class = SellerOrderValuesSerializer
     permission_classes = (IsSeller,)
 
     @extend_schema(
@@ -162,17 +266,23 @@ class SellerOrdersView(APIView):
         summary='Заказы продавца',
         description="""
             Эндпоинт возвращает все заказы для определенного продавца.
+            Суммы и количество — только по товарам продавца.
+            pagination=cursor включает курсорную пагинацию.
         """,
-        tags=tags
+        tags=tags,
+        parameters=LIST_PARAM_EXAMPLE,
     )
     def get(self, request):
         seller = request.user.seller
-        orders = (
-            Order.objects.filter(
-                orderitems__product__seller=seller).order_by('-created_at')
-        )
-        serializer = self.serializer_class(orders, many=True)
-        return Response(data=serializer.data, status=200)
+        orders = SellerOrderValuesSerializer.values(
+            SellerOrder.objects.filter(seller=seller).order_by(
+                '-created_at', '-id'))
+        pagination_class = CustomPagination
+        if KeysetPagination.is_requested(request):
+            pagination_class = KeysetPagination
+        return paginated_response(
+            request, orders, SellerOrderValuesSerializer,
+            pagination_class=pagination_class)
 
 
 class SellerOrderItemView(APIView):
@@ -190,11 +300,14 @@ class SellerOrderItemView(APIView):
     )
     def get(self, request, **kwargs):
         seller = request.user.seller
-        order = Order.objects.get_or_none(tx_ref=kwargs['tx_ref'])
-        if not order:
+        order_id = SellerOrder.objects.filter(
+            seller=seller, order__tx_ref=kwargs['tx_ref'],
+        ).values_list('order_id', flat=True).first()
+        if not order_id:
             return Response(
                 data={"message": 'Заказа не существует!'}, status=404)
         order_items = OrderItem.objects.filter(
-            order=order, product__seller=seller)
+            order_id=order_id, product__seller=seller,
+        ).select_related('product', 'product__category')
         serializer = self.serializer_class(order_items, many=True)
         return Response(data=serializer.data, status=200)
@@ -0,0 +1,308 @@
+"""
+Массовые операции продавца с продуктами: импорт из CSV или NDJSON
+и обновление цен и остатков.
+
+Файл читается потоково и обрабатывается пачками: строки пачки
+проверяются одним экземпляром сериализатора, слаги для всей пачки
+выделяются одним запросом, а продукты создаются bulk_create в своей
+транзакции. Категории загружаются один раз на весь импорт. Строки
+с ошибками пропускаются и попадают в отчет с номером строки файла.
+
+bulk_create и update() не отправляют post_save, поэтому индекс
+поиска, версии кэша ответов, кэш слагов и варианты изображений
+обновляются здесь же, пачкой.
+"""
+import codecs
+import csv
+import json
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from apps.common.cache import response_cache
+from apps.common.fields import random_slug_suffix, with_suffix
+from apps.common.images import submit_variants
+from apps.common.slugs import product_slugs
+from apps.shop import search
+from apps.shop.models import Category, Product
+from apps.shop.serializers import ImportProductSerializer
+
+IMPORT_BATCH_SIZE = 1000
+# Сколько ошибок по строкам попадает в отчет; остальные только считаются.
+IMPORT_MAX_ERRORS = 1000
+
+IMAGE_FIELDS = ('image1', 'image2', 'image3')
+
+
+def read_csv(file):
+    """
+    Строки CSV с заголовком как (номер строки файла, dict).
+    Пустые ячейки считаются отсутствующими значениями.
+    """
+    reader = csv.DictReader(codecs.iterdecode(file, 'utf-8-sig'))
+    for row in reader:
+        data = {
+            key: value for key, value in row.items()
+            if key is not None and value not in (None, '')
+        }
+        yield reader.line_num, data
+
+
+def read_ndjson(file):
+    """Строки NDJSON как (номер строки файла, dict или текст ошибки)."""
+    for line_num, line in enumerate(codecs.iterdecode(file, 'utf-8-sig'), 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield line_num, 'Неверный JSON.'
+            continue
+        if not isinstance(data, dict):
+            yield line_num, 'Ожидается JSON-объект.'
+            continue
+        yield line_num, data
+
+
+# Тип файла импорта: читатель строк.
+IMPORT_TYPES = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+IMPORT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+def guess_import_type(filename):
+    for extension, import_type in IMPORT_EXTENSIONS.items():
+        if (filename or '').lower().endswith(extension):
+            return import_type
+    return None
+
+
+def allocate_slugs(names):
+    """
+    Уникальные слаги продуктов для списка названий.
+
+    Слаг строится так же, как UniqueSlugField. Если он уже занят
+    (в том числе мягко удаленным продуктом) или повторяется в списке,
+    к нему добавляется случайный суффикс. Занятость проверяется одним
+    запросом на попытку; повторная попытка нужна только при совпадении
+    суффикса.
+    """
+    field = Product._meta.get_field('slug')
+    model_name = Product._meta.model_name
+    bases = [field.slugify(name)[:field.max_length] or model_name
+             for name in names]
+
+    slugs = list(bases)
+    assigned = set()
+    pending = list(range(len(slugs)))
+    while pending:
+        taken = set(Product.objects.unfiltered().filter(
+            slug__in={slugs[index] for index in pending},
+        ).values_list('slug', flat=True))
+        retry = []
+        for index in pending:
+            if slugs[index] in taken or slugs[index] in assigned:
+                slugs[index] = with_suffix(
+                    bases[index], random_slug_suffix(), field.max_length)
+                retry.append(index)
+            else:
+                assigned.add(slugs[index])
+        pending = retry
+    return slugs
+
+
+class ImportReport:
+
+    def __init__(self, max_errors=IMPORT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'errors': errors})
+
+    @property
+    def data(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def _submit_variants(images):
+    storage = Product._meta.get_field('image1').storage
+    for name, pk in images:
+        submit_variants(storage, name, (Product, pk))
+
+
+def _create_batch(seller, products):
+    Product.objects.bulk_create(products)
+    search.index_new_products(product.pk for product in products)
+    scopes = {f'seller:{seller.pk}'}
+    scopes.update(f'category:{product.category_id}' for product in products)
+    response_cache.bump_on_commit(*scopes)
+    product_slugs.invalidate(*(product.slug for product in products))
+    images = {
+        (getattr(product, name).name, product.pk)
+        for product in products for name in IMAGE_FIELDS
+        if getattr(product, name)
+    }
+    transaction.on_commit(lambda: _submit_variants(images))
+
+
+def _import_batch(seller, batch, categories, validator, report):
+    valid = []
+    for row, data in batch:
+        if isinstance(data, str):
+            report.add_error(row, {'non_field_errors': [data]})
+            continue
+        try:
+            values = validator.run_validation(data)
+        except ValidationError as exc:
+            report.add_error(row, serializers.as_serializer_error(exc))
+            continue
+        category_id = categories.get(values.pop('category_slug'))
+        if category_id is None:
+            report.add_error(
+                row, {'category_slug': ['Категория не существует!']})
+            continue
+        values['category_id'] = category_id
+        valid.append(values)
+    if not valid:
+        return
+
+    names = [values['name'] for values in valid]
+    products = [
+        Product(seller=seller, slug=slug, **values)
+        for slug, values in zip(allocate_slugs(names), valid)
+    ]
+    attempt = 0
+    while True:
+        try:
+            with transaction.atomic():
+                _create_batch(seller, products)
+            break
+        except IntegrityError:
+            # Слаг успели занять между выделением и вставкой.
+            attempt += 1
+            if attempt > Product.slug_retries:
+                raise
+            for product, slug in zip(products, allocate_slugs(names)):
+                product.slug = slug
+    report.created += len(products)
+
+
+def import_products(seller, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Создать продукты seller из строк (номер строки, dict).
+    Возвращает ImportReport.
+
+    Ошибка чтения файла (например, неверная кодировка) поднимается
+    как ValueError или csv.Error; уже созданные пачки остаются.
+    """
+    categories = dict(Category.objects.values_list('slug', 'id'))
+    validator = ImportProductSerializer()
+    report = ImportReport()
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            _import_batch(seller, batch, categories, validator, report)
+            batch = []
+    if batch:
+        _import_batch(seller, batch, categories, validator, report)
+    return report
+
+
+def resolve_owned(seller, slugs):
+    """
+    Продукты seller по слагам одним запросом.
+
+    Возвращает ({слаг: (pk, category_id)}, слаги, которых нет,
+    слаги чужих продуктов).
+    """
+    owned = {}
+    found = set()
+    rows = Product.objects.filter(slug__in=slugs).values_list(
+        'slug', 'pk', 'seller_id', 'category_id')
+    for slug, pk, seller_id, category_id in rows:
+        found.add(slug)
+        if seller_id == seller.pk:
+            owned[slug] = (pk, category_id)
+    missing = [slug for slug in slugs if slug not in found]
+    foreign = [slug for slug in slugs if slug in found and slug not in owned]
+    return owned, missing, foreign
+
+
+def update_products(seller, owned, items):
+    """
+    Применить цены и остатки items одним UPDATE ... FROM по списку
+    VALUES (pk, цена, остаток).
+
+    Прежний CASE WHEN pk = ... на каждое поле перебирал ветви для каждой
+    строки, а Django собирал и компилировал выражение из тысяч узлов.
+    Список VALUES соединяется с shop_product по первичному ключу, а
+    значения уходят в запрос параметрами.
+
+    Правило price_old как у обновления одного продукта: при смене цены
+    прежняя цена переходит в price_old. Условие вычисляется в самом
+    UPDATE по текущему значению строки, а не по прочитанному заранее.
+    Возвращает число обновленных строк.
+    """
+    opts = Product._meta
+    price_field = opts.get_field('price_current')
+    updated_at = opts.get_field('updated_at').get_db_prep_value(
+        timezone.now(), connection)
+    values, params = [], [updated_at]
+    for item in items:
+        price = item.get('price_current')
+        if price is not None:
+            price = price_field.get_db_prep_save(price, connection)
+        values.append('(%s, %s, %s)')
+        params += [
+            opts.pk.get_db_prep_value(owned[item['slug']][0], connection),
+            price,
+            item.get('in_stock'),
+        ]
+    params.append(
+        opts.get_field('seller').get_db_prep_value(seller.pk, connection))
+    table = connection.ops.quote_name(opts.db_table)
+    # Столбцы VALUES в SQLite называются column1, column2, ...
+    sql = f"""
+        UPDATE {table} SET
+            price_old = CASE
+                WHEN changes.price IS NOT NULL
+                    AND changes.price <> {table}.price_current
+                THEN {table}.price_current
+                ELSE {table}.price_old
+            END,
+            price_current = COALESCE(changes.price, {table}.price_current),
+            in_stock = COALESCE(changes.stock, {table}.in_stock),
+            updated_at = %s
+        FROM (
+            SELECT column1 AS id, column2 AS price, column3 AS stock
+            FROM (VALUES {', '.join(values)})
+        ) AS changes
+        WHERE {table}.id = changes.id AND {table}.seller_id = %s
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            updated = cursor.rowcount
+        scopes = {f'seller:{seller.pk}'}
+        for pk, category_id in owned.values():
+            scopes.update((f'product:{pk}', f'category:{category_id}'))
+        response_cache.bump_on_commit(*scopes)
+    return updated
@@ -0,0 +1,104 @@
+"""
+Изменение корзины без чтения перед записью.
+
+В корзине одна строка на продукт (ограничение unique_cart_item
+по user и product при order IS NULL), поэтому добавление и обновление
+выполняются одним INSERT ... ON CONFLICT DO UPDATE на пачку позиций:
+параллельные запросы одного пользователя не создают повторов, а число
+запросов не зависит от того, были ли товары в корзине. Синтаксис
+поддерживают SQLite (3.35+) и PostgreSQL.
+
+Пакетное изменение разрешает слаги всех позиций одним запросом in_bulk,
+удаляет позиции с нулевым количеством одним DELETE и делает вставку или
+обновление остальных в той же транзакции.
+"""
+from django.db import connection, transaction
+
+from apps.profiles.models import OrderItem
+from apps.shop.models import Product
+
+UPSERT_FIELDS = (
+    'id', 'created_at', 'updated_at', 'user', 'product', 'quantity')
+
+
+def _upsert_sql(rows):
+    meta = OrderItem._meta
+
+    def column(name):
+        return connection.ops.quote_name(meta.get_field(name).column)
+
+    columns = ', '.join(column(name) for name in UPSERT_FIELDS)
+    row = '(' + ', '.join(['%s'] * len(UPSERT_FIELDS)) + ')'
+    return (
+        f'INSERT INTO {connection.ops.quote_name(meta.db_table)} '
+        f'({columns}) VALUES {", ".join([row] * rows)} '
+        f'ON CONFLICT ({column("user")}, {column("product")}) '
+        f'WHERE {column("order")} IS NULL DO UPDATE SET '
+        f'{column("quantity")} = EXCLUDED.{column("quantity")}, '
+        f'{column("updated_at")} = EXCLUDED.{column("updated_at")} '
+        f'RETURNING {column("id")}, {column("product")}'
+    )
+
+
+def upsert_cart_items(user, quantities):
+    """
+    Положить товары в корзину user с заданным количеством.
+
+    quantities — {product_id: количество}. Возвращает
+    {product_id: (id строки корзины, создана ли строка)}.
+    """
+    fields = [OrderItem._meta.get_field(name) for name in UPSERT_FIELDS]
+    items = [
+        OrderItem(user=user, product_id=product_id, quantity=quantity)
+        for product_id, quantity in quantities.items()
+    ]
+    item_pk, product_pk = OrderItem._meta.pk, Product._meta.pk
+    result = {}
+    batch_size = connection.ops.bulk_batch_size(fields, items) or len(items)
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            params = [
+                field.get_db_prep_save(
+                    field.pre_save(item, add=True), connection)
+                for item in batch for field in fields
+            ]
+            cursor.execute(_upsert_sql(len(batch)), params)
+            new_ids = {item.product_id: item.pk for item in batch}
+            for item_id, product_id in cursor.fetchall():
+                item_id = item_pk.to_python(item_id)
+                product_id = product_pk.to_python(product_id)
+                # При обновлении RETURNING отдает id существующей строки.
+                result[product_id] = (
+                    item_id, item_id == new_ids[product_id])
+    return result
+
+
+def resolve_products(slugs):
+    """({слаг: pk} продуктов в продаже, слаги, которых нет) одним запросом."""
+    products = Product.objects.only('pk', 'slug').in_bulk(
+        slugs, field_name='slug')
+    found = {slug: product.pk for slug, product in products.items()}
+    missing = [slug for slug in slugs if slug not in found]
+    return found, missing
+
+
+def update_cart(user, quantities):
+    """
+    Установить количество товаров в корзине user.
+
+    quantities — {product_id: количество}; 0 убирает товар из корзины.
+    Возвращает (добавлено, обновлено, удалено).
+    """
+    removed = [pk for pk, quantity in quantities.items() if quantity == 0]
+    kept = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    created = updated = deleted = 0
+    with transaction.atomic():
+        if removed:
+            deleted, _ = OrderItem.objects.filter(
+                user=user, order=None, product_id__in=removed).delete()
+        if kept:
+            upserted = upsert_cart_items(user, kept)
+            created = sum(new for _, new in upserted.values())
+            updated = len(upserted) - created
+    return created, updated, deleted
@@ -0,0 +1,166 @@
+"""
+Оформление заказа одной транзакцией с резервированием остатков.
+
+Остатки всех позиций корзины списываются одним условным UPDATE:
+строка продукта меняется, только если товара хватает
+(in_stock >= n). Если обновилось меньше строк, чем продуктов
+в корзине, транзакция откатывается, и покупатель получает список
+недоступных позиций. UPDATE блокирует строки (PostgreSQL) или базу
+на запись (SQLite) до конца транзакции, поэтому параллельные
+оформления не продают больше, чем есть на складе.
+
+Корзина читается до начала транзакции, а первым запросом транзакции
+идет запись: в SQLite она ждет блокировку, а не падает на повышении
+блокировки чтения. Суммы заказа считаются, а позиции переносятся
+в заказ только по парам (id строки, количество), прочитанным вместе
+с корзиной: если за это время строку удалили или изменили ее
+количество, остатки списаны не под нее, и оформление отменяется
+с CartChangedError. Число запросов не зависит от количества позиций.
+
+Цена каждой строки сохраняется в заказе (OrderItem.unit_price), а суммы
+по продавцам считаются одним агрегирующим запросом: их итог хранится
+в Order, а доли продавцов — в проекции SellerOrder. Изменение цены
+продавцом не меняет оформленные заказы.
+"""
+from django.db import transaction
+from django.db.models import (
+    Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When)
+from django.utils import timezone
+
+from apps.common.cache import response_cache
+from apps.profiles.models import Order, OrderItem, line_total
+from apps.sellers.models import SellerOrder
+from apps.shop.models import Product
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCartError(CheckoutError):
+    pass
+
+
+class CartChangedError(CheckoutError):
+    pass
+
+
+class OutOfStockError(CheckoutError):
+
+    def __init__(self, items):
+        super().__init__(items)
+        self.items = items
+
+
+def get_cart(user):
+    """
+    Позиции корзины: {id строки: количество} и
+    {product_id: строка продукта}.
+    """
+    rows = OrderItem.objects.filter(user=user, order=None).values_list(
+        'id', 'product_id', 'quantity', 'product__slug', 'product__name',
+        'product__category_id', 'product__seller_id')
+    items, products = {}, {}
+    for item_id, product_id, quantity, *product in rows:
+        items[item_id] = quantity
+        if product_id in products:
+            products[product_id]['quantity'] += quantity
+        else:
+            slug, name, category_id, seller_id = product
+            products[product_id] = {
+                'quantity': quantity,
+                'slug': slug,
+                'name': name,
+                'category_id': category_id,
+                'seller_id': seller_id,
+            }
+    return items, products
+
+
+def get_unavailable(products):
+    """Позиции, которых не хватает на складе (удаленные — с нулем)."""
+    stock = dict(Product.objects.filter(
+        pk__in=products).values_list('pk', 'in_stock'))
+    return [
+        {
+            'slug': product['slug'],
+            'name': product['name'],
+            'requested': product['quantity'],
+            'available': stock.get(product_id, 0),
+        }
+        for product_id, product in products.items()
+        if stock.get(product_id, 0) < product['quantity']
+    ]
+
+
+def checkout(user, shipping_details):
+    """
+    Создать заказ из корзины user, списав остатки.
+
+    Возвращает Order. Поднимает EmptyCartError, OutOfStockError
+    (со списком недоступных позиций) или CartChangedError; в этих
+    случаях ничего не меняется.
+    """
+    items, products = get_cart(user)
+    if not products:
+        raise EmptyCartError()
+    # Строки корзины в том виде, под который списываются остатки.
+    read_items = Q(order=None) & Q(*[
+        Q(pk=item_id, quantity=quantity)
+        for item_id, quantity in items.items()
+    ], _connector=Q.OR)
+    needed = Case(
+        *[When(pk=product_id, then=Value(product['quantity']))
+          for product_id, product in products.items()],
+        output_field=IntegerField())
+
+    try:
+        with transaction.atomic():
+            reserved = Product.objects.filter(
+                pk__in=products, in_stock__gte=needed,
+            ).update(
+                in_stock=F('in_stock') - needed, updated_at=timezone.now())
+            if reserved != len(products):
+                raise OutOfStockError([])
+            # Строки продуктов заблокированы UPDATE выше: цены не
+            # изменятся до конца транзакции.
+            shares = list(
+                OrderItem.objects.filter(read_items)
+                .values('product__seller_id')
+                .annotate(subtotal=Sum(line_total()),
+                          item_count=Sum('quantity'))
+                .order_by()
+            )
+            subtotal = sum(share['subtotal'] for share in shares)
+            order = Order.objects.create(
+                user=user, subtotal=subtotal, total=subtotal,
+                **shipping_details)
+            price = Product.objects.filter(
+                pk=OuterRef('product_id')).values('price_current')[:1]
+            moved = OrderItem.objects.filter(read_items).update(
+                order=order, unit_price=Subquery(price))
+            if moved != len(items):
+                raise CartChangedError()
+            SellerOrder.objects.bulk_create([
+                SellerOrder(
+                    seller_id=share['product__seller_id'],
+                    order=order,
+                    subtotal=share['subtotal'],
+                    item_count=share['item_count'],
+                    delivery_status=order.delivery_status,
+                    payment_status=order.payment_status,
+                )
+                for share in shares if share['product__seller_id'] is not None
+            ])
+    except OutOfStockError:
+        raise OutOfStockError(get_unavailable(products))
+
+    # Остаток виден в карточке и списках продуктов.
+    scopes = set()
+    for product_id, product in products.items():
+        scopes.update((f'product:{product_id}',
+                       f"category:{product['category_id']}"))
+        if product['seller_id'] is not None:
+            scopes.add(f"seller:{product['seller_id']}")
+    response_cache.bump_on_commit(*scopes)
+    return order
@@ -0,0 +1,189 @@
+"""
+Потоковая выгрузка каталога в NDJSON или CSV.
+
+Строки читаются через values().iterator(chunk_size=...) вместе
+с колонками категории и продавца, а ответ собирается генератором,
+поэтому память не зависит от размера каталога.
+
+Полная выгрузка содержит только живые продукты. Инкрементальная
+выгрузка содержит все продукты, измененные после курсора, включая
+мягко удаленные (is_deleted=true), — так зеркало может их удалить.
+Жестко удаленные продукты приходят строками-надгробиями из
+ProductTombstone: только id, updated_at (время удаления) и
+is_deleted=true. Переименование категории или продавца сдвигает
+updated_at их продуктов (apps.shop.signals), поэтому измененные
+колонки категории и продавца тоже попадают в выгрузку.
+
+Строки идут по (updated_at, id), и курсор — пара (since, after_id):
+updated_at и id последней полученной строки. Выгружаются строки
+строго после этой пары, поэтому прерванную выгрузку можно продолжить
+без потерь, даже если массовое обновление дало многим строкам одно
+и то же updated_at. Без after_id выгрузка начинается со строк
+с updated_at = since включительно: часть строк может прийти повторно,
+но ни одна не пропадет.
+"""
+import csv
+import heapq
+import io
+import uuid
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.shop.models import Product, ProductTombstone
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Имя колонки выгрузки: путь для values().
+EXPORT_COLUMNS = {
+    'id': 'id',
+    'slug': 'slug',
+    'name': 'name',
+    'desc': 'desc',
+    'price_current': 'price_current',
+    'price_old': 'price_old',
+    'in_stock': 'in_stock',
+    'average_rating': 'rating_avg',
+    'rating_count': 'rating_count',
+    'category_slug': 'category__slug',
+    'category_name': 'category__name',
+    'seller_slug': 'seller__slug',
+    'seller_name': 'seller__business_name',
+    'image1': 'image1',
+    'image2': 'image2',
+    'image3': 'image3',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'is_deleted': 'is_deleted',
+}
+IMAGE_COLUMNS = ('image1', 'image2', 'image3')
+
+
+def parse_since(value):
+    """Момент since из ISO 8601 (дата или дата-время) или None."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            moment = datetime.combine(day, time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_after_id(value):
+    """id последней полученной строки (UUID) или None."""
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return None
+
+
+def _after_cursor(field, since, after_id):
+    """Строки строго после курсора (since, after_id) по (field, id)."""
+    # field >= since — граница диапазона индекса (field, id),
+    # остальное — строго после курсора.
+    after = Q(**{f'{field}__gt': since})
+    if after_id is None:
+        after |= Q(**{field: since})
+    else:
+        after |= Q(**{field: since, 'id__gt': after_id})
+    return Q(**{f'{field}__gte': since}) & after
+
+
+def export_queryset(since=None, after_id=None):
+    """
+    Строки выгрузки. since и after_id — курсор (updated_at, id)
+    последней полученной строки; after_id без since не задается.
+    """
+    if since is None:
+        queryset = Product.objects.order_by('id')
+    else:
+        queryset = Product.objects.unfiltered().filter(
+            _after_cursor('updated_at', since, after_id)
+        ).order_by('updated_at', 'id')
+    return queryset.values_list(*EXPORT_COLUMNS.values())
+
+
+def iter_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки выгрузки как dict с URL изображений."""
+    names = list(EXPORT_COLUMNS)
+    storages = {
+        name: Product._meta.get_field(name).storage for name in IMAGE_COLUMNS}
+    for values in queryset.iterator(chunk_size=chunk_size):
+        row = dict(zip(names, values))
+        for name, storage in storages.items():
+            row[name] = storage.url(row[name]) if row[name] else None
+        yield row
+
+
+def iter_tombstones(since, after_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки жестко удаленных продуктов после курсора."""
+    tombstones = ProductTombstone.objects.filter(
+        _after_cursor('deleted_at', since, after_id)
+    ).order_by('deleted_at', 'id').values_list('id', 'deleted_at')
+    for product_id, deleted_at in tombstones.iterator(chunk_size=chunk_size):
+        yield {
+            **dict.fromkeys(EXPORT_COLUMNS),
+            'id': product_id,
+            'updated_at': deleted_at,
+            'is_deleted': True,
+        }
+
+
+def export_rows(since=None, after_id=None):
+    """
+    Строки выгрузки после курсора; в инкрементальной выгрузке вместе
+    с надгробиями, в общем порядке (updated_at, id).
+    """
+    rows = iter_rows(export_queryset(since, after_id))
+    if since is None:
+        return rows
+    return heapq.merge(
+        rows, iter_tombstones(since, after_id),
+        key=lambda row: (row['updated_at'], row['id']))
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_ndjson(rows, batch_size=500):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for batch in _batched(rows, batch_size):
+        yield ''.join(f'{encoder.encode(row)}\n' for row in batch)
+
+
+def iter_csv(rows, batch_size=500):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(EXPORT_COLUMNS))
+    writer.writeheader()
+    for batch in _batched(rows, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Только заголовок, если строк нет.
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Тип выгрузки: (генератор, Content-Type, расширение файла).
+EXPORT_TYPES = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson; charset=utf-8', 'ndjson'),
+    'csv': (iter_csv, 'text/csv; charset=utf-8', 'csv'),
+}
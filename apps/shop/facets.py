@@ -0,0 +1,106 @@
+"""
+Фасеты каталога: количество продуктов по категориям, продавцам
+и ценовым диапазонам для текущей выборки ProductFilter.
+
+Все запрошенные фасеты считаются одним проходом по выборке: GROUP BY
+по category_id, seller_id и номеру ценового диапазона без JOIN, затем
+суммы по каждому фасету собираются в Python. Слаги и названия
+категорий и продавцов подгружаются одним in_bulk на фасет.
+"""
+from collections import Counter
+
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from apps.sellers.models import Seller
+from apps.shop.models import Category
+
+
+# Границы ценовых диапазонов: [0, 1000), [1000, 5000), ..., [50000, ∞).
+PRICE_FACET_BUCKETS = (0, 1000, 5000, 10000, 50000)
+
+
+def price_bucket():
+    bounds = PRICE_FACET_BUCKETS
+    return Case(
+        *[
+            When(price_current__lt=upper, then=Value(index))
+            for index, upper in enumerate(bounds[1:])
+        ],
+        default=Value(len(bounds) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def _named_facet(counts, model, name_field):
+    objects = model.objects.only('slug', name_field).in_bulk(list(counts))
+    items = [
+        {
+            'slug': objects[pk].slug,
+            'name': getattr(objects[pk], name_field),
+            'count': count,
+        }
+        for pk, count in counts.items() if pk in objects
+    ]
+    items.sort(key=lambda item: (-item['count'], item['name']))
+    return items
+
+
+def category_facet(counts):
+    return _named_facet(counts, Category, 'name')
+
+
+def seller_facet(counts):
+    # Продукты без продавца в фасет не попадают.
+    counts.pop(None, None)
+    return _named_facet(counts, Seller, 'business_name')
+
+
+def price_facet(counts):
+    bounds = PRICE_FACET_BUCKETS
+    return [
+        {
+            'min': lower,
+            'max': bounds[index + 1] if index + 1 < len(bounds) else None,
+            'count': counts.get(index, 0),
+        }
+        for index, lower in enumerate(bounds)
+    ]
+
+
+FACETS = {
+    'category': category_facet,
+    'seller': seller_facet,
+    'price': price_facet,
+}
+
+# Столбец GROUP BY каждого фасета.
+FACET_COLUMNS = {
+    'category': 'category_id',
+    'seller': 'seller_id',
+    'price': 'price_bucket',
+}
+
+
+def parse_facets(value):
+    """Разобрать параметр facets=category,seller,price."""
+    names = [name.strip() for name in (value or '').split(',')]
+    names = [name for name in names if name]
+    unknown = [name for name in names if name not in FACETS]
+    return names, unknown
+
+
+def compute_facets(queryset, names):
+    names = list(dict.fromkeys(names))
+    # Сортировка выборки не нужна для GROUP BY и только мешает ему.
+    queryset = queryset.order_by()
+    if 'price' in names:
+        queryset = queryset.annotate(price_bucket=price_bucket())
+    rows = queryset.values_list(
+        *[FACET_COLUMNS[name] for name in names]
+    ).annotate(count=Count('pk'))
+
+    counts = {name: Counter() for name in names}
+    for *keys, count in rows:
+        for name, key in zip(names, keys):
+            counts[name][key] += count
+    return {name: FACETS[name](counts[name]) for name in names}
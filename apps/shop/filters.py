@@ -3,6 +3,22 @@ import django_filters
 from apps.shop.models import Product
 
 
+class ProductOrderingFilter(django_filters.OrderingFilter):
+    """
+    Сортировка каталога по одному ключу.
+
+    Каждому ключу соответствует индекс (см. Product.Meta.indexes), а id
+    в конце делает порядок однозначным для пагинации.
+    """
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        ordering = self.get_ordering_value(value[0])
+        tiebreaker = '-id' if ordering.startswith('-') else 'id'
+        return qs.order_by(ordering, tiebreaker)
+
+
 class ProductFilter(django_filters.FilterSet):
     max_price = django_filters.NumberFilter(
         field_name='price_current', lookup_expr='lte')
@@ -10,7 +26,27 @@ class ProductFilter(django_filters.FilterSet):
         field_name='price_current', lookup_expr='gte')
     in_stock = django_filters.NumberFilter(lookup_expr='gte')
     created_at = django_filters.DateTimeFilter(lookup_expr='gte')
+    min_rating = django_filters.NumberFilter(
+        field_name='rating_avg', lookup_expr='gte')
+    ordering = ProductOrderingFilter(
+        fields=(
+            ('price_current', 'price'),
+            ('-created_at', 'newest'),
+            ('in_stock', 'stock'),
+            ('rating_avg', 'rating'),
+        ),
+        choices=(
+            ('price', 'Сначала дешевые'),
+            ('-price', 'Сначала дорогие'),
+            ('newest', 'Сначала новые'),
+            ('stock', 'Меньше на складе'),
+            ('-stock', 'Больше на складе'),
+            ('rating', 'Сначала с низким рейтингом'),
+            ('-rating', 'Сначала с высоким рейтингом'),
+        ),
+    )
 
     class Meta:
         model = Product
-        fields = ['max_price', 'min_price', 'in_stock', 'created_at']
\ No newline at end of file
+        fields = [
+            'max_price', 'min_price', 'in_stock', 'created_at', 'min_rating']
@@ -0,0 +1,462 @@
+import csv
+import io
+import random
+import secrets
+import statistics
+import string
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from autoslug import utils as autoslug_utils
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from apps.accounts.models import User
+from apps.common.paginations import CustomPagination, KeysetPagination
+from apps.common.slugs import category_slugs
+from apps.common.utils import CODE_ALPHABET, generate_unique_code, uuid7
+from apps.profiles.models import Order, OrderItem
+from apps.sellers.models import Seller
+from apps.shop.bulk import (
+    import_products, read_csv, resolve_owned, update_products)
+from apps.shop.models import Category, Product
+from apps.shop.search import rebuild_index
+from apps.shop.serializers import (
+    OrderItemSerializer,
+    OrderItemValuesSerializer,
+    OrderSerializer,
+    OrderValuesSerializer,
+    ProductSerializer,
+    ProductValuesSerializer)
+from apps.shop.views import ProductsSearchView, ProductsView
+
+BENCHMARK_BATCH_SIZE = 5000
+CATEGORIES = 50
+SELLERS = 20
+# Словарь названий и описаний: частота слова убывает с его номером,
+# поэтому в поиске есть и частые, и редкие слова.
+VOCABULARY_SIZE = 2000
+SEARCH_WORD_RANKS = (0, 20, 1000)
+FACET_QUERIES = (
+    ('весь каталог', {}),
+    ('min_price=90000', {'min_price': 90000}),
+)
+BULK_UPDATE_SIZES = (10, 100, 1000)
+FIELDS_PAGE_SIZE = 100
+SPARSE_FIELDS = 'id,name,slug,price_current,image1,average_rating'
+SERIALIZER_ROWS = 100
+IMPORT_ROWS = 1000
+SLUG_ROWS = 100
+ORDER_ROWS = 200
+UUID_ROWS = 20000
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет списки каталога на синтетических продуктах. Данные '
+        'создаются в транзакции, которая в конце откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10000, 100000],
+            help='Размеры каталога, продуктов.')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Повторов каждого замера; выводится медиана.')
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.factory = RequestFactory()
+        self.view = ProductsView.as_view()
+        self.search_view = ProductsSearchView.as_view()
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.seed(size)
+                    self.stdout.write(f'\nПродуктов: {size}')
+                    self.benchmark_pagination(size)
+                    self.benchmark_fields()
+                    self.benchmark_serializers()
+                    self.benchmark_search()
+                    self.benchmark_facets()
+                    self.benchmark_bulk_update()
+                    self.benchmark_import()
+                    self.benchmark_slugs()
+                    self.benchmark_tx_ref()
+                    self.benchmark_uuid()
+                    raise Rollback()
+            except Rollback:
+                pass
+
+    def seed(self, size):
+        random.seed(size)
+        self.vocabulary = [
+            ''.join(random.choices(string.ascii_lowercase, k=8))
+            for _ in range(VOCABULARY_SIZE)
+        ]
+        weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+
+        def words(count):
+            return ' '.join(
+                random.choices(self.vocabulary, weights, k=count))
+
+        self.categories = categories = Category.objects.bulk_create([
+            Category(name=f'Бенчмарк {i}', slug=f'benchmark-{i}')
+            for i in range(CATEGORIES)
+        ])
+        users = User.objects.bulk_create([
+            User(first_name='Бенчмарк', last_name=str(i),
+                 email=f'benchmark-{i}@example.com')
+            for i in range(SELLERS)
+        ])
+        self.users = users
+        self.sellers = sellers = Seller.objects.bulk_create([
+            Seller(user=user, business_name=f'Продавец {i}',
+                   slug=f'benchmark-seller-{i}')
+            for i, user in enumerate(users)
+        ])
+        start = timezone.now() - timedelta(days=365)
+        for offset in range(0, size, BENCHMARK_BATCH_SIZE):
+            Product.objects.bulk_create([
+                Product(
+                    name=words(3),
+                    slug=f'benchmark-product-{i}',
+                    desc=words(30),
+                    price_current=Decimal(random.randint(100, 100000)),
+                    in_stock=random.randint(0, 100),
+                    category=random.choice(categories),
+                    seller=random.choice(sellers),
+                    created_at=start + timedelta(seconds=i),
+                )
+                for i in range(offset, min(offset + BENCHMARK_BATCH_SIZE,
+                                           size))
+            ])
+        # bulk_create не обновляет полнотекстовый индекс.
+        rebuild_index()
+
+    def measure_call(self, func):
+        """Медиана времени вызова func(), мс."""
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    def measure(self, query, view=None, path='/shop/products/'):
+        """Медиана времени ответа представления, мс."""
+        view = view or self.view
+
+        def call():
+            response = view(self.factory.get(path, query))
+            assert response.status_code == 200, response.data
+
+        return self.measure_call(call)
+
+    def icontains_view(self, request):
+        """Поиск до FTS5: LIKE по названию, описанию и категории."""
+        request = ProductsView().initialize_request(request)
+        word = request.query_params['q']
+        queryset = Product.objects.filter(
+            Q(name__icontains=word) | Q(desc__icontains=word) |
+            Q(category__name__icontains=word))
+        paginator = CustomPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        return paginator.get_paginated_response(
+            ProductSerializer(page, many=True).data)
+
+    def cursor_at(self, offset):
+        """Курсор страницы, начинающейся после offset строк."""
+        paginator = KeysetPagination()
+        request = ProductsView().initialize_request(
+            self.factory.get('/shop/products/', {'pagination': 'cursor'}))
+        paginator.paginate_queryset(Product.objects.all(), request)
+        row = Product.objects.order_by(
+            *KeysetPagination.ordering)[offset - 1:offset].get()
+        return paginator.encode_cursor(paginator.get_position(row), False)
+
+    def report(self, label, timings):
+        self.stdout.write(f'  {label:<28}' + ''.join(
+            f'{name}: {value:8.1f} мс   ' for name, value in timings))
+
+    def benchmark_pagination(self, size):
+        page_size = 20
+        pages = sorted({1, 10, size // page_size // 2, size // page_size})
+        self.stdout.write('Пагинация: страница / OFFSET+COUNT / курсор')
+        for page in pages:
+            offset = (page - 1) * page_size
+            cursor_query = {'pagination': 'cursor', 'page_size': page_size}
+            if offset:
+                cursor = self.cursor_at(offset)
+                cursor_query = {'cursor': cursor.split('cursor=')[1],
+                                'page_size': page_size}
+            self.report(f'стр. {page}', [
+                ('page', self.measure({'page': page,
+                                       'page_size': page_size})),
+                ('cursor', self.measure(cursor_query)),
+            ])
+
+    def benchmark_fields(self):
+        self.stdout.write(
+            f'Выбор полей: страница из {FIELDS_PAGE_SIZE} / время ответа')
+        for label, query in (('все поля', {}),
+                             ('fields (6 полей)', {'fields': SPARSE_FIELDS})):
+            query = {'page_size': FIELDS_PAGE_SIZE, **query}
+            response = self.view(self.factory.get('/shop/products/', query))
+            size = len(response.render().content) / 1024
+            self.report(f'{label}, {size:.1f} КБ', [
+                ('time', self.measure(query)),
+            ])
+
+    def benchmark_serializers(self):
+        self.stdout.write(
+            f'Сериализация {SERIALIZER_ROWS} строк с запросом и JSON: '
+            'ModelSerializer / values()')
+        user = self.users[0]
+        products = Product.objects.all()[:SERIALIZER_ROWS]
+        OrderItem.objects.bulk_create([
+            OrderItem(user=user, product=product) for product in products])
+        Order.objects.bulk_create([
+            Order(user=user, tx_ref=f'BENCHMARK{i:05}',
+                  subtotal=Decimal(i), total=Decimal(i))
+            for i in range(SERIALIZER_ROWS)
+        ])
+        cart = OrderItem.objects.filter(user=user, order=None)
+        orders = Order.objects.filter(user=user).order_by('-created_at')
+        cases = (
+            # Пути представлений до перехода на values().
+            ('продукты',
+             lambda: ProductSerializer(ProductSerializer.project(
+                 Product.objects.all(), None)[:SERIALIZER_ROWS], many=True),
+             lambda: ProductValuesSerializer(ProductValuesSerializer.values(
+                 Product.objects.all())[:SERIALIZER_ROWS], many=True)),
+            ('корзина',
+             lambda: OrderItemSerializer(cart.select_related(
+                 'product', 'product__seller', 'product__seller__user'),
+                 many=True),
+             lambda: OrderItemValuesSerializer(
+                 OrderItemValuesSerializer.values(cart), many=True)),
+            ('заказы',
+             lambda: OrderSerializer(orders.prefetch_related(
+                 'orderitems', 'orderitems__product'), many=True),
+             lambda: OrderValuesSerializer(
+                 OrderValuesSerializer.values(orders), many=True)),
+        )
+        renderer = JSONRenderer()
+        for label, model, values in cases:
+            self.report(label, [
+                ('model', self.measure_call(
+                    lambda: renderer.render(model().data))),
+                ('values', self.measure_call(
+                    lambda: renderer.render(values().data))),
+            ])
+
+    def benchmark_search(self):
+        self.stdout.write('Поиск: слово (доля строк) / icontains / FTS5')
+        for rank in SEARCH_WORD_RANKS:
+            word = self.vocabulary[rank]
+            share = Product.objects.filter(desc__contains=word).count() / (
+                Product.objects.count())
+            query = {'q': word, 'page_size': 20}
+            self.report(f'{word} ({share:.1%})', [
+                ('icontains', self.measure(
+                    query, self.icontains_view, '/shop/products/search/')),
+                ('fts5', self.measure(
+                    query, self.search_view, '/shop/products/search/')),
+            ])
+
+    def benchmark_facets(self):
+        self.stdout.write('Фасеты: выборка / без фасетов / с фасетами')
+        for label, filters in FACET_QUERIES:
+            query = {'page_size': 20, **filters}
+            timings = [('plain', self.measure(query))]
+            for facets in ('category', 'seller', 'price',
+                           'category,seller,price'):
+                timings.append(
+                    (facets, self.measure({**query, 'facets': facets})))
+            self.report(label, timings)
+
+    def benchmark_bulk_update(self):
+        self.stdout.write(
+            'Массовое обновление: позиций / save() по одному / один UPDATE')
+        seller = self.sellers[0]
+        slugs = list(Product.objects.filter(seller=seller).values_list(
+            'slug', flat=True)[:max(BULK_UPDATE_SIZES)])
+        owned, _, _ = resolve_owned(seller, slugs)
+        for count in BULK_UPDATE_SIZES:
+            items = [
+                {'slug': slug,
+                 'price_current': Decimal(random.randint(100, 100000)),
+                 'in_stock': random.randint(0, 100)}
+                for slug in slugs[:count]
+            ]
+
+            def save_each():
+                # Как SellerProductView.put для каждого продукта.
+                for item in items:
+                    product = Product.objects.get(slug=item['slug'])
+                    product.price_old = product.price_current
+                    product.price_current = item['price_current']
+                    product.in_stock = item['in_stock']
+                    product.save()
+
+            self.report(f'{count}', [
+                ('save()', self.measure_call(save_each)),
+                ('bulk', self.measure_call(
+                    lambda: update_products(seller, owned, items))),
+            ])
+
+    def benchmark_import(self):
+        # Импорт ссылается на уже загруженные файлы.
+        image = Product.objects.exclude(image1='').values_list(
+            'image1', flat=True).first()
+        if image is None:
+            self.stdout.write('Импорт: нет загруженных изображений, пропущено')
+            return
+        self.stdout.write(
+            f'Импорт {IMPORT_ROWS} строк: create() по одной / import_products')
+        seller = self.sellers[0]
+        category = self.categories[0]
+        rows = [
+            {'name': f'Импорт {i}', 'desc': 'Описание',
+             'price_current': f'{random.randint(100, 100000)}.00',
+             'category_slug': category.slug, 'in_stock': '10',
+             'image1': image}
+            for i in range(IMPORT_ROWS)
+        ]
+        content = io.StringIO()
+        writer = csv.DictWriter(content, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        content = content.getvalue().encode()
+
+        def create_each():
+            # Как SellerProductsView.post для каждой строки.
+            for row in rows:
+                Product.objects.create(
+                    name=row['name'], desc=row['desc'],
+                    price_current=Decimal(row['price_current']),
+                    in_stock=int(row['in_stock']), image1=row['image1'],
+                    category=category_slugs.get_or_none(
+                        row['category_slug']),
+                    seller=seller)
+
+        def import_file():
+            report = import_products(seller, read_csv(io.BytesIO(content)))
+            assert report.failed == 0, report.errors
+
+        self.report(f'{IMPORT_ROWS}', [
+            ('create()', self.measure_call(create_each)),
+            ('import', self.measure_call(import_file)),
+        ])
+
+    def benchmark_slugs(self):
+        self.stdout.write(
+            f'Слаги: {SLUG_ROWS} продуктов с одним названием / '
+            'UniqueSlugField / перебор AutoSlugField(unique=True)')
+        category = self.categories[0]
+        field = Product._meta.get_field('slug')
+
+        def create(name):
+            return Product.objects.create(
+                name=name, desc='Описание', price_current=Decimal(100),
+                in_stock=1, category=category)
+
+        def unique_slugs():
+            for _ in range(SLUG_ROWS):
+                create('iPhone case')
+
+        def probing():
+            # Как AutoSlugField(unique=True): name, name-2, name-3, ...
+            # UniqueSlugField заменил бы найденный слаг своим, поэтому
+            # он записывается отдельным UPDATE.
+            for _ in range(SLUG_ROWS):
+                product = create('iPhone cover')
+                slug = autoslug_utils.generate_unique_slug(
+                    field, product, field.slugify(product.name), None)
+                Product.objects.filter(pk=product.pk).update(slug=slug)
+
+        for label, func in (('суффикс', unique_slugs),
+                            ('перебор', probing)):
+            queries = []
+
+            def count(execute, sql, *args):
+                queries.append(sql)
+                return execute(sql, *args)
+
+            # Один прогон: повтор занял бы уже следующие номера.
+            with connection.execute_wrapper(count):
+                started = time.perf_counter()
+                func()
+                elapsed = (time.perf_counter() - started) * 1000
+            per_row = len(queries) / SLUG_ROWS
+            self.report(f'{label} ({per_row:.0f} запр./шт)', [
+                ('time', elapsed),
+            ])
+
+    def benchmark_tx_ref(self):
+        self.stdout.write(
+            f'tx_ref: {ORDER_ROWS} кодов / {ORDER_ROWS} заказов, '
+            'проверка exists() / код без запроса')
+        user = self.users[0]
+
+        def exists_code():
+            # Генератор до перехода на код из времени.
+            while True:
+                code = ''.join(
+                    secrets.choice(CODE_ALPHABET) for _ in range(12))
+                if not Order.objects.filter(tx_ref=code).exists():
+                    return code
+
+        def codes(generate):
+            for _ in range(ORDER_ROWS):
+                generate()
+
+        def orders(generate):
+            for _ in range(ORDER_ROWS):
+                Order(user=user, tx_ref=generate()).save()
+
+        for label, func in (('коды', codes), ('заказы', orders)):
+            self.report(label, [
+                ('exists()', self.measure_call(lambda: func(exists_code))),
+                ('код', self.measure_call(
+                    lambda: func(generate_unique_code))),
+            ])
+
+    def benchmark_uuid(self):
+        self.stdout.write(
+            f'Первичный ключ: вставка {UUID_ROWS} позиций заказа, '
+            'uuid4 / uuid7')
+        order = Order.objects.create(user=self.users[0])
+        products = list(Product.objects.values_list('pk', flat=True)[:100])
+
+        def insert(make_id):
+            OrderItem.objects.bulk_create([
+                OrderItem(id=make_id(), order=order,
+                          product_id=products[i % len(products)])
+                for i in range(UUID_ROWS)
+            ], batch_size=BENCHMARK_BATCH_SIZE)
+
+        # Вставки чередуются: обе идут в индекс одного размера.
+        timings = {'uuid4': [], 'uuid7': []}
+        for _ in range(self.repeat):
+            for label, make_id in (('uuid4', uuid.uuid4), ('uuid7', uuid7)):
+                started = time.perf_counter()
+                insert(make_id)
+                timings[label].append(time.perf_counter() - started)
+        self.report(f'{UUID_ROWS}', [
+            (label, statistics.median(values) * 1000)
+            for label, values in timings.items()
+        ])
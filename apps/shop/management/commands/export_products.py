@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.shop.export import (
+    EXPORT_TYPES, export_rows, parse_after_id, parse_since)
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает каталог продуктов в NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', choices=list(EXPORT_TYPES), default='ndjson',
+            help='Формат выгрузки.')
+        parser.add_argument(
+            '--since',
+            help='updated_at последней полученной строки (ISO 8601).')
+        parser.add_argument(
+            '--after-id',
+            help='id последней полученной строки; требует --since.')
+        parser.add_argument(
+            '--output', help='Файл выгрузки. По умолчанию stdout.')
+
+    def handle(self, *args, **options):
+        since = options['since']
+        if since is not None:
+            since = parse_since(since)
+            if since is None:
+                raise CommandError(
+                    'Неверная дата --since, ожидается ISO 8601.')
+        after_id = options['after_id']
+        if after_id is not None:
+            after_id = parse_after_id(after_id)
+            if after_id is None or since is None:
+                raise CommandError(
+                    '--after-id: ожидается UUID вместе с --since.')
+        generate = EXPORT_TYPES[options['type']][0]
+        chunks = generate(export_rows(since, after_id))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,43 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sellers.models import Seller
+from apps.shop.bulk import (
+    IMPORT_BATCH_SIZE, IMPORT_TYPES, guess_import_type, import_products)
+
+
+class Command(BaseCommand):
+    help = 'Массово создает продукты продавца из файла CSV или NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('seller', help='Слаг продавца.')
+        parser.add_argument('file', help='Файл импорта.')
+        parser.add_argument(
+            '--type', choices=list(IMPORT_TYPES),
+            help='Формат файла. По умолчанию по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Строк в одной транзакции.')
+
+    def handle(self, *args, **options):
+        seller = Seller.objects.get_or_none(slug=options['seller'])
+        if seller is None:
+            raise CommandError('Продавец не найден.')
+        import_type = options['type'] or guess_import_type(options['file'])
+        if import_type is None:
+            raise CommandError('Не удалось определить формат, укажите --type.')
+        with open(options['file'], 'rb') as file:
+            try:
+                report = import_products(
+                    seller, IMPORT_TYPES[import_type](file),
+                    batch_size=options['batch_size'])
+            except (ValueError, csv.Error) as exc:
+                raise CommandError(f'Не удалось прочитать файл: {exc}')
+        for error in report.errors:
+            self.stderr.write(
+                f"Строка {error['row']}: "
+                f"{json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(
+            f'Создано: {report.created}, с ошибками: {report.failed}.')
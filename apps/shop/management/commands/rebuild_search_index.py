@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.shop.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс продуктов (FTS5).'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'В индексе {indexed} продуктов.'))
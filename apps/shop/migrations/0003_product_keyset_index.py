@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_alter_product_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='shop_product_live_created_idx'),
+        ),
+    ]
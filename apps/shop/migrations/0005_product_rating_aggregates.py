@@ -0,0 +1,78 @@
+# Generated by Django 4.2.20 on 2026-10-18 14:07
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_ratings(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    stars = range(1, 6)
+    rows = (
+        Review.objects.filter(is_deleted=False)
+        .order_by()
+        .values('product_id')
+        .annotate(
+            total=Count('id'),
+            **{f'star_{star}': Count('id', filter=Q(rating=star))
+               for star in stars},
+        )
+    )
+    for row in rows:
+        weighted = sum(star * row[f'star_{star}'] for star in stars)
+        Product.objects.filter(pk=row['product_id']).update(
+            rating_avg=weighted / row['total'],
+            rating_count=row['total'],
+            **{f'rating_{star}': row[f'star_{star}'] for star in stars},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_product_sort_indexes'),
+        ('reviews', '0002_alter_review_options_alter_review_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['rating_avg', 'id'], name='shop_product_live_rating_idx'),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
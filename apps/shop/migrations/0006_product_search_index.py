@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+CREATE_SQL = """
+    CREATE VIRTUAL TABLE shop_product_fts USING fts5(
+        name, "desc", category,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    INSERT INTO shop_product_fts (rowid, name, "desc", category)
+    SELECT p.rowid, p.name, p."desc", c.name
+    FROM shop_product p
+    INNER JOIN shop_category c ON c.id = p.category_id
+    WHERE NOT p.is_deleted;
+"""
+
+DROP_SQL = 'DROP TABLE shop_product_fts;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
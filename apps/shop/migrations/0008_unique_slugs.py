@@ -0,0 +1,45 @@
+# Generated by Django 4.2.20 on 2026-10-18 14:34
+
+import apps.common.fields
+from django.db import migrations
+
+from apps.common.fields import make_slugs_unique
+
+# Перестроение таблицы в SQLite меняет rowid, по которым связан индекс
+# поиска (см. apps.shop.search).
+REBUILD_SEARCH_SQL = """
+    DELETE FROM shop_product_fts;
+    INSERT INTO shop_product_fts (rowid, name, "desc", category)
+    SELECT p.rowid, p.name, p."desc", c.name
+    FROM shop_product p
+    INNER JOIN shop_category c ON c.id = p.category_id
+    WHERE NOT p.is_deleted;
+"""
+
+
+def dedupe_slugs(apps, schema_editor):
+    make_slugs_unique(apps.get_model('shop', 'Category'))
+    make_slugs_unique(apps.get_model('shop', 'Product'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_product_export_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(migrations.RunSQL.noop, REBUILD_SEARCH_SQL),
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=apps.common.fields.UniqueSlugField(always_update=True, editable=False, populate_from='name'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=apps.common.fields.UniqueSlugField(editable=False, populate_from='name'),
+        ),
+        migrations.RunSQL(REBUILD_SEARCH_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+
+# Строки индекса связаны с продуктом по product_id, а не по rowid
+# shop_product: rowid меняются при VACUUM и перестроении таблицы.
+CREATE_SQL = """
+    DROP TABLE shop_product_fts;
+    CREATE TABLE shop_product_search (
+        id integer NOT NULL PRIMARY KEY,
+        product_id char(32) NOT NULL UNIQUE,
+        name text NOT NULL,
+        "desc" text NOT NULL,
+        category text NOT NULL
+    );
+    CREATE VIRTUAL TABLE shop_product_fts USING fts5(
+        name, "desc", category,
+        content = 'shop_product_search', content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER shop_product_search_insert
+    AFTER INSERT ON shop_product_search BEGIN
+        INSERT INTO shop_product_fts (rowid, name, "desc", category)
+        VALUES (new.id, new.name, new."desc", new.category);
+    END;
+    CREATE TRIGGER shop_product_search_delete
+    AFTER DELETE ON shop_product_search BEGIN
+        INSERT INTO shop_product_fts
+            (shop_product_fts, rowid, name, "desc", category)
+        VALUES ('delete', old.id, old.name, old."desc", old.category);
+    END;
+    CREATE TRIGGER shop_product_search_update
+    AFTER UPDATE ON shop_product_search BEGIN
+        INSERT INTO shop_product_fts
+            (shop_product_fts, rowid, name, "desc", category)
+        VALUES ('delete', old.id, old.name, old."desc", old.category);
+        INSERT INTO shop_product_fts (rowid, name, "desc", category)
+        VALUES (new.id, new.name, new."desc", new.category);
+    END;
+    INSERT INTO shop_product_search (product_id, name, "desc", category)
+    SELECT p.id, p.name, p."desc", c.name
+    FROM shop_product p
+    INNER JOIN shop_category c ON c.id = p.category_id
+    WHERE NOT p.is_deleted;
+"""
+
+DROP_SQL = """
+    DROP TABLE shop_product_fts;
+    DROP TABLE shop_product_search;
+    CREATE VIRTUAL TABLE shop_product_fts USING fts5(
+        name, "desc", category,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    INSERT INTO shop_product_fts (rowid, name, "desc", category)
+    SELECT p.rowid, p.name, p."desc", c.name
+    FROM shop_product p
+    INNER JOIN shop_category c ON c.id = p.category_id
+    WHERE NOT p.is_deleted;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_uuid7_ids'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
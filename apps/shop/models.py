@@ -1,16 +1,17 @@
-from autoslug import AutoSlugField
 from django.db import models
-from apps.common.models import BaseModel, IsDeletedModel
+from django.utils import timezone
+from apps.common.fields import UniqueSlugField
+from apps.common.models import BaseModel, IsDeletedModel, UniqueSlugMixin
 from apps.sellers.models import Seller
 
 
-class Category(BaseModel):
+class Category(UniqueSlugMixin, BaseModel):
     """
     Представляет категорию продукта.
 
     Атрибуты:
     name (str): Имя категории, уникальное для каждого экземпляра.
-    slug (str): Слаг, сгенерированный из имени, используемый в URL-адресах.
+    slug (str): Уникальный слаг из имени, используемый в URL-адресах.
     image (ImageField): Изображение, представляющее категорию.
 
     Методы:
@@ -19,7 +20,7 @@ class Category(BaseModel):
     """
 
     name = models.CharField(max_length=100, unique=True)
-    slug = AutoSlugField(populate_from='name', always_update=True)
+    slug = UniqueSlugField(populate_from='name', always_update=True)
     image = models.ImageField(upload_to='category_images/')
 
     def __str__(self):
@@ -29,14 +30,14 @@ class Category(BaseModel):
         verbose_name_plural = "Categories"
 
 
-class Product(IsDeletedModel):
+class Product(UniqueSlugMixin, IsDeletedModel):
     """
     Поля для продукта.
 
     Атрибуты:
     seller (ForeignKey): Пользователь, продающий продукт.
     name (str): Название продукта.
-    slug (str): Слаг, сгенерированный из названия, используемый в URL-адресах.
+    slug (str): Уникальный слаг из названия, используемый в URL-адресах.
     desc (str): Описание продукта.
     price_old (Decimal): Первоначальная цена продукта.
     price_current (Decimal): Текущая цена продукта.
@@ -45,12 +46,18 @@ class Product(IsDeletedModel):
     image1 (ImageField): Первое изображение продукта.
     image2 (ImageField): Второе изображение продукта.
     image3 (ImageField): Третье изображение продукта.
+    rating_avg (float): Средняя оценка по активным отзывам.
+    rating_count (int): Количество активных отзывов.
+    rating_1 ... rating_5 (int): Количество отзывов с каждой оценкой.
+
+    Поля рейтинга обновляются сигналами отзывов
+    (см. apps.reviews.signals).
     """
 
     seller = models.ForeignKey(
         Seller, on_delete=models.SET_NULL, related_name='products', null=True)
     name = models.CharField(max_length=100)
-    slug = AutoSlugField(populate_from="name", db_index=True)
+    slug = UniqueSlugField(populate_from="name")
     desc = models.TextField()
     price_old = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     price_current = models.DecimalField(max_digits=10, decimal_places=2)
@@ -63,5 +70,76 @@ class Product(IsDeletedModel):
     image2 = models.ImageField(upload_to='product_images/', blank=True)
     image3 = models.ImageField(upload_to='product_images/', blank=True)
 
+    # Денормализованный рейтинг, чтобы не считать AVG на каждый запрос.
+    rating_avg = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    class Meta(IsDeletedModel.Meta):
+        indexes = [
+            # Ключ курсорной пагинации каталога. Частичный индекс:
+            # менеджер всегда добавляет NOT is_deleted, а по такому
+            # условию SQLite не может искать в обычном индексе.
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_deleted=False),
+                name='shop_product_live_created_idx'),
+            # Сортировка по умолчанию (-id) и COUNT(*) постраничного
+            # вывода. is_deleted в ключе делает индекс покрывающим.
+            models.Index(
+                fields=['id', 'is_deleted'],
+                condition=models.Q(is_deleted=False),
+                name='shop_product_live_id_idx'),
+            # Сортировки и фильтры ProductFilter по цене и наличию.
+            models.Index(
+                fields=['price_current', 'id'],
+                condition=models.Q(is_deleted=False),
+                name='shop_product_live_price_idx'),
+            models.Index(
+                fields=['in_stock', 'id'],
+                condition=models.Q(is_deleted=False),
+                name='shop_product_live_stock_idx'),
+            models.Index(
+                fields=['rating_avg', 'id'],
+                condition=models.Q(is_deleted=False),
+                name='shop_product_live_rating_idx'),
+            # Инкрементальная выгрузка (since) по всем продуктам,
+            # включая мягко удаленные.
+            models.Index(
+                fields=['updated_at', 'id'],
+                name='shop_product_updated_idx'),
+        ]
+
     def __str__(self):
         return str(self.name)
+
+
+class ProductTombstone(models.Model):
+    """
+    След жестко удаленного продукта для инкрементальной выгрузки
+    (apps.shop.export). Мягко удаленный продукт остается в таблице
+    продуктов с is_deleted, а от жестко удаленного остается только
+    эта строка.
+
+    Attributes:
+        id (UUID): id удаленного продукта.
+        deleted_at (DateTimeField): Время удаления; вместе с id — курсор
+            выгрузки, как updated_at у продуктов.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['deleted_at', 'id'],
+                name='shop_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.id)
@@ -2,6 +2,25 @@ from drf_spectacular.utils import OpenApiParameter, OpenApiTypes
 from core import settings
 
 
+PRODUCT_FIELDS_PARAM_EXAMPLE = [
+    OpenApiParameter(
+        name='fields',
+        description=(
+            'Поля продукта в ответе через запятую, например '
+            'id,name,slug,price_current,image1.'
+        ),
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+    OpenApiParameter(
+        name='omit',
+        description='Поля продукта, которые исключить из ответа.',
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+]
+
+
 PRODUCT_PARAM_EXAMPLE = [
     OpenApiParameter(
         name='max_price',
@@ -27,6 +46,25 @@ PRODUCT_PARAM_EXAMPLE = [
         required=False,
         type=OpenApiTypes.DATE,
     ),
+    OpenApiParameter(
+        name='min_rating',
+        description='Фильтр продукта по минимальной средней оценке.',
+        required=False,
+        type=OpenApiTypes.NUMBER,
+    ),
+    OpenApiParameter(
+        name='ordering',
+        description=(
+            'Сортировка: price, -price (по цене), newest (сначала новые), '
+            'stock, -stock (по наличию), rating, -rating (по рейтингу).'
+        ),
+        required=False,
+        type=OpenApiTypes.STR,
+        enum=[
+            'price', '-price', 'newest', 'stock', '-stock',
+            'rating', '-rating',
+        ],
+    ),
     OpenApiParameter(
         name='page',
         description='Получить определенную страницу. По умолчанию 1',
@@ -42,5 +80,95 @@ PRODUCT_PARAM_EXAMPLE = [
         ),
         required=False,
         type=OpenApiTypes.INT,
-    )
+    ),
+    OpenApiParameter(
+        name='facets',
+        description=(
+            'Фасеты через запятую: category, seller, price. '
+            'Добавляет в ответ количество продуктов по значениям фасета.'
+        ),
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+    OpenApiParameter(
+        name='pagination',
+        description=(
+            'Режим пагинации. Значение cursor включает постраничный '
+            'вывод по курсору.'
+        ),
+        required=False,
+        type=OpenApiTypes.STR,
+        enum=['cursor'],
+    ),
+    OpenApiParameter(
+        name='cursor',
+        description=(
+            'Курсор страницы из ссылок next/previous. '
+            'Действителен только с тем же фильтром.'
+        ),
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+] + PRODUCT_FIELDS_PARAM_EXAMPLE
+
+
+PRODUCT_SEARCH_PARAM_EXAMPLE = [
+    OpenApiParameter(
+        name='q',
+        description=(
+            'Поисковый запрос по названию, описанию и категории. '
+            'Каждое слово ищется по началу слова.'
+        ),
+        required=True,
+        type=OpenApiTypes.STR,
+    ),
+] + [
+    param for param in PRODUCT_PARAM_EXAMPLE
+    if param.name not in ('facets', 'pagination', 'cursor')
+]
+
+
+LIST_PARAM_EXAMPLE = [
+    param for param in PRODUCT_PARAM_EXAMPLE
+    if param.name in ('page', 'page_size')
+] + [
+    OpenApiParameter(
+        name='stream',
+        description=(
+            'true — вернуть всю выборку потоковым JSON-массивом '
+            'без пагинации.'
+        ),
+        required=False,
+        type=OpenApiTypes.BOOL,
+    ),
+]
+
+
+PRODUCT_EXPORT_PARAM_EXAMPLE = [
+    OpenApiParameter(
+        name='type',
+        description='Формат выгрузки. По умолчанию ndjson.',
+        required=False,
+        type=OpenApiTypes.STR,
+        enum=['ndjson', 'csv'],
+    ),
+    OpenApiParameter(
+        name='since',
+        description=(
+            'updated_at последней полученной строки (ISO 8601). '
+            'Выгрузить только продукты, измененные начиная с этого '
+            'момента, включая удаленные.'
+        ),
+        required=False,
+        type=OpenApiTypes.DATETIME,
+    ),
+    OpenApiParameter(
+        name='after_id',
+        description=(
+            'id последней полученной строки. Вместе с since выгружает '
+            'строки строго после нее в порядке (updated_at, id).'
+        ),
+        required=False,
+        type=OpenApiTypes.UUID,
+    ),
 ]
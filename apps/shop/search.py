@@ -0,0 +1,113 @@
+"""
+Полнотекстовый поиск продуктов на SQLite FTS5.
+
+Индекс shop_product_fts — FTS5 с внешним содержимым: название,
+описание и имя категории продукта лежат в обычной таблице
+shop_product_search, а триггеры на ней поддерживают индекс. Строка
+связана с продуктом по product_id (уникальный индекс), а не по rowid
+shop_product: rowid меняются при VACUUM и при перестроении таблицы
+миграциями. Ключ строки индекса — INTEGER PRIMARY KEY
+shop_product_search, его VACUUM сохраняет.
+"""
+import re
+
+from django.db import connection
+
+
+SEARCH_TABLE = 'shop_product_search'
+FTS_TABLE = 'shop_product_fts'
+
+# Вес столбцов для bm25: name, desc, category.
+RANK_EXPRESSION = f'bm25({FTS_TABLE}, 10.0, 1.0, 4.0)'
+
+_INSERT_SQL = f"""
+    INSERT INTO {SEARCH_TABLE} (product_id, name, "desc", category)
+    SELECT p.id, p.name, p."desc", c.name
+    FROM shop_product p
+    INNER JOIN shop_category c ON c.id = p.category_id
+    WHERE NOT p.is_deleted
+"""
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(text):
+    """
+    Превратить пользовательский ввод в выражение MATCH.
+
+    Каждое слово ищется как префикс, все слова обязательны. Служебный
+    синтаксис FTS5 из ввода не пропускается, поэтому запрос не может
+    вызвать синтаксическую ошибку.
+    """
+    tokens = _TOKEN_RE.findall(text or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def index_product(product_id):
+    """Переиндексировать продукт (или убрать его, если он удален)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE product_id = %s',
+            [product_id.hex])
+        cursor.execute(_INSERT_SQL + ' AND p.id = %s', [product_id.hex])
+
+
+def index_new_products(product_ids):
+    """
+    Добавить в индекс новые продукты одним INSERT ... SELECT
+    (bulk_create не отправляет post_save).
+    """
+    ids = [product_id.hex for product_id in product_ids]
+    if not ids:
+        return
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(_INSERT_SQL + f' AND p.id IN ({placeholders})', ids)
+
+
+def remove_product(product_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE product_id = %s',
+            [product_id.hex])
+
+
+def index_category(category_id):
+    """Переиндексировать все продукты категории (после переименования)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE product_id IN '
+            '(SELECT id FROM shop_product WHERE category_id = %s)',
+            [category_id.hex])
+        cursor.execute(
+            _INSERT_SQL + ' AND p.category_id = %s', [category_id.hex])
+
+
+def rebuild_index():
+    """Перестроить индекс целиком одним INSERT ... SELECT."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(_INSERT_SQL)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def search_products(queryset, match):
+    """
+    Ограничить queryset продуктов результатами поиска.
+
+    Добавляет столбец search_rank (bm25, меньше — релевантнее).
+    """
+    opts = queryset.model._meta
+    return queryset.extra(
+        tables=[SEARCH_TABLE, FTS_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.product_id = {opts.db_table}.{opts.pk.column}',
+            f'{FTS_TABLE}.rowid = {SEARCH_TABLE}.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[match],
+        select={'search_rank': RANK_EXPRESSION},
+    )
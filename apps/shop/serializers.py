@@ -1,15 +1,33 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
+from apps.common.images import image_srcset
+from apps.common.serializers import (
+    DynamicFieldsModelSerializer,
+    FileUrlField,
+    NestedValues,
+    ValuesField,
+    ValuesMethodField,
+    ValuesSerializer)
 from .models import Category, Product
+from apps.profiles.models import order_totals
 from apps.sellers.serializers import SellerSerializer
 from apps.profiles.serializers import ShippingAddressSerializer
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
-        fields = ('name', 'slug', 'image')
+        fields = ('name', 'slug', 'image', 'image_variants')
+
+    @extend_schema_field(serializers.DictField(
+        child=serializers.CharField(), allow_null=True))
+    def get_image_variants(self, obj):
+        return image_srcset(
+            obj.image.storage, obj.image.name, obj.updated_at)
 
 
 class SellerShopSerializer(serializers.Serializer):
@@ -18,12 +36,40 @@ class SellerShopSerializer(serializers.Serializer):
     avatar = serializers.CharField(source='user.avatar')
 
 
-class ProductSerializer(serializers.ModelSerializer):
-    average_rating = serializers.FloatField(read_only=True)
+class ProductSerializer(DynamicFieldsModelSerializer):
+    average_rating = serializers.FloatField(
+        source='rating_avg', read_only=True)
+    rating_histogram = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = (
+            'rating_avg',
+            'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+        )
+        field_columns = {
+            'rating_histogram': (
+                'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+            ),
+            'image_variants': ('image1', 'image2', 'image3', 'updated_at'),
+        }
+
+    @extend_schema_field(serializers.DictField(
+        child=serializers.IntegerField()))
+    def get_rating_histogram(self, obj):
+        return {str(star): getattr(obj, f'rating_{star}')
+                for star in range(1, 6)}
+
+    @extend_schema_field(serializers.DictField(
+        child=serializers.DictField(
+            child=serializers.CharField(), allow_null=True)))
+    def get_image_variants(self, obj):
+        return {
+            name: image_srcset(getattr(obj, name).storage,
+                               getattr(obj, name).name, obj.updated_at)
+            for name in ('image1', 'image2', 'image3')
+        }
 
 
 class CreateProductSerializer(serializers.Serializer):
@@ -37,6 +83,68 @@ class CreateProductSerializer(serializers.Serializer):
     image3 = serializers.ImageField(required=False)
 
 
+class StoredFileField(serializers.CharField):
+    """
+    Имя уже загруженного файла. Принимает и URL из выгрузки каталога
+    (MEDIA_URL + имя).
+    """
+
+    def to_internal_value(self, data):
+        name = super().to_internal_value(data)
+        if name.startswith(settings.MEDIA_URL):
+            name = name[len(settings.MEDIA_URL):]
+        if name and not default_storage.exists(name):
+            raise serializers.ValidationError('Файл не найден.')
+        return name
+
+
+class ImportProductSerializer(CreateProductSerializer):
+    """Строка массового импорта продуктов (см. apps.shop.bulk)."""
+    price_old = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False, allow_null=True)
+    in_stock = serializers.IntegerField(min_value=0)
+    image1 = StoredFileField()
+    image2 = StoredFileField(required=False, allow_blank=True)
+    image3 = StoredFileField(required=False, allow_blank=True)
+
+
+class ImportProductsFileSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    type = serializers.ChoiceField(
+        choices=('csv', 'ndjson'), required=False,
+        help_text='Формат файла. По умолчанию определяется по расширению.')
+
+
+# Позиций в одном запросе массового обновления: все они применяются
+# одним UPDATE (см. apps.shop.bulk.update_products).
+BULK_UPDATE_MAX_ITEMS = 1000
+
+
+class BulkProductUpdateItemSerializer(serializers.Serializer):
+    slug = serializers.SlugField()
+    price_current = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False)
+    in_stock = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if 'price_current' not in attrs and 'in_stock' not in attrs:
+            raise serializers.ValidationError(
+                'Укажите price_current или in_stock.')
+        return attrs
+
+
+class BulkProductUpdateSerializer(serializers.Serializer):
+    items = BulkProductUpdateItemSerializer(
+        many=True, allow_empty=False, max_length=BULK_UPDATE_MAX_ITEMS)
+
+    def validate_items(self, items):
+        slugs = [item['slug'] for item in items]
+        if len(set(slugs)) != len(slugs):
+            raise serializers.ValidationError(
+                'Каждый продукт можно указать только один раз.')
+        return items
+
+
 class OrderItemProductSerializer(serializers.Serializer):
     seller = SellerSerializer()
     name = serializers.CharField()
@@ -57,6 +165,22 @@ class ToggleCartItemSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=0)
 
 
+# Позиций в одном пакетном изменении корзины (см. apps.shop.cart).
+CART_BULK_MAX_ITEMS = 200
+
+
+class BulkCartSerializer(serializers.Serializer):
+    items = ToggleCartItemSerializer(
+        many=True, allow_empty=False, max_length=CART_BULK_MAX_ITEMS)
+
+    def validate_items(self, items):
+        slugs = [item['slug'] for item in items]
+        if len(set(slugs)) != len(slugs):
+            raise serializers.ValidationError(
+                'Каждый продукт можно указать только один раз.')
+        return items
+
+
 class CheckoutSerializer(serializers.Serializer):
     shipping_id = serializers.UUIDField()
 
@@ -98,3 +222,166 @@ class CheckItemOrderSerializer(serializers.Serializer):
     product = ItemProductSerializer()
     quantity = serializers.IntegerField()
     total = serializers.FloatField(source='get_total')
+
+
+# Быстрые сериализаторы только для чтения по строкам values().
+# Ответ совпадает с ProductSerializer, OrderItemSerializer и
+# OrderSerializer соответственно.
+
+
+def _image(name):
+    return ValuesField(name, FileUrlField(Product._meta.get_field(name)))
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    columns = {
+        'id': ValuesField('id', serializers.UUIDField()),
+        'average_rating': ValuesField(
+            'rating_avg', serializers.FloatField()),
+        'rating_histogram': ValuesMethodField(
+            'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5'),
+        'image_variants': ValuesMethodField(
+            'image1', 'image2', 'image3', 'updated_at'),
+        'created_at': ValuesField('created_at', serializers.DateTimeField()),
+        'updated_at': ValuesField('updated_at', serializers.DateTimeField()),
+        'is_deleted': ValuesField('is_deleted', serializers.BooleanField()),
+        'deleted_at': ValuesField('deleted_at', serializers.DateTimeField()),
+        'name': ValuesField('name', serializers.CharField()),
+        'slug': ValuesField('slug', serializers.SlugField()),
+        'desc': ValuesField('desc', serializers.CharField()),
+        'price_old': ValuesField('price_old', serializers.DecimalField(
+            max_digits=10, decimal_places=2)),
+        'price_current': ValuesField(
+            'price_current', serializers.DecimalField(
+                max_digits=10, decimal_places=2)),
+        'in_stock': ValuesField('in_stock', serializers.IntegerField()),
+        'image1': _image('image1'),
+        'image2': _image('image2'),
+        'image3': _image('image3'),
+        'rating_count': ValuesField(
+            'rating_count', serializers.IntegerField()),
+        'seller': ValuesField('seller'),
+        'category': ValuesField('category'),
+    }
+
+    def get_rating_histogram(self, values):
+        return {str(star): values[f'rating_{star}'] for star in range(1, 6)}
+
+    def get_image_variants(self, values):
+        return {
+            name: image_srcset(
+                Product._meta.get_field(name).storage, values[name],
+                values['updated_at'])
+            for name in ('image1', 'image2', 'image3')
+        }
+
+
+class SellerValuesSerializer(ValuesSerializer):
+    columns = {
+        name: ValuesField(name, field)
+        for name, field in SellerSerializer().fields.items()
+    }
+
+
+class OrderItemProductValuesSerializer(ValuesSerializer):
+    columns = {
+        'seller': NestedValues(
+            SellerValuesSerializer, 'seller', null_lookup='id'),
+        'name': ValuesField('name', serializers.CharField()),
+        'slug': ValuesField('slug', serializers.SlugField()),
+        'price': ValuesField('price_current', serializers.DecimalField(
+            max_digits=10, decimal_places=2)),
+    }
+
+
+class OrderItemValuesSerializer(ValuesSerializer):
+    columns = {
+        'product': NestedValues(OrderItemProductValuesSerializer, 'product'),
+        'quantity': ValuesField('quantity', serializers.IntegerField()),
+        'total': ValuesMethodField(
+            'unit_price', 'product__price_current', 'quantity'),
+    }
+    total_field = serializers.FloatField()
+
+    def get_total(self, values):
+        # Как OrderItem.get_total: цена на момент оформления заказа.
+        price = values['unit_price']
+        if price is None:
+            price = values['product__price_current']
+        return self.total_field.to_representation(price * values['quantity'])
+
+
+class ShippingValuesSerializer(ValuesSerializer):
+    columns = {
+        name: ValuesField(name, field)
+        for name, field in ShippingAddressSerializer().fields.items()
+    }
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    columns = {
+        'tx_ref': ValuesField('tx_ref', serializers.CharField()),
+        'first_name': ValuesField(
+            'user__first_name', serializers.CharField()),
+        'last_name': ValuesField('user__last_name', serializers.CharField()),
+        'email': ValuesField('user__email', serializers.EmailField()),
+        'delivery_status': ValuesField(
+            'delivery_status', serializers.CharField()),
+        'payment_status': ValuesField(
+            'payment_status', serializers.CharField()),
+        'date_delivered': ValuesField(
+            'date_delivered', serializers.DateTimeField()),
+        'shipping_details': NestedValues(ShippingValuesSerializer),
+        'subtotal': ValuesMethodField('id', 'subtotal'),
+        'total': ValuesMethodField('id', 'total'),
+    }
+    total_field = serializers.DecimalField(max_digits=100, decimal_places=2)
+
+    def prepare(self, rows):
+        # Суммы хранятся в заказе. Заказы, оформленные до этого и еще
+        # не обработанные backfill_order_totals, считаются одним
+        # запросом на пачку, как Order.get_cart_total.
+        pending = [
+            row['id'] for row in rows
+            if row['subtotal'] is None or row['total'] is None
+        ]
+        self.totals = order_totals(pending) if pending else {}
+
+    def _get_amount(self, values, name):
+        amount = values[name]
+        if amount is None:
+            amount = self.totals.get(values['id']) or 0
+        return self.total_field.to_representation(amount)
+
+    def get_subtotal(self, values):
+        return self._get_amount(values, 'subtotal')
+
+    def get_total(self, values):
+        return self._get_amount(values, 'total')
+
+
+class SellerOrderValuesSerializer(ValuesSerializer):
+    """
+    Заказ продавца по строке SellerOrder. Поля как у
+    OrderValuesSerializer, но суммы — только по товарам продавца.
+    """
+    columns = {
+        'tx_ref': ValuesField('order__tx_ref', serializers.CharField()),
+        'first_name': ValuesField(
+            'order__user__first_name', serializers.CharField()),
+        'last_name': ValuesField(
+            'order__user__last_name', serializers.CharField()),
+        'email': ValuesField('order__user__email', serializers.EmailField()),
+        'delivery_status': ValuesField(
+            'delivery_status', serializers.CharField()),
+        'payment_status': ValuesField(
+            'payment_status', serializers.CharField()),
+        'date_delivered': ValuesField(
+            'order__date_delivered', serializers.DateTimeField()),
+        'shipping_details': NestedValues(ShippingValuesSerializer, 'order'),
+        'subtotal': ValuesField('subtotal', serializers.DecimalField(
+            max_digits=100, decimal_places=2)),
+        'total': ValuesField('subtotal', serializers.DecimalField(
+            max_digits=100, decimal_places=2)),
+        'item_count': ValuesField('item_count', serializers.IntegerField()),
+    }
@@ -0,0 +1,179 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.common.cache import GLOBAL_SCOPE, response_cache
+from apps.common.images import schedule_variants, variants_ready
+from apps.common.slugs import category_slugs, product_slugs, seller_slugs
+from apps.reviews.models import Review
+from apps.sellers.models import Seller
+from apps.shop import search
+from apps.shop.models import Category, Product, ProductTombstone
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Мягко удаленный продукт index_product просто уберет из индекса.
+    search.index_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product_on_delete(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def bury_product_on_delete(sender, instance, **kwargs):
+    # Жесткое удаление: выгрузка сообщит о нем надгробием.
+    ProductTombstone.objects.create(id=instance.pk)
+
+
+def _changed(instance, *fields):
+    loaded = getattr(instance, '_loaded_values', None)
+    return loaded is None or any(
+        loaded.get(field) != getattr(instance, field) for field in fields)
+
+
+def _touch_products(**filters):
+    # Колонки категории и продавца входят в выгрузку продуктов: сдвиг
+    # updated_at отправляет продукты в инкрементальную выгрузку.
+    Product.objects.unfiltered().filter(**filters).update(
+        updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Category)
+def touch_products_on_category_rename(sender, instance, created, raw=False,
+                                      **kwargs):
+    if raw or created or not _changed(instance, 'name', 'slug'):
+        return
+    _touch_products(category_id=instance.pk)
+
+
+@receiver(post_save, sender=Seller)
+def touch_products_on_seller_rename(sender, instance, created, raw=False,
+                                    **kwargs):
+    if raw or created or not _changed(instance, 'business_name', 'slug'):
+        return
+    _touch_products(seller_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Seller)
+def touch_products_on_seller_delete(sender, instance, **kwargs):
+    # SET_NULL обнулит seller_id продуктов UPDATE без updated_at.
+    _touch_products(seller_id=instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None and loaded.get('name') == instance.name:
+        return
+    search.index_category(instance.pk)
+
+
+def _product_scopes(product_id, category_id, seller_id):
+    scopes = {f'product:{product_id}', f'category:{category_id}'}
+    if seller_id is not None:
+        scopes.add(f'seller:{seller_id}')
+    return scopes
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_product_cache(sender, instance, **kwargs):
+    scopes = _product_scopes(
+        instance.pk, instance.category_id, instance.seller_id)
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None:
+        # Продукт мог уйти из прежней категории или от продавца.
+        scopes |= _product_scopes(
+            instance.pk, loaded.get('category_id'), loaded.get('seller_id'))
+    response_cache.bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_review_cache(sender, instance, **kwargs):
+    # Рейтинг продукта попадает и в карточку, и в списки.
+    product_ids = {instance.product_id}
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None:
+        product_ids.add(loaded.get('product_id'))
+    rows = Product.objects.unfiltered().filter(
+        pk__in=product_ids).values_list('pk', 'category_id', 'seller_id')
+    scopes = set()
+    for row in rows:
+        scopes |= _product_scopes(*row)
+    response_cache.bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_category_cache(sender, instance, **kwargs):
+    # Список категорий кэшируется в глобальной области.
+    response_cache.bump_on_commit(GLOBAL_SCOPE, f'category:{instance.pk}')
+
+
+@receiver(variants_ready, sender=Product)
+def touch_product_on_variants_ready(sender, pk, **kwargs):
+    # srcset в ответах изменился, а поля продукта — нет: без сдвига
+    # updated_at и версий кэша отдавался бы оригинал вместо вариантов.
+    products = Product.objects.unfiltered().filter(pk=pk)
+    row = products.values_list('pk', 'category_id', 'seller_id').first()
+    if row is None:
+        return
+    products.update(updated_at=timezone.now())
+    response_cache.bump_on_commit(*_product_scopes(*row))
+
+
+@receiver(variants_ready, sender=Category)
+def touch_category_on_variants_ready(sender, pk, **kwargs):
+    if Category.objects.filter(pk=pk).update(updated_at=timezone.now()):
+        response_cache.bump_on_commit(GLOBAL_SCOPE, f'category:{pk}')
+
+
+@receiver(post_save, sender=Seller)
+@receiver(post_delete, sender=Seller)
+def bump_seller_cache(sender, instance, **kwargs):
+    response_cache.bump_on_commit(f'seller:{instance.pk}')
+
+
+RESOLVERS_BY_MODEL = {
+    Product: product_slugs,
+    Category: category_slugs,
+    Seller: seller_slugs,
+}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Seller)
+@receiver(post_delete, sender=Seller)
+def invalidate_slug(sender, instance, **kwargs):
+    # Новый слаг мог быть закэширован как несуществующий, прежний
+    # (always_update у категорий и продавцов) — указывать на объект.
+    slugs = {instance.slug}
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None:
+        slugs.add(loaded.get('slug'))
+    RESOLVERS_BY_MODEL[sender].invalidate(*slugs)
+
+
+@receiver(post_save, sender=Product)
+def generate_product_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_variants(instance, 'image1', 'image2', 'image3')
+
+
+@receiver(post_save, sender=Category)
+def generate_category_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_variants(instance, 'image')
@@ -1,3 +1,687 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.common.cache import response_cache
+from apps.common.images import clear_widths_cache, image_srcset, notify_ready
+from apps.profiles.models import Order, OrderItem
+from apps.sellers.models import Seller
+from apps.shop import checkout as checkout_module
+from apps.shop.bulk import resolve_owned, update_products
+from apps.shop.cart import upsert_cart_items
+from apps.shop.checkout import CartChangedError, OutOfStockError, checkout
+from apps.shop.export import export_queryset, export_rows, iter_rows
+from apps.shop.facets import compute_facets
+from apps.shop.models import Category, Product
+from apps.shop.search import (
+    build_match_query, rebuild_index, search_products)
+from apps.shop.serializers import (
+    OrderItemSerializer,
+    OrderItemValuesSerializer,
+    ProductSerializer,
+    ProductValuesSerializer)
+
+
+def create_user(email):
+    return User.objects.create_user(
+        first_name='Тест', last_name='Тестов', email=email,
+        password='password', avatar='')
+
+
+def create_seller(email, business_name='Магазин'):
+    return Seller.objects.create(
+        user=create_user(email), business_name=business_name)
+
+
+def create_product(name='Товар', in_stock=5, price='10.00', seller=None,
+                   category=None, **kwargs):
+    if category is None:
+        category = Category.objects.create(name=f'Категория {name}')
+    return Product.objects.create(
+        name=name, desc='Описание', price_current=Decimal(price),
+        in_stock=in_stock, category=category, seller=seller, **kwargs)
+
+
+def run_concurrently(count, target):
+    """
+    Выполнить target(i) в count потоках одновременно.
+    Возвращает результаты (или исключения) в порядке i.
+    """
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        try:
+            barrier.wait()
+            results[i] = target(i)
+        except Exception as exc:
+            results[i] = exc
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = create_seller('seller@example.com')
+
+    def test_last_unit_is_sold_once(self):
+        product = create_product(in_stock=1, seller=self.seller)
+        users = [create_user(f'buyer{i}@example.com') for i in range(8)]
+        for user in users:
+            OrderItem.objects.create(user=user, product=product, quantity=1)
+
+        results = run_concurrently(
+            len(users), lambda i: checkout(users[i], {}))
+
+        orders = [result for result in results if isinstance(result, Order)]
+        rejected = [result for result in results
+                    if isinstance(result, OutOfStockError)]
+        self.assertEqual(len(orders), 1, results)
+        self.assertEqual(len(rejected), len(users) - 1, results)
+        product.refresh_from_db()
+        self.assertEqual(product.in_stock, 0)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.filter(order=None).count(),
+                         len(users) - 1)
+
+    def test_stock_is_never_oversold(self):
+        product = create_product(in_stock=5, seller=self.seller)
+        users = [create_user(f'buyer{i}@example.com') for i in range(10)]
+        for user in users:
+            OrderItem.objects.create(user=user, product=product, quantity=2)
+
+        run_concurrently(len(users), lambda i: checkout(users[i], {}))
+
+        product.refresh_from_db()
+        sold = sum(OrderItem.objects.exclude(order=None)
+                   .values_list('quantity', flat=True))
+        self.assertEqual(sold, 4)
+        self.assertEqual(product.in_stock, 1)
+
+
+class CheckoutCartChangedTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('buyer@example.com')
+        self.product = create_product(in_stock=3)
+        self.item = OrderItem.objects.create(
+            user=self.user, product=self.product, quantity=1)
+
+    def checkout_with_change(self, change):
+        """Оформить заказ, изменив корзину сразу после ее чтения."""
+        get_cart = checkout_module.get_cart
+
+        def stale_get_cart(user):
+            cart = get_cart(user)
+            change()
+            return cart
+
+        with mock.patch.object(checkout_module, 'get_cart', stale_get_cart):
+            return checkout(self.user, {})
+
+    def assert_nothing_changed(self, quantity):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.in_stock, 3)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(
+            list(OrderItem.objects.filter(order=None)
+                 .values_list('quantity', flat=True)),
+            [quantity])
+
+    def test_quantity_changed_after_read(self):
+        def change():
+            OrderItem.objects.filter(pk=self.item.pk).update(quantity=50)
+
+        with self.assertRaises(CartChangedError):
+            self.checkout_with_change(change)
+        self.assert_nothing_changed(50)
+
+    def test_line_removed_after_read(self):
+        def change():
+            OrderItem.objects.filter(pk=self.item.pk).delete()
+
+        with self.assertRaises(CartChangedError):
+            self.checkout_with_change(change)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.in_stock, 3)
+        self.assertFalse(Order.objects.exists())
+
+    def test_unchanged_cart(self):
+        order = self.checkout_with_change(lambda: None)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.in_stock, 2)
+        self.assertEqual(order.subtotal, Decimal('10.00'))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.order_id, order.pk)
+        self.assertEqual(self.item.unit_price, Decimal('10.00'))
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class ProductValuesParityTests(TestCase):
+    """Ответ по строкам values() совпадает с ProductSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = create_seller('seller@example.com')
+        category = Category.objects.create(name='Одежда')
+        create_product(
+            'Куртка', seller=seller, category=category, price='1999.90',
+            price_old=Decimal('2500'), image1='product_images/a.jpg',
+            image3='product_images/c.png', rating_avg=4.5, rating_count=2,
+            rating_4=1, rating_5=1)
+        create_product('Шапка', category=category, price='0.10')
+        create_product('Шарф', seller=seller, in_stock=0)
+        create_product('Удаленный', seller=seller).delete()
+
+    def assert_parity(self, fields=None):
+        queryset = Product.objects.all()
+        expected = ProductSerializer(
+            ProductSerializer.project(queryset, fields),
+            many=True, fields=fields).data
+        rows = ProductValuesSerializer.values(queryset, fields)
+        actual = ProductValuesSerializer(rows, many=True, fields=fields).data
+        self.assertEqual(render(actual), render(expected))
+
+    def test_all_fields(self):
+        self.assert_parity()
+
+    def test_sparse_fieldsets(self):
+        available = ProductSerializer.get_available_fields()
+        for fields in (
+                ['name'],
+                ['slug', 'price_current', 'price_old'],
+                ['image1', 'image2', 'image_variants'],
+                ['average_rating', 'rating_histogram', 'rating_count'],
+                ['seller', 'category', 'deleted_at'],
+                [name for name in available if name != 'id']):
+            with self.subTest(fields=fields):
+                self.assert_parity(fields)
+
+    def get_all_pages(self, query):
+        url = f'/shop/products/?pagination=cursor&page_size=2&{query}'
+        results = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            results.extend(response.data['results'])
+            url = response.data['next']
+        return results
+
+    def test_cursor_pagination_with_sparse_fields(self):
+        names = list(Product.objects.order_by(
+            '-created_at', '-id').values_list('name', flat=True))
+        self.assertEqual(
+            self.get_all_pages('fields=name'),
+            [{'name': name} for name in names])
+        pages = self.get_all_pages('omit=id')
+        self.assertEqual([row['name'] for row in pages], names)
+        self.assertNotIn('id', pages[0])
+
+
+class CartValuesParityTests(TestCase):
+    """Ответ корзины по строкам values() совпадает с OrderItemSerializer."""
+
+    def test_cart_items(self):
+        user = create_user('buyer@example.com')
+        seller = create_seller('seller@example.com')
+        for product, quantity in (
+                (create_product('Куртка', seller=seller, price='19.99'), 3),
+                (create_product('Шапка', price='0.10'), 1)):
+            OrderItem.objects.create(
+                user=user, product=product, quantity=quantity)
+
+        queryset = OrderItem.objects.filter(user=user, order=None)
+        expected = OrderItemSerializer(queryset, many=True).data
+        actual = OrderItemValuesSerializer(
+            OrderItemValuesSerializer.values(queryset), many=True).data
+        self.assertEqual(render(actual), render(expected))
+
+
+class CartUpsertConcurrencyTests(TransactionTestCase):
+
+    def test_concurrent_adds_leave_one_line(self):
+        user = create_user('buyer@example.com')
+        product = create_product()
+        quantities = (2, 5)
+
+        results = run_concurrently(
+            len(quantities),
+            lambda i: upsert_cart_items(user, {product.pk: quantities[i]}))
+
+        for result in results:
+            self.assertIsInstance(result, dict, results)
+        (first_id, first_created), (second_id, second_created) = [
+            result[product.pk] for result in results]
+        self.assertEqual(first_id, second_id)
+        # Строку создает ровно один запрос, второй ее обновляет.
+        self.assertEqual(sorted([first_created, second_created]),
+                         [False, True])
+        last_write = quantities[0] if second_created else quantities[1]
+        item = OrderItem.objects.get(user=user, order=None)
+        self.assertEqual(item.pk, first_id)
+        self.assertEqual(item.quantity, last_write)
+
+    def test_created_flag(self):
+        user = create_user('buyer@example.com')
+        in_cart, new = create_product('В корзине'), create_product('Новый')
+        existing = OrderItem.objects.create(
+            user=user, product=in_cart, quantity=1)
+        ordered = OrderItem.objects.create(
+            user=user, product=new, quantity=1,
+            order=Order.objects.create(user=user))
+
+        result = upsert_cart_items(user, {in_cart.pk: 3, new.pk: 4})
+
+        self.assertEqual(result[in_cart.pk], (existing.pk, False))
+        new_id, created = result[new.pk]
+        self.assertTrue(created)
+        # Строка оформленного заказа не попадает под ограничение.
+        self.assertNotEqual(new_id, ordered.pk)
+        self.assertEqual(
+            dict(OrderItem.objects.filter(user=user, order=None)
+                 .values_list('product_id', 'quantity')),
+            {in_cart.pk: 3, new.pk: 4})
+
+
+class CartUpsertQueryTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('buyer@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_upsert_is_one_statement(self):
+        products = [create_product(f'Товар {i}') for i in range(3)]
+        OrderItem.objects.create(
+            user=self.user, product=products[0], quantity=1)
+        # И новые, и уже лежащие в корзине товары — один INSERT.
+        with self.assertNumQueries(1):
+            result = upsert_cart_items(
+                self.user, {product.pk: 2 for product in products})
+        self.assertEqual(
+            [result[product.pk][1] for product in products],
+            [False, True, True])
+
+    def post(self, slug, quantity):
+        return self.client.post(
+            '/shop/cart/', {'slug': slug, 'quantity': quantity},
+            format='json')
+
+    def test_cart_add_and_update_cost_the_same(self):
+        product = create_product()
+        # Прогрев кэша слагов: удаление отсутствующей позиции.
+        self.post(product.slug, 0)
+        # Продукт по слагу и один INSERT ... ON CONFLICT, без чтения
+        # корзины перед записью.
+        for quantity, status in ((1, 201), (2, 200)):
+            with self.assertNumQueries(2):
+                response = self.post(product.slug, quantity)
+            self.assertEqual(response.status_code, status)
+        self.assertEqual(
+            OrderItem.objects.get(user=self.user, order=None).quantity, 2)
+
+    def test_bulk_cart_cost_does_not_grow_with_items(self):
+        products = [create_product(f'Товар {i}') for i in range(10)]
+        OrderItem.objects.create(
+            user=self.user, product=products[0], quantity=1)
+        OrderItem.objects.create(
+            user=self.user, product=products[1], quantity=1)
+        for count in (3, 10):
+            items = [{'slug': product.slug, 'quantity': 2}
+                     for product in products[:count]]
+            items[1]['quantity'] = 0
+            # Продукты по слагам, DELETE нулевых позиций и один INSERT
+            # ... ON CONFLICT в точке сохранения, затем вся корзина.
+            with self.assertNumQueries(6):
+                response = self.client.post(
+                    '/shop/cart/bulk/', {'items': items}, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(len(response.data['items']), count - 1)
+
+
+class ProductListQueryPlanTests(TestCase):
+    """
+    Запросы списка продуктов идут по индексам Product.Meta.indexes:
+    без полного просмотра shop_product и без сортировки во временном
+    B-дереве.
+    """
+
+    # Сортировки и фильтры со своей сортировкой: индекс отдает строки
+    # уже в нужном порядке.
+    ORDERED_QUERIES = (
+        '',
+        'ordering=price',
+        'ordering=-price',
+        'ordering=newest',
+        'ordering=stock',
+        'ordering=-stock',
+        'ordering=rating',
+        'ordering=-rating',
+        'min_price=1&max_price=50&ordering=price',
+        'in_stock=1&ordering=-stock',
+        'min_rating=3&ordering=-rating',
+        'created_at=2020-01-01T00:00:00&ordering=newest',
+        'pagination=cursor',
+        'pagination=cursor&ordering=-price',
+        'pagination=cursor&ordering=stock&fields=name',
+    )
+    # Фильтр по одной колонке при сортировке по другой: поиск по
+    # индексу фильтра, а сортировка результата неизбежна.
+    FILTERED_QUERIES = (
+        'min_price=1&max_price=50',
+        'in_stock=1',
+        'min_rating=3',
+        'created_at=2020-01-01T00:00:00',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Одежда')
+        for i in range(5):
+            create_product(f'Товар {i}', category=category, price=f'{i + 1}',
+                           rating_avg=4)
+
+    def get_plans(self, query):
+        """Планы всех запросов к shop_product, включая вторую страницу."""
+        url = f'/shop/products/?page_size=2&{query}'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            if response.data.get('next'):
+                self.client.get(response.data['next'])
+        plans = []
+        for query in queries.captured_queries:
+            if 'shop_product' not in query['sql']:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plans.append(
+                    (query['sql'], [row[-1] for row in cursor.fetchall()]))
+        self.assertTrue(plans)
+        return plans
+
+    def assert_no_full_scan(self, query, sql, plan):
+        for step in plan:
+            self.assertFalse(
+                step.startswith('SCAN shop_product') and 'INDEX' not in step,
+                f'{query}: полный просмотр\n{sql}\n{plan}')
+
+    def test_ordered_lists_use_indexes(self):
+        for query in self.ORDERED_QUERIES:
+            with self.subTest(query=query):
+                for sql, plan in self.get_plans(query):
+                    self.assert_no_full_scan(query, sql, plan)
+                    self.assertFalse(
+                        any('TEMP B-TREE' in step for step in plan),
+                        f'{query}: сортировка во временном B-дереве\n'
+                        f'{sql}\n{plan}')
+
+    def test_filters_use_indexes(self):
+        for query in self.FILTERED_QUERIES:
+            with self.subTest(query=query):
+                for sql, plan in self.get_plans(query):
+                    self.assert_no_full_scan(query, sql, plan)
+
+
+class ExportCursorTests(TestCase):
+
+    def test_resume_after_interrupted_export(self):
+        since = timezone.now() - timedelta(days=1)
+        products = [create_product(f'Товар {i}') for i in range(6)]
+        # Массовое обновление: у всех строк одно updated_at.
+        updated_at = since + timedelta(hours=1)
+        Product.objects.unfiltered().update(updated_at=updated_at)
+        products[0].delete()
+
+        def export(since, after_id=None):
+            return [row['id'] for row in
+                    iter_rows(export_queryset(since, after_id))]
+
+        full = export(since)
+        self.assertEqual(sorted(full), sorted(p.pk for p in products))
+        # Зеркало получило три строки и продолжает с последней.
+        received = full[:3]
+        rest = export(updated_at, received[-1])
+        self.assertEqual(received + rest, full)
+        # Без id курсора строки с тем же updated_at приходят повторно,
+        # но не теряются.
+        self.assertEqual(export(updated_at), full)
+
+
+class ExportChangesTests(TestCase):
+
+    def setUp(self):
+        self.since = timezone.now() - timedelta(days=1)
+        self.seller = create_seller('seller@example.com', 'Обувной')
+        self.category = Category.objects.create(name='Обувь')
+        self.boots = create_product(
+            'Сапоги', seller=self.seller, category=self.category)
+        self.scarf = create_product('Шарф')
+        Product.objects.unfiltered().update(updated_at=self.since)
+
+    def export(self):
+        # Курсор после обеих строк исходного состояния.
+        return list(export_rows(
+            self.since, max(self.boots.pk, self.scarf.pk)))
+
+    def test_category_and_seller_renames_are_exported(self):
+        self.category.name = 'Зимняя обувь'
+        self.category.save()
+        rows = self.export()
+        self.assertEqual(
+            [(row['id'], row['category_name']) for row in rows],
+            [(self.boots.pk, 'Зимняя обувь')])
+
+        self.seller.business_name = 'Теплый'
+        self.seller.save()
+        self.assertEqual(
+            [row['seller_name'] for row in self.export()], ['Теплый'])
+
+        self.seller.delete()
+        self.assertEqual(
+            [row['seller_name'] for row in self.export()], [None])
+
+    def test_hard_deletes_are_exported_as_tombstones(self):
+        deleted = {self.boots.pk, self.scarf.pk}
+        cursor = max(deleted)
+        self.scarf.hard_delete()
+        self.category.delete()
+        rows = list(export_rows(self.since, cursor))
+        self.assertEqual({row['id'] for row in rows}, deleted)
+        for row in rows:
+            self.assertTrue(row['is_deleted'])
+            self.assertIsNone(row['name'])
+        keys = [(row['updated_at'], row['id']) for row in rows]
+        self.assertEqual(keys, sorted(keys))
+        # Курсор последней строки: дальше ничего нет.
+        last = rows[-1]
+        self.assertEqual(
+            list(export_rows(last['updated_at'], last['id'])), [])
+
+
+class ProductSearchTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Обувь')
+        self.boots = create_product('Сапоги', category=self.category)
+        self.scarf = create_product('Шарф')
+
+    def search(self, text):
+        return list(search_products(
+            Product.objects.all(), build_match_query(text)
+        ).values_list('pk', flat=True))
+
+    def test_search_survives_renumbered_rowids(self):
+        # VACUUM и перестроение таблицы миграцией меняют rowid: здесь
+        # продукты обмениваются ими.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT id, rowid FROM shop_product WHERE id IN (%s, %s)',
+                [self.boots.pk.hex, self.scarf.pk.hex])
+            rowids = dict(cursor.fetchall())
+            cursor.execute(
+                'UPDATE shop_product SET rowid = -rowid WHERE id IN (%s, %s)',
+                list(rowids))
+            cursor.execute(
+                'UPDATE shop_product SET rowid = %s WHERE id = %s',
+                [rowids[self.scarf.pk.hex], self.boots.pk.hex])
+            cursor.execute(
+                'UPDATE shop_product SET rowid = %s WHERE id = %s',
+                [rowids[self.boots.pk.hex], self.scarf.pk.hex])
+        self.assertEqual(self.search('сапоги'), [self.boots.pk])
+        self.assertEqual(self.search('шарф'), [self.scarf.pk])
+
+    def test_index_follows_changes(self):
+        self.boots.name = 'Ботинки'
+        self.boots.save()
+        self.assertEqual(self.search('сапоги'), [])
+        self.assertEqual(self.search('ботинки'), [self.boots.pk])
+
+        self.category.name = 'Зимняя обувь'
+        self.category.save()
+        self.assertEqual(self.search('зимняя'), [self.boots.pk])
+
+        self.boots.delete()
+        self.assertEqual(self.search('ботинки'), [])
+        self.scarf.hard_delete()
+        self.assertEqual(self.search('шарф'), [])
+        self.assertEqual(rebuild_index(), 0)
+
+
+class FacetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shoes = Category.objects.create(name='Обувь')
+        cls.hats = Category.objects.create(name='Шапки')
+        cls.seller = create_seller('seller@example.com', 'Обувной')
+        for price in ('10', '2000', '2500', '60000'):
+            create_product(category=cls.shoes, seller=cls.seller,
+                           price=price)
+        create_product(category=cls.hats, price='999.99')
+        create_product(category=cls.hats, seller=cls.seller).delete()
+
+    def test_counts_in_one_grouped_query(self):
+        # GROUP BY по выборке и по одному in_bulk на категории и продавцов.
+        with self.assertNumQueries(3):
+            facets = compute_facets(
+                Product.objects.all(), ['category', 'seller', 'price'])
+        self.assertEqual(facets['category'], [
+            {'slug': self.shoes.slug, 'name': 'Обувь', 'count': 4},
+            {'slug': self.hats.slug, 'name': 'Шапки', 'count': 1},
+        ])
+        self.assertEqual(facets['seller'], [
+            {'slug': self.seller.slug, 'name': 'Обувной', 'count': 4},
+        ])
+        self.assertEqual(
+            [bucket['count'] for bucket in facets['price']], [2, 2, 0, 0, 1])
+
+    def test_facets_follow_filters(self):
+        response = self.client.get(
+            '/shop/products/?max_price=1000&facets=price,category,category')
+        self.assertEqual(response.status_code, 200, response.content)
+        facets = response.data['facets']
+        self.assertEqual(list(facets), ['price', 'category'])
+        self.assertEqual(
+            [(item['name'], item['count']) for item in facets['category']],
+            [('Обувь', 1), ('Шапки', 1)])
+
+
+class BulkUpdateTests(TestCase):
+
+    def test_single_update_statement(self):
+        seller = create_seller('seller@example.com')
+        products = [create_product(f'Товар {i}', seller=seller, price='10')
+                    for i in range(5)]
+        items = [{'slug': product.slug, 'price_current': Decimal(20 + i),
+                  'in_stock': i}
+                 for i, product in enumerate(products)]
+        items[4] = {'slug': products[4].slug, 'price_current': Decimal(10)}
+        owned, _, _ = resolve_owned(seller, [item['slug'] for item in items])
+
+        with CaptureQueriesContext(connection) as queries:
+            updated = update_products(seller, owned, items)
+
+        self.assertEqual(updated, 5)
+        self.assertEqual(
+            [query['sql'].split()[0] for query in queries
+             if 'UPDATE' in query['sql']], ['UPDATE'])
+        rows = {row['slug']: row for row in Product.objects.values(
+            'slug', 'price_current', 'price_old', 'in_stock')}
+        for i, product in enumerate(products[:4]):
+            row = rows[product.slug]
+            self.assertEqual(row['price_current'], Decimal(20 + i))
+            self.assertEqual(row['price_old'], Decimal(10))
+            self.assertEqual(row['in_stock'], i)
+        # Цена не изменилась: price_old и остаток остаются прежними.
+        row = rows[products[4].slug]
+        self.assertEqual(row['price_old'], None)
+        self.assertEqual(row['in_stock'], 5)
+
+
+class ImageVariantsTests(TestCase):
+
+    def setUp(self):
+        clear_widths_cache()
+        self.addCleanup(clear_widths_cache)
+        self.seller = create_seller('seller@example.com')
+        self.product = create_product(
+            seller=self.seller, image1='product_images/a.jpg')
+        self.storage = Product._meta.get_field('image1').storage
+
+    def srcset(self, changed_at):
+        return image_srcset(self.storage, 'product_images/a.jpg', changed_at)
+
+    def test_missing_variants_are_remembered(self):
+        changed_at = self.product.updated_at
+        with mock.patch.object(self.storage, 'open',
+                               side_effect=FileNotFoundError) as open_:
+            for _ in range(3):
+                srcset = self.srcset(changed_at)
+            self.assertEqual(open_.call_count, 1)
+            self.assertIsNone(srcset['webp'])
+            # Владелец изменился после промаха: файл проверяется снова.
+            self.srcset(timezone.now() + timedelta(seconds=1))
+            self.assertEqual(open_.call_count, 2)
+
+    def test_ready_variants_touch_product(self):
+        scopes = (f'product:{self.product.pk}',
+                  f'category:{self.product.category_id}',
+                  f'seller:{self.seller.pk}')
+        before = response_cache.get_versions(scopes)
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_ready('product_images/a.jpg', [(Product, self.product.pk)])
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertGreater(product.updated_at, self.product.updated_at)
+        for old, new in zip(before, response_cache.get_versions(scopes)):
+            self.assertNotEqual(old, new)
+
+    def test_ready_variants_touch_category(self):
+        category = self.product.category
+        before = response_cache.get_versions(['global'])
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_ready('category_images/a.jpg', [(Category, category.pk)])
+        category.refresh_from_db()
+        self.assertGreater(category.updated_at, self.product.updated_at)
+        self.assertNotEqual(response_cache.get_versions(['global']), before)
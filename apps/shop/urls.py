@@ -5,7 +5,9 @@ from apps.shop.views import (
     ProductView,
     ProductsView,
     ProductsByCategoryView,
-    ProductsBySellerView, CartView, CheckoutView)
+    ProductsBySellerView,
+    ProductsExportView,
+    ProductsSearchView, CartView, CartBulkView, CheckoutView)
 from apps.reviews.views import ReviewView
 from rest_framework import routers
 
@@ -19,8 +21,11 @@ urlpatterns = [
     path("categories/<slug:slug>/", ProductsByCategoryView.as_view()),
     path("sellers/<slug:slug>/", ProductsBySellerView.as_view()),
     path("products/", ProductsView.as_view()),
+    path("products/search/", ProductsSearchView.as_view()),
+    path("products/export/", ProductsExportView.as_view()),
     path("products/<slug:slug>/", ProductView.as_view()),
     path('', include(router.urls)),
     path('cart/', CartView.as_view()),
+    path('cart/bulk/', CartBulkView.as_view()),
     path('checkout/', CheckoutView.as_view()),
 ]
@@ -2,21 +2,44 @@ from drf_spectacular.utils import extend_schema
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Avg
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 
-from apps.common.paginations import CustomPagination
-from apps.shop.schema_examples import PRODUCT_PARAM_EXAMPLE
-from apps.reviews.models import Review
+from apps.common.cache import response_cache
+from apps.common.conditional import (
+    instance_validators, queryset_validators)
+from apps.common.idempotency import idempotent
+from apps.common.paginations import (
+    CustomPagination, KeysetPagination, paginated_response)
+from apps.common.slugs import (
+    category_slugs, product_slugs, seller_slugs)
+from apps.common.streaming import is_stream_requested, stream_json_list
+from apps.shop.schema_examples import (
+    LIST_PARAM_EXAMPLE,
+    PRODUCT_EXPORT_PARAM_EXAMPLE,
+    PRODUCT_FIELDS_PARAM_EXAMPLE,
+    PRODUCT_PARAM_EXAMPLE,
+    PRODUCT_SEARCH_PARAM_EXAMPLE)
+from apps.shop.cart import (
+    resolve_products, update_cart, upsert_cart_items)
+from apps.shop.checkout import (
+    CartChangedError, EmptyCartError, OutOfStockError, checkout)
+from apps.shop.export import (
+    EXPORT_TYPES, export_rows, parse_after_id, parse_since)
+from apps.shop.facets import compute_facets, parse_facets
 from apps.shop.filters import ProductFilter
-from apps.sellers.models import Seller
 from apps.shop.models import Category, Product
+from apps.shop.search import build_match_query, search_products
 from apps.profiles.models import OrderItem, ShippingAddress, Order
 from apps.shop.serializers import (
     CategorySerializer,
     ProductSerializer,
+    ProductValuesSerializer,
     OrderItemSerializer,
+    OrderItemValuesSerializer,
     ToggleCartItemSerializer,
-    CheckoutSerializer, OrderSerializer)
+    BulkCartSerializer,
+    CheckoutSerializer, OrderValuesSerializer)
 
 tags = ['Shop']
 
@@ -33,8 +56,15 @@ class CategoriesView(APIView):
     )
     def get(self, request, *args, **kwargs):
         categories = Category.objects.all()
-        serializer = self.serializer_class(categories, many=True)
-        return Response(data=serializer.data, status=200)
+        validators = queryset_validators(request, categories)
+        not_modified = validators.not_modified()
+        if not_modified:
+            return not_modified
+        cache_key, data = response_cache.get(request)
+        if data is None:
+            data = self.serializer_class(categories, many=True).data
+            response_cache.set(cache_key, data)
+        return validators.apply(Response(data=data, status=200))
 
     @extend_schema(
         summary='Создание категории',
@@ -43,6 +73,7 @@ class CategoriesView(APIView):
         """,
         tags=tags
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
@@ -60,19 +91,37 @@ class ProductsByCategoryView(APIView):
         operation_id="category_products",
         summary='Категория продукта',
         description="""
-            Эндпоинт возвращает все категории.
+            Эндпоинт возвращает продукты категории постранично.
         """,
-        tags=tags
+        tags=tags,
+        parameters=LIST_PARAM_EXAMPLE + PRODUCT_FIELDS_PARAM_EXAMPLE,
     )
     def get(self, request, *args, **kwargs):
-        category = Category.objects.get_or_none(slug=kwargs['slug'])
-        if not category:
+        category_id = category_slugs.resolve(kwargs['slug'])
+        if not category_id:
             return Response(
                 data={'message': 'Категории не существует!'}, status=404)
-        products = Product.objects.select_related(
-            'category', 'seller', 'seller__user').filter(category=category)
-        serializer = self.serializer_class(products, many=True)
-        return Response(data=serializer.data, status=200)
+        validators = queryset_validators(
+            request,
+            Product.objects.unfiltered().filter(category_id=category_id),
+            live=Q(is_deleted=False))
+        not_modified = validators.not_modified()
+        if not_modified:
+            return not_modified
+        fields = self.serializer_class.select_fields(request)
+        products = self.serializer_class.project(
+            Product.objects.filter(category_id=category_id), fields)
+        if is_stream_requested(request):
+            return validators.apply(stream_json_list(
+                products, self.serializer_class, fields=fields))
+        cache_key, data = response_cache.get(
+            request, [f'category:{category_id}'])
+        if data is None:
+            data = paginated_response(
+                request, products, self.serializer_class,
+                fields=fields).data
+            response_cache.set(cache_key, data)
+        return validators.apply(Response(data=data, status=200))
 
 
 class ProductsView(APIView):
@@ -84,51 +133,167 @@ class ProductsView(APIView):
         summary='Все продукты магазина',
         description="""
             Эндпоинт возвращает все продукты магазина.
+            С параметром pagination=cursor отдает страницы по курсору
+            (от новых к старым) без подсчета общего количества.
+            Параметр facets=category,seller,price добавляет в ответ
+            количество продуктов выборки по каждому значению фасета.
         """,
         tags=tags,
         parameters=PRODUCT_PARAM_EXAMPLE,
     )
     def get(self, request, *args, **kwargs):
-        products = Product.objects.select_related(
-            'category', 'seller', 'seller__user').all()
-        filterset = ProductFilter(request.GET, queryset=products)
+        facets, unknown_facets = parse_facets(
+            request.query_params.get('facets'))
+        if unknown_facets:
+            return Response(
+                data={'facets': f'Неизвестные фасеты: {unknown_facets}'},
+                status=400)
+        fields = self.serializer_class.select_fields(request)
+        filterset = ProductFilter(request.GET, queryset=Product.objects.all())
         if filterset.is_valid():
             queryset = filterset.qs
-            paginator = self.pagination_class()
-            paginated_queryset = paginator.paginate_queryset(queryset, request)
-            serializer = self.serializer_class(paginated_queryset, many=True)
-            return paginator.get_paginated_response(serializer.data)
+            if KeysetPagination.is_requested(request):
+                paginator = KeysetPagination()
+            else:
+                paginator = self.pagination_class()
+            paginated_rows = paginator.paginate_queryset(
+                ProductValuesSerializer.values(queryset, fields), request)
+            serializer = ProductValuesSerializer(
+                paginated_rows, many=True, fields=fields)
+            response = paginator.get_paginated_response(serializer.data)
+            if facets:
+                response.data['facets'] = compute_facets(queryset, facets)
+            return response
         else:
             return Response(filterset.errors, status=400)
 
 
+class ProductsSearchView(APIView):
+    serializer_class = ProductSerializer
+    pagination_class = CustomPagination
+
+    @extend_schema(
+        operation_id='search_products',
+        summary='Поиск продуктов',
+        description="""
+            Эндпоинт ищет продукты по названию, описанию и категории.
+            Результаты отсортированы по релевантности (BM25), если не
+            указан параметр ordering, и поддерживают фильтры каталога.
+        """,
+        tags=tags,
+        parameters=PRODUCT_SEARCH_PARAM_EXAMPLE,
+    )
+    def get(self, request, *args, **kwargs):
+        match = build_match_query(request.query_params.get('q'))
+        if not match:
+            return Response(
+                data={'message': 'Пустой поисковый запрос!'}, status=400)
+        fields = self.serializer_class.select_fields(request)
+        filterset = ProductFilter(request.GET, queryset=Product.objects.all())
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=400)
+        queryset = search_products(filterset.qs, match)
+        if not request.query_params.get('ordering'):
+            queryset = queryset.order_by('search_rank', '-id')
+        queryset = self.serializer_class.project(queryset, fields)
+        paginator = self.pagination_class()
+        paginated_queryset = paginator.paginate_queryset(queryset, request)
+        serializer = self.serializer_class(
+            paginated_queryset, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ProductsExportView(APIView):
+
+    @extend_schema(
+        operation_id='export_products',
+        summary='Выгрузка каталога',
+        description="""
+            Эндпоинт потоково выгружает все живые продукты в NDJSON
+            или CSV. С параметрами since и after_id (updated_at и id
+            последней полученной строки) выгружаются продукты,
+            измененные после этой строки, включая удаленные
+            (is_deleted=true; от жестко удаленного продукта остаются
+            только id и время удаления в updated_at).
+        """,
+        tags=tags,
+        parameters=PRODUCT_EXPORT_PARAM_EXAMPLE,
+        responses={(200, 'application/x-ndjson'): str},
+    )
+    def get(self, request, *args, **kwargs):
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in EXPORT_TYPES:
+            return Response(
+                data={'type': f'Доступные типы: {list(EXPORT_TYPES)}'},
+                status=400)
+        since = request.query_params.get('since')
+        if since is not None:
+            since = parse_since(since)
+            if since is None:
+                return Response(
+                    data={'since': 'Неверная дата, ожидается ISO 8601.'},
+                    status=400)
+        after_id = request.query_params.get('after_id')
+        if after_id is not None:
+            after_id = parse_after_id(after_id)
+            if after_id is None or since is None:
+                return Response(
+                    data={'after_id': 'Ожидается UUID вместе с since.'},
+                    status=400)
+        generate, content_type, extension = EXPORT_TYPES[export_type]
+        response = StreamingHttpResponse(
+            generate(export_rows(since, after_id)),
+            content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="products.{extension}"')
+        return response
+
+
 class ProductsBySellerView(APIView):
     serializer_class = ProductSerializer
 
     @extend_schema(
         summary='Товары продавца по слаг',
         description="""
-            Эндпоинт возвращает товары продавца по слаг.
+            Эндпоинт возвращает товары продавца по слаг постранично.
         """,
-        tags=tags
+        tags=tags,
+        parameters=LIST_PARAM_EXAMPLE + PRODUCT_FIELDS_PARAM_EXAMPLE,
     )
     def get(self, request, *args, **kwargs):
-        seller = Seller.objects.get_or_none(slug=kwargs['slug'])
-        if not seller:
+        seller_id = seller_slugs.resolve(kwargs['slug'])
+        if not seller_id:
             return Response(
                 data={'message': 'Продавец не существует!'}, status=404)
-        products = Product.objects.select_related(
-            'category', 'seller', 'seller__user').filter(seller=seller)
-        serializer = self.serializer_class(products, many=True)
-        return Response(data=serializer.data, status=200)
+        validators = queryset_validators(
+            request,
+            Product.objects.unfiltered().filter(seller_id=seller_id),
+            live=Q(is_deleted=False))
+        not_modified = validators.not_modified()
+        if not_modified:
+            return not_modified
+        fields = self.serializer_class.select_fields(request)
+        products = self.serializer_class.project(
+            Product.objects.filter(seller_id=seller_id), fields)
+        if is_stream_requested(request):
+            return validators.apply(stream_json_list(
+                products, self.serializer_class, fields=fields))
+        cache_key, data = response_cache.get(request, [f'seller:{seller_id}'])
+        if data is None:
+            data = paginated_response(
+                request, products, self.serializer_class,
+                fields=fields).data
+            response_cache.set(cache_key, data)
+        return validators.apply(Response(data=data, status=200))
 
 
 class ProductView(APIView):
     serializer_class = ProductSerializer
 
-    def get_object(self, slug):
-        product = Product.objects.get_or_none(slug=slug)
-        return product
+    def get_object(self, slug, fields=None):
+        products = self.serializer_class.project(
+            Product.objects.all(), fields, extra=('slug', 'updated_at'))
+        return product_slugs.get_or_none(slug, products)
 
     @extend_schema(
         operation_id="product_detail",
@@ -136,18 +301,24 @@ class ProductView(APIView):
         description="""
             Эта конечная точка возвращает сведения о продукте через слаг.
         """,
-        tags=tags
+        tags=tags,
+        parameters=PRODUCT_FIELDS_PARAM_EXAMPLE,
     )
     def get(self, request, *args, **kwargs):
-        product = self.get_object(kwargs['slug'])
+        fields = self.serializer_class.select_fields(request)
+        product = self.get_object(kwargs['slug'], fields)
         if not product:
             return Response(data={'message': 'Продукт не найден!'}, status=404)
-        avg_rating = Review.objects.filter(
-            product=product).aggregate(Avg('rating'))['rating__avg']
-        serializer = self.serializer_class(product)
-        response_data = serializer.data
-        response_data['average_rating'] = avg_rating or 0
-        return Response(data=serializer.data, status=200)
+        validators = instance_validators(request, product)
+        not_modified = validators.not_modified()
+        if not_modified:
+            return not_modified
+        cache_key, data = response_cache.get(
+            request, [f'product:{product.pk}'])
+        if data is None:
+            data = self.serializer_class(product, fields=fields).data
+            response_cache.set(cache_key, data)
+        return validators.apply(Response(data=data, status=200))
 
 
 class CartView(APIView):
@@ -163,10 +334,9 @@ class CartView(APIView):
     )
     def get(self, request, *args, **kwargs):
         user = request.user
-        orderitems = OrderItem.objects.filter(
-            user=user, order=None).select_related(
-                'product', 'product__seller', 'product__seller__user')
-        serializer = self.serializer_class(orderitems, many=True)
+        orderitems = OrderItemValuesSerializer.values(
+            OrderItem.objects.filter(user=user, order=None))
+        serializer = OrderItemValuesSerializer(orderitems, many=True)
         return Response(data=serializer.data)
 
     @extend_schema(
@@ -179,6 +349,7 @@ class CartView(APIView):
         tags=tags,
         request=ToggleCartItemSerializer,
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
         user = request.user
         serializer = ToggleCartItemSerializer(data=request.data)
@@ -186,35 +357,79 @@ class CartView(APIView):
         data = serializer.validated_data
         quantity = data['quantity']
 
-        product = Product.objects.select_related(
-            'seller', 'seller__user').get_or_none(slug=data['slug'])
+        product = product_slugs.get_or_none(
+            data['slug'],
+            Product.objects.select_related('seller', 'seller__user'))
         if not product:
             return Response(
                 {'message': 'Нет продукта с таким слаг'}, status=404)
-        orderitem, created = OrderItem.objects.update_or_create(
-            user=user,
-            order_id=None,
-            product=product,
-            defaults={'quantity': quantity},
-        )
+        if quantity == 0:
+            OrderItem.objects.filter(
+                user=user, order=None, product=product).delete()
+            return Response(
+                data={"message": 'Товар Удалено из Корзина', 'item': None},
+                status=200)
+
+        # Вставка или обновление одним запросом (см. apps.shop.cart).
+        orderitem_id, created = upsert_cart_items(
+            user, {product.pk: quantity})[product.pk]
         resp_message_substring = 'Обновлено в'
         status_code = 200
         if created:
             status_code = 201
             resp_message_substring = 'Добавлено в'
-        if orderitem.quantity == 0:
-            resp_message_substring = 'Удалено из'
-            orderitem.delete()
-            data = None
-        if resp_message_substring != 'Удалено из':
-            orderitem.product = product
-            serializer = self.serializer_class(orderitem)
-            data = serializer.data
+        orderitem = OrderItem(
+            id=orderitem_id, user=user, product=product, quantity=quantity)
+        serializer = self.serializer_class(orderitem)
+        data = serializer.data
         return Response(
             data={"message": f'Товар {resp_message_substring} Корзина',
                   'item': data}, status=status_code)
 
 
+class CartBulkView(APIView):
+    serializer_class = BulkCartSerializer
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(
+        summary='Пакетное изменение корзины',
+        description="""
+            Эта конечная точка устанавливает количество сразу для
+            нескольких товаров корзины одной транзакцией. Если количество
+            равно 0, товар удаляется из корзины. Если хотя бы один слаг
+            не найден, корзина не меняется. Возвращает всю корзину.
+        """,
+        tags=tags,
+        request=BulkCartSerializer,
+    )
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
+
+        products, missing = resolve_products(
+            [item['slug'] for item in items])
+        if missing:
+            return Response(
+                {'message': 'Нет продукта с таким слаг', 'slugs': missing},
+                status=404)
+        created, updated, deleted = update_cart(user, {
+            products[item['slug']]: item['quantity'] for item in items})
+
+        orderitems = OrderItemValuesSerializer.values(
+            OrderItem.objects.filter(user=user, order=None))
+        return Response(
+            data={'message': 'Корзина обновлена',
+                  'created': created,
+                  'updated': updated,
+                  'deleted': deleted,
+                  'items': OrderItemValuesSerializer(
+                      orderitems, many=True).data},
+            status=200)
+
+
 class CheckoutView(APIView):
     serializer_class = CheckoutSerializer
     permission_classes = (IsAuthenticated,)
@@ -228,23 +443,20 @@ class CheckoutView(APIView):
         tags=tags,
         request=CheckoutSerializer,
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
         # Proceed to checkout
         user = request.user
-        orderitems = OrderItem.objects.filter(user=user, order=None)
-        if not orderitems.exists():
-            return Response({"message": "No Items in Cart"}, status=404)
-
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
         shipping_id = data.get("shipping_id")
-        if shipping_id:
-            # Получаем информацию о доставке на основе идентификатора доставки.
-            shipping = ShippingAddress.objects.get_or_none(id=shipping_id)
-            if not shipping:
-                return Response(
-                    {'message': 'Нет адреса доставки с таким ID'}, status=404)
+        # Получаем информацию о доставке на основе идентификатора доставки.
+        shipping = ShippingAddress.objects.get_or_none(
+            id=shipping_id, user=user)
+        if not shipping:
+            return Response(
+                {'message': 'Нет адреса доставки с таким ID'}, status=404)
 
         def append_shipping_details(shipping):
             fields_to_update = [
@@ -262,11 +474,23 @@ class CheckoutView(APIView):
                 data[field] = value
             return data
 
-        order = Order.objects.create(
-            user=user, **append_shipping_details(shipping))
-        orderitems.update(order=order)
+        # Остатки списываются в той же транзакции, что и создание заказа.
+        try:
+            order = checkout(user, append_shipping_details(shipping))
+        except EmptyCartError:
+            return Response({"message": "No Items in Cart"}, status=404)
+        except OutOfStockError as exc:
+            return Response(
+                {'message': 'Недостаточно товара на складе',
+                 'items': exc.items}, status=409)
+        except CartChangedError:
+            return Response(
+                {'message': 'Корзина изменилась, повторите оформление'},
+                status=409)
 
-        serializer = OrderSerializer(order)
+        orders = OrderValuesSerializer.values(
+            Order.objects.filter(pk=order.pk))
+        serializer = OrderValuesSerializer(orders[0])
         return Response(
             data={'message': 'Заказ успешно оформлен!',
                   "item": serializer.data}, status=200)
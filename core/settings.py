@@ -84,10 +84,56 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Тестовая база в файле: параллельные соединения тестов
+        # на конкурентность ждут блокировку, как в рабочей базе.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        # LocMemCache — память одного процесса: при нескольких
+        # воркерах изменение каталога сбрасывает кэш ответов только
+        # в своем воркере, остальные до TIMEOUT отдают старые списки.
+        # Для нескольких процессов нужен общий бэкенд: Redis, Memcached
+        # или 'django.core.cache.backends.filebased.FileBasedCache'.
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-market',
+    }
+}
+
+# Кэш ответов каталога (apps.common.cache).
+RESPONSE_CACHE = {
+    'ALIAS': 'default',  # псевдоним из CACHES
+    'TIMEOUT': 60 * 15,  # время жизни записи, секунд
+}
+
+# Кэш слаг → ключ в памяти процесса (apps.common.slugs).
+SLUG_CACHE = {
+    'MAXSIZE': 10000,  # записей на модель в каждом процессе
+    'TTL': 60 * 5,  # время жизни найденного слага, секунд
+    'NEGATIVE_TTL': 10,  # время жизни «слаг не найден», секунд
+}
+
+# Производные изображений (apps.common.images).
+IMAGE_VARIANTS = {
+    'WORKERS': 2,  # потоков генерации в каждом процессе
+    'MISSING_TTL': 60,  # сколько помнится отсутствие вариантов, секунд
+}
+
+# Повтор запросов по заголовку Idempotency-Key (apps.common.idempotency).
+IDEMPOTENCY = {
+    'TTL': 60 * 60 * 24,  # сколько хранится ответ, секунд
+    'WAIT_TIMEOUT': 10,  # сколько повтор ждет первый запрос, секунд
+    'POLL_INTERVAL': 0.05,  # как часто повтор проверяет ключ, секунд
+    'LOCK_TIMEOUT': 60,  # через сколько незавершенный запрос брошен, секунд
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -130,6 +176,25 @@ REST_FRAMEWORK = {
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+STORAGES = {
+    # Загрузки именуются по хэшу содержимого (apps.common.storage).
+    'default': {
+        'BACKEND': 'apps.common.storage.ContentHashStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Отдача MEDIA_URL (apps.common.media). За nginx укажите internal
+# location, например '/protected-media/', чтобы файлы отдавал nginx.
+MEDIA_SERVE = {
+    'ACCEL_REDIRECT_PREFIX': None,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -141,4 +206,4 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'ACCESS_TOKEN_LIFETIME': timedelta(days=7),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
-}
\ No newline at end of file
+}
@@ -1,7 +1,9 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from apps.common.media import serve_media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -11,5 +13,7 @@ urlpatterns = [
     path('profiles/', include('apps.profiles.urls')),
     path('sellers/', include('apps.sellers.urls')),
     path('shop/', include('apps.shop.urls')),
-    path('reviews', include('apps.reviews.urls'))
+    path('reviews', include('apps.reviews.urls')),
+    path('common/', include('apps.common.urls')),
+    re_path(r'^media/(?P<path>.+)$', serve_media),
 ]